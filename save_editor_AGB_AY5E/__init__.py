@@ -0,0 +1,29 @@
+import importlib
+
+# Public API => module defining it.
+# These are only imported on first access (PEP 562), so that importing
+# the package neither parses the datasets nor loads the heavier modules.
+_LAZY_ATTRIBUTES = {
+    "CARDS": "constants",
+    "DUELISTS": "constants",
+    "PACKS": "constants",
+    "Offsets": "constants",
+    "DeckBuilder": "deckbuilder",
+    "Save": "save",
+    "SaveGenerator": "generator",
+    "SaveMatrix": "matrix",
+    "UNLOCKS": "unlocks",
+}
+
+
+def __getattr__(name):
+    module = _LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module("." + module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
@@ -5,13 +5,13 @@ import sys
 gi.require_version("Gtk", "3.0")
 from gi.repository import Gtk, Gdk
 
+from . import bundle
 from .application import Application
-from .metadata import RESOURCES_DIR
 
 
 def main():
     cssProvider = Gtk.CssProvider()
-    cssProvider.load_from_path(str(RESOURCES_DIR / 'styles.css'))
+    cssProvider.load_from_data(bundle.read_bytes('styles.css'))
     screen = Gdk.Screen.get_default()
     styleContext = Gtk.StyleContext()
     styleContext.add_provider_for_screen(screen, cssProvider, Gtk.STYLE_PROVIDER_PRIORITY_USER)
@@ -9,38 +9,24 @@ import textwrap
 
 from functools import partial
 
-from gi.repository import Gio, Gtk, Gdk
+from gi.repository import Gio, GLib, Gtk, Gdk
 
-from .constants import CARDS, DUELISTS, PACKS
-from .constants import MAX_WON, MAX_DRAWN, MAX_LOST, MAX_TRUNK_COPIES, MAX_TRUNK_CARDS
+from . import bundle
+from .constants import DUELISTS, PACKS
 from .decks import InitialDeck
 from .enums import Announcements, CardColumn, CardType, DeckColor, DuelistColumn, Event
-from .enums import Limit, MonsterType, NextNationalChampionshipRound, NotebookPage
-from .enums import SpecialDuelist, Stage
-from .metadata import RESOURCES_DIR, __game_title__, __game_name__, __game_id__, __version__
-from .save import Save
+from .enums import Limit, NextNationalChampionshipRound, NotebookPage
+from .metadata import __game_title__, __game_name__, __game_id__, __version__
+from .tasks import BackgroundTask
+from .unlocks import UNLOCKS
+from .viewmodel import CardsView, DuelistsView
+from .watcher import FileWatcher
+from .workspace import Document, Workspace
 
 
-def compute_card_usage(used, limit):
-    limit = int(limit)
-    return used * 100 / max(1, limit) if limit else 100
-
 class Application(Gtk.Application):
     CALENDAR = calendar.Calendar(calendar.SUNDAY)
 
-    # Cards that also exist with an alternative artwork in the game.
-    ALTERNATIVE_ARTWORKS = (
-        "Blue-Eyes White Dragon",
-        "Flame Swordsman",
-        "Dark Magician",
-        "Gaia The Fierce Knight",
-        "Celtic Guardian",
-        "Tiger Axe",
-        "Thousand Dragon",
-        "Pendulum Machine",
-        "Launcher Spider",
-    )
-
     # The in-game deliveries of "Weekly Yu-Gi-Oh!" & "Yu-Gi-Oh! Magazine" follow japanese holidays,
     # AS THEY WERE when "Yu-Gi-Oh! Duel Monsters 5: Expert 1" was released (~July 2001).
     # When a delivery falls on a holiday, it will happen on the previous working day instead.
@@ -98,6 +84,13 @@ class Application(Gtk.Application):
         (12, 24):   ("Eye of Wdjat",                True),
     }
 
+    # Actions which cannot be used while a file is being loaded/saved.
+    FILE_ACTIONS = ("new", "open", "close", "reload", "save", "save-as", "document", "quit")
+
+    # Delay before the progress dialog is shown (in milliseconds),
+    # so that it does not flash on screen for fast local files.
+    PROGRESS_DELAY = 250
+
     def __init__(self, *args, **kwargs):
         super().__init__(
             *args,
@@ -106,9 +99,31 @@ class Application(Gtk.Application):
             **kwargs
         )
         self.window = None
-        self.save = None
-        self.unsaved = False
+        self.workspace = Workspace()
         self.details = None
+        self.documents_menu = None
+        self.task = None
+        self.task_done = None
+        self.progress = None
+        self.progress_timer = None
+        self.pending = []
+
+    # The editor's widgets always reflect the workspace's current document.
+    @property
+    def save(self):
+        return self.workspace.current.save
+
+    @property
+    def sync(self):
+        return self.workspace.current.sync
+
+    @property
+    def unsaved(self):
+        return self.workspace.current.unsaved
+
+    @unsaved.setter
+    def unsaved(self, value):
+        self.workspace.current.unsaved = value
 
     def do_startup(self):
         Gtk.Application.do_startup(self)
@@ -116,6 +131,7 @@ class Application(Gtk.Application):
         actions = (
             ("new",                 self.on_new),
             ("open",                self.on_open),
+            ("close",               self.on_close),
             ("reload",              self.on_reload),
             ("save",                self.on_save),
             ("save-as",             self.on_save_as),
@@ -131,8 +147,18 @@ class Application(Gtk.Application):
             action.connect("activate", cb)
             self.add_action(action)
 
-        builder = Gtk.Builder.new_from_file(str(RESOURCES_DIR / 'menu.glade'))
+        action = Gio.SimpleAction.new_stateful("watch", None, GLib.Variant.new_boolean(False))
+        action.connect("change-state", self.on_watch_toggled)
+        self.add_action(action)
+
+        # The state holds the index of the current document in the workspace.
+        action = Gio.SimpleAction.new_stateful("document", GLib.VariantType.new("i"), GLib.Variant.new_int32(0))
+        action.connect("change-state", self.on_document_selected)
+        self.add_action(action)
+
+        builder = Gtk.Builder.new_from_string(bundle.read_text('menu.glade'), -1)
         self.set_menubar(builder.get_object("menubar"))
+        self.documents_menu = builder.get_object("documents")
 
     def get_builder(self):
         handlers = {
@@ -174,7 +200,7 @@ class Application(Gtk.Application):
             "duels_unlock_packs": self.on_duels_unlock_packs,
         }
 
-        builder = Gtk.Builder.new_from_file(str(RESOURCES_DIR / "application.glade"))
+        builder = Gtk.Builder.new_from_string(bundle.read_text("application.glade"), -1)
         builder.connect_signals(handlers)
         return builder
 
@@ -197,14 +223,13 @@ class Application(Gtk.Application):
             self.misc_last_pack.insert(index, str(pack.ID), pack.Name)
 
         # Cards page
-        for card in CARDS.values():
-            if card.ID > 0:
-                self.data_cards.append([card.ID, card.Name, 0, 0, 0, False, 0.0, "0/{}".format(card.Limit)])
+        columns = self.workspace.columns
+        for card_id, name, limit in zip(columns.cardIDs, columns.cardNames, columns.cardLimits):
+            self.data_cards.append([card_id, name, 0, 0, 0, False, 0.0, "0/{}".format(limit)])
 
         # Duelists page
-        for duelist in DUELISTS.values():
-            if duelist.ID > 0:
-                self.data_duelists.append([duelist.ID, duelist.Name, duelist.Stage.value, 0, 0, 0])
+        for duelist_id, name, stage in zip(columns.duelistIDs, columns.duelistNames, columns.duelistStages):
+            self.data_duelists.append([duelist_id, name, stage, 0, 0, 0])
 
     def prepare_window(self, window, builder):
             actions = (
@@ -371,11 +396,14 @@ class Application(Gtk.Application):
             # We do command-line parsing here, because the UI must be fully initialized
             # before we can actually load a save file.
             parser = argparse.ArgumentParser(prog="save-editor")
-            parser.add_argument('filename', metavar='FILE', nargs="?", help="save file to load on startup")
+            parser.add_argument('filenames', metavar='FILE', nargs="*", help="save files to load on startup")
             parser.add_argument('-V', '--version', action='version', version='%(prog)s {}'.format(__version__))
             opts = parser.parse_args(sys.argv[1:])
 
-            self.load_save(opts.filename)
+            # The files are loaded in the background, starting from an empty savegame.
+            self.open_document(None)
+            self.pending.extend(opts.filenames)
+            self.open_pending()
 
             # @HACK: Move calendar focus to current in-game day
             ingame_date = self.save.get_ingame_date()
@@ -438,12 +466,20 @@ class Application(Gtk.Application):
         return filename
 
     def on_new(self, action, param):
-        self.load_save(None)
+        self.open_document(None)
 
     def on_open(self, action, param):
         filename = self.select_file(False)
         if filename:
-            self.load_save(filename)
+            self.open_document(filename)
+
+    def on_close(self, action, param):
+        self.close_document(self.workspace.active)
+
+    def on_document_selected(self, action, value):
+        index = value.get_int32()
+        if 0 <= index < len(self.workspace) and index != self.workspace.active:
+            self.switch_document(index)
 
     def on_reload(self, action, param):
         self.load_save(self.save.filename)
@@ -459,6 +495,77 @@ class Application(Gtk.Application):
             return
         self.save_save(filename)
 
+    def on_watch_toggled(self, action, value):
+        action.set_state(value)
+        self.update_watcher()
+
+    def update_watcher(self):
+        enabled = self.lookup_action("watch").get_state().get_boolean()
+        for document in self.workspace:
+            document.close()
+            if enabled and document.save.filename is not None:
+                # The watcher runs in its own thread: hand the notifications over to GTK's main loop.
+                document.watcher = FileWatcher(document.save.filename, partial(GLib.idle_add, self.on_external_change))
+                document.watcher.start()
+
+    def on_external_change(self, filename):
+        document = self.workspace.find(filename)
+        if document is None:
+            return False
+        if document is not self.workspace.current:
+            # Documents in the background only need their data to be merged:
+            # the rows are refreshed when switching to them.
+            return self.merge_external_change(document, filename)
+        return self.merge_external_change(document, filename, update_rows=True)
+
+    def merge_external_change(self, document, filename, update_rows=False):
+
+        try:
+            with open(filename, 'rb') as fd:
+                data = fd.read()
+        except OSError:
+            return False
+
+        # Ignore our own writes and files that are still being written.
+        sync = document.sync
+        if data == sync.base or not sync.check(data):
+            return False
+
+        changes = sync.merge(data)
+        if changes.conflicts:
+            changes = sync.merge(data, self.confirm_external_conflicts(len(changes.conflicts)))
+        document.unsaved = document.save.dumps() != sync.base
+        if not update_rows:
+            return False
+
+        self.update_card_rows([card_id - 1 for card_id in changes.cards if card_id > 0])
+        self.update_duelist_rows([duelist_id - 1 for duelist_id in changes.duelists if duelist_id > 0])
+        if changes.fields:
+            self.update_general()
+        self.update_cards_stats()
+        self.update_duels_stats()
+        self.update_title()
+        return False
+
+    def confirm_external_conflicts(self, count: int) -> str:
+        dialog = Gtk.MessageDialog(
+            transient_for=self.window,
+            flags=Gtk.DialogFlags.MODAL,
+            message_type=Gtk.MessageType.WARNING,
+            text="Warning: the file was modified by another program!",
+        )
+        dialog.format_secondary_text(
+            '{} of those modifications conflict with your unsaved changes.\n'
+            'Choose "Keep my changes" to ignore them, or "Use the file\'s version" to accept them.'.format(count)
+        )
+        dialog.add_buttons(
+            "Keep my changes", Gtk.ResponseType.REJECT,
+            "Use the file's version", Gtk.ResponseType.ACCEPT,
+        )
+        response = dialog.run()
+        dialog.destroy()
+        return "remote" if response == Gtk.ResponseType.ACCEPT else "local"
+
     def on_help(self, action, param):
         help_page = "https://github.com/fpoirotte/save-editor-{}/tree/main/docs/Usage.md".format(__game_id__)
 
@@ -504,9 +611,14 @@ class Application(Gtk.Application):
         dialog.present()
 
     def on_quit_request(self, *args):
-        # We attempt to load a new empty save, which will display a confirmation dialog if necessary.
-        # Also, the return value determines if the default exit handler should be called (False) or not (True).
-        return not self.load_save(None)
+        # The return value determines if the default exit handler should be called (False) or not (True).
+        if self.task is not None:
+            return True
+        if any(document.unsaved for document in self.workspace) and self.confirm_data_loss() != Gtk.ResponseType.OK:
+            return True
+        for document in self.workspace:
+            document.close()
+        return False
 
     def on_quit(self, *args):
         prevent_exit = self.on_quit_request()
@@ -525,10 +637,21 @@ class Application(Gtk.Application):
         title = "Save Editor for {}".format(__game_id__)
         if self.save.filename is not None:
             title += " ({})".format(os.path.basename(self.save.filename))
+        if len(self.workspace) > 1:
+            title += " [{}/{}]".format(self.workspace.active + 1, len(self.workspace))
         if self.unsaved:
             title += " - UNSAVED"
         self.window.set_title(title)
 
+    def update_documents_menu(self):
+        self.documents_menu.remove_all()
+        for index, document in enumerate(self.workspace):
+            item = Gio.MenuItem.new(document.title, None)
+            item.set_action_and_target_value("app.document", GLib.Variant.new_int32(index))
+            self.documents_menu.append_item(item)
+        self.lookup_action("document").set_state(GLib.Variant.new_int32(self.workspace.active))
+        self.lookup_action("close").set_enabled(len(self.workspace) > 1 or self.save.filename is not None)
+
     def update_unsaved(self, unsaved: bool):
         self.unsaved |= unsaved
         self.update_title()
@@ -537,39 +660,15 @@ class Application(Gtk.Application):
         self.unsaved = False
         self.update_title()
 
+    # The contents of the Cards & Duelists tabs are computed by the view-models
+    # (see viewmodel.py): the methods below only copy them into the widgets.
     def update_cards_stats(self):
-        stats = self.save.get_cards_stats()
-        stats["unique_pct"] = stats["unique"] * 100 / stats["unique_max"]
-        stats["trunk_max"] = MAX_TRUNK_CARDS
-        stats["trunk_pct"] = stats["trunk"] * 100 / MAX_TRUNK_CARDS
-        stats["main_pct"] = stats["main"] * 100 / stats["main_max"]
-        stats["extra_pct"] = stats["extra"] * 100 / stats["extra_max"]
-        stats["side_pct"] = stats["side"] * 100 / stats["side_max"]
-        self.stats_cards_total.set_text("{total}".format(**stats))
-        self.stats_cards_unique.set_text("{unique}/{unique_max}".format(**stats))
-        self.stats_cards_unique_pct.set_text("({unique_pct:.2f}%)".format(**stats))
-        self.stats_cards_trunk.set_text("{trunk}/{trunk_max}".format(**stats))
-        self.stats_cards_trunk_pct.set_text("({trunk_pct:.2f}%)".format(**stats))
-        self.stats_cards_main.set_text("{main}/{main_max}".format(**stats))
-        self.stats_cards_main_pct.set_text("({main_pct:.2f}%)".format(**stats))
-        self.stats_cards_extra.set_text("{extra}/{extra_max}".format(**stats))
-        self.stats_cards_extra_pct.set_text("({extra_pct:.2f}%)".format(**stats))
-        self.stats_cards_side.set_text("{side}/{side_max}".format(**stats))
-        self.stats_cards_side_pct.set_text("({side_pct:.2f}%)".format(**stats))
+        for name, text in CardsView(self.workspace.current).summary().items():
+            getattr(self, "stats_cards_" + name).set_text(text)
 
     def update_duels_stats(self):
-        stats = self.save.get_duelists_stats()
-        adj_total = max(1, stats["total"])
-        stats["won_pct"] = stats["won"] * 100 / adj_total
-        stats["drawn_pct"] = stats["drawn"] * 100 / adj_total
-        stats["lost_pct"] = stats["lost"] * 100 / adj_total
-        self.stats_duels_total.set_text("{total}".format(**stats))
-        self.stats_duels_won.set_text("{won}/{total}".format(**stats))
-        self.stats_duels_won_pct.set_text("({won_pct:.2f}%)".format(**stats))
-        self.stats_duels_drawn.set_text("{drawn}/{total}".format(**stats))
-        self.stats_duels_drawn_pct.set_text("({drawn_pct:.2f}%)".format(**stats))
-        self.stats_duels_lost.set_text("{lost}/{total}".format(**stats))
-        self.stats_duels_lost_pct.set_text("({lost_pct:.2f}%)".format(**stats))
+        for name, text in DuelistsView(self.workspace.current).summary().items():
+            getattr(self, "stats_duels_" + name).set_text(text)
 
     def update_days(self):
         days_elapsed = self.save.get_elapsed_days()
@@ -578,8 +677,7 @@ class Application(Gtk.Application):
         else:
             self.misc_days.set_text("({} days have passed)".format(days_elapsed))
 
-    def update_ui(self):
-        # - General
+    def update_general(self):
         self.misc_nationals_round.set_active_id(str(self.save.get_next_national_championship_round().value))
         self.misc_nationals_victories.set_value(self.save.get_national_championship_victories())
         self.misc_last_duelist.set_active_id(str(self.save.get_last_duelist_fought().ID))
@@ -593,29 +691,28 @@ class Application(Gtk.Application):
         self.misc_announce_duelists.set_active(Announcements.NEW_DUELISTS_AVAILABLE in announcements)
         self.misc_announce_pack.set_active(Announcements.NEW_PACK_AVAILABLE in announcements)
         self.update_days()
+
+    @staticmethod
+    def update_rows(store, view, indices=None):
+        columns = [column.value for column in view.COLUMNS]
+        for index, values in view.rows(indices):
+            store.set(store[index].iter, columns, values)
+
+    def update_card_rows(self, indices=None):
+        self.update_rows(self.data_cards, CardsView(self.workspace.current), indices)
+
+    def update_duelist_rows(self, indices=None):
+        self.update_rows(self.data_duelists, DuelistsView(self.workspace.current), indices)
+
+    def update_ui(self, cards=None, duelists=None):
+        # - General
+        self.update_general()
         self.update_cards_stats()
         self.update_duels_stats()
 
-        # - Cards
-        stats = self.save.get_detailed_cards_stats()
-        for row in self.data_cards:
-            card = stats[row[CardColumn.ID]]
-            row[CardColumn.TRUNK] = card.copiesTrunk
-            row[CardColumn.MAIN_EXTRA] = card.copiesMain + card.copiesExtra
-            row[CardColumn.SIDE] = card.copiesSide
-            row[CardColumn.PASSWORD] = card.password
-            used = card.usage
-            limit = card.card.Limit
-            row[CardColumn.USED] = compute_card_usage(used, limit)
-            row[CardColumn.LIMIT] = "{}/{}".format(used, limit)
-
-        # - Duelists
-        stats = self.save.get_detailed_duelists_stats()
-        for row in self.data_duelists:
-            duelist = stats[row[DuelistColumn.ID]]
-            row[DuelistColumn.WON] = duelist.won
-            row[DuelistColumn.DRAWN] = duelist.drawn
-            row[DuelistColumn.LOST] = duelist.lost
+        # - Cards & duelists (only the given rows, if any)
+        self.update_card_rows(cards)
+        self.update_duelist_rows(duelists)
 
     def confirm_data_loss(self):
         dialog = Gtk.MessageDialog(
@@ -677,48 +774,7 @@ class Application(Gtk.Application):
         self.save.set_last_pack_received(PACKS[int(widget.get_active_id())])
 
     def on_card_spin_editing_started(self, widget, button, path: str, column: CardColumn):
-        row = self.data_cards[path]
-        detailed_stats = self.save.get_detailed_cards_stats()
-        card = detailed_stats[row[CardColumn.ID]]
-        stats = self.save.get_cards_stats()
-        value = row[column.value]
-        limits = []
-
-        # This takes care of finding variants (alternative artworks) for a card.
-        name = str(card.card).replace(" (alternate artwork)", "")
-        if name in self.ALTERNATIVE_ARTWORKS:
-            cards = [detailed_stats[name], detailed_stats[name + " (alternate artwork)"]]
-        else:
-            cards = [card]
-
-        # For cards with alternative artworks, card usage of every variant must be summed up
-        # to determine if it respects the game's restrictions regarding the card.
-        usage = 0
-        for c in cards:
-            # There must still be enough room in the trunk to accomodate for all the copies
-            # currently in use, in case they were transferred there later on.
-            limits.append(MAX_TRUNK_COPIES - c.usage)
-            usage += c.usage
-
-        if column != CardColumn.TRUNK:
-            # The number of copies in use must not exceed the restriction set by in-game limitations.
-            limits.append(card.card.Limit - usage)
-
-        # There must still be room left in the target deck
-        if column == CardColumn.TRUNK:
-            target = "trunk"
-        elif column == CardColumn.SIDE:
-            target = "side"
-        elif column != CardColumn.MAIN_EXTRA:
-            raise RuntimeError()
-        elif card.card.MonsterType == MonsterType.FUSION:
-            target = "extra"
-        else:
-            target = "main"
-        limits.append(stats[target + "_max"] - stats[target])
-
-        # Take into account the most restrictive limit
-        upper = value + min(limits)
+        value, upper = CardsView(self.workspace.current).bounds(int(path), column)
         self.dyn_adjustment.configure(value=value, lower=0, upper=upper, step_increment=1, page_increment=10, page_size=0)
 
     def on_card_spin_edited(self, widget, path: str, value: str, column: CardColumn):
@@ -728,38 +784,16 @@ class Application(Gtk.Application):
         except ValueError:
             pass
         value = int(self.dyn_adjustment.get_value())
-        row = self.data_cards[path]
-        card = self.save.get_detailed_cards_stats()[row[CardColumn.ID]]
-        limit = card.card.Limit
-
-        if column == CardColumn.TRUNK:
-            self.update_unsaved(value != card.copiesTrunk)
-            card.copiesTrunk = value
-        elif column == CardColumn.MAIN_EXTRA:
-            self.update_unsaved(value != (card.copiesMain + card.copiesExtra))
-            if card.card.MonsterType == MonsterType.FUSION:
-                card.copiesExtra = value
-            else:
-                card.copiesMain = value
-        elif column == CardColumn.SIDE:
-            self.update_unsaved(value != card.copiesSide)
-            card.copiesSide = value
-        else:
-            raise RuntimeError()
-
-        used = card.usage
-        row[column.value] = value
-        row[CardColumn.USED] = compute_card_usage(used, limit)
-        row[CardColumn.LIMIT] = "{}/{}".format(used, limit)
+        index = int(path)
+        self.update_unsaved(CardsView(self.workspace.current).set_value(index, column, value))
+        self.update_card_rows([index])
         self.update_cards_stats()
 
     def on_card_password_toggled(self, widget, path: str):
         self.update_unsaved(True)
-        row = self.data_cards[path]
-        value = not row[CardColumn.PASSWORD]
-        card = self.save.get_detailed_cards_stats()[row[CardColumn.ID]]
-        card.password = value
-        row[CardColumn.PASSWORD] = value
+        index = int(path)
+        CardsView(self.workspace.current).toggle_password(index)
+        self.update_card_rows([index])
 
     def on_card_details_keypress(self, dialog, event):
         key, value = event.get_keyval()
@@ -845,7 +879,7 @@ class Application(Gtk.Application):
         dialog.show_all()
 
     def on_card_row_activated(self, widget, path: str, column):
-        self.details = Gtk.Builder.new_from_file(str(RESOURCES_DIR / "card.glade"))
+        self.details = Gtk.Builder.new_from_string(bundle.read_text("card.glade"), -1)
         dialog = self.details.get_object("root")
         dialog.set_modal(True)
         dialog.set_destroy_with_parent(True)
@@ -869,12 +903,7 @@ class Application(Gtk.Application):
         self.update_unsaved(True)
 
     def on_duelist_spin_editing_started(self, widget, button, path: str, column: DuelistColumn):
-        value = int(self.data_duelists[path][column.value])
-        upper = {
-            DuelistColumn.WON: MAX_WON,
-            DuelistColumn.DRAWN: MAX_DRAWN,
-            DuelistColumn.LOST: MAX_LOST,
-        }[column]
+        value, upper = DuelistsView(self.workspace.current).bounds(int(path), column)
         self.dyn_adjustment.configure(value=value, lower=0, upper=upper, step_increment=1, page_increment=10, page_size=0)
 
     def on_duelist_spin_edited(self, widget, path: str, value: str, column: DuelistColumn):
@@ -884,22 +913,9 @@ class Application(Gtk.Application):
         except ValueError:
             pass
         value = int(self.dyn_adjustment.get_value())
-        row = self.data_duelists[path]
-        duelist = self.save.get_detailed_duelists_stats()[row[DuelistColumn.ID]]
-
-        if column == DuelistColumn.WON:
-            self.update_unsaved(value != duelist.won)
-            duelist.won = value
-        elif column == DuelistColumn.DRAWN:
-            self.update_unsaved(value != duelist.drawn)
-            duelist.drawn = value
-        elif column == DuelistColumn.LOST:
-            self.update_unsaved(value != duelist.lost)
-            duelist.lost = value
-        else:
-            raise RuntimeError()
-
-        row[column.value] = value
+        index = int(path)
+        self.update_unsaved(DuelistsView(self.workspace.current).set_value(index, column, value))
+        self.update_duelist_rows([index])
         self.update_duels_stats()
 
     def on_duels_reset(self, widget):
@@ -910,88 +926,172 @@ class Application(Gtk.Application):
         self.update_ui()
 
     def on_duels_unlock_duelists(self, widget):
-        cards = self.save.get_detailed_cards_stats()
-        duelists = self.save.get_detailed_duelists_stats()
-        for stats in duelists:
-            duelist = stats.duelist
-            if duelist.Stage != Stage.STAGE_5:
-                stats.won = max(stats.won, duelist.Stage.value + 1)
-            elif duelist.ID == SpecialDuelist.SIMON:
-                # Must have won the National Championship at least twice
-                self.save.set_national_championship_victories(max(2, self.save.get_national_championship_victories()))
-            # The following code is unnecessary since Trusdale below requires
-            # at least one copy of every card in the game, including Toon World.
-            #elif duelist.ID == SpecialDuelist.PEGASUS:
-            #    # Must possess at least one copy of Toon World
-            #    toon_world = cards["Toon World"]
-            #    if not int(toon_world):
-            #        toon_world.copiesTrunk = 1
-            elif duelist.ID == SpecialDuelist.TRUSDALE:
-                # To unlock Trusdaly, you must:
-                # * have defeated Simon at least once
-                # * have at least one copy of each card, including non-playable ones
-                #   (the 3 tickets, the 3 Egyptian god cards & "Insect Monster Token")
-                simon = duelists[SpecialDuelist.SIMON]
-                simon.won = max(simon.won, 1)
-                for card in cards:
-                    if card.card.ID > 0 and not int(card):
-                        card.copiesTrunk = 1
+        UNLOCKS.apply(self.save, UNLOCKS.plan(self.save, UNLOCKS.targets("duelist")))
         self.update_unsaved(True)
         self.update_ui()
 
     def on_duels_unlock_packs(self, widget):
-        duelists = self.save.get_detailed_duelists_stats()
-        top_duelists = (
-            "Yugi Muto", "Joey Wheeler",
-            "Mako Tsunami", "Mai Valentine",
-            "Umbra & Lumis", "Marik Ishtar",
-            "Seto Kaiba", "Yami Yugi",
-            "Kaiba Seto", # Alternative spelling used in the game
-        )
-        for stats in duelists:
-            # Several packs are automatically unlocked by unlocking
-            # other boosters packs with stricter requirements:
-            # - Tiger Axe: defeat everyone in Tier 1 at least twice
-            # - Garoozis: defeat everyone in Tier 2 at least 3 times
-            # - BEUD: defeat everyone in Tier 3 at least 4 times
-            # - Judge Man: win at least 10 times in Tier 1
-            # - Gate Guardian: win at least 10 times in Tier 2
-            # - Relinquished: win at least 10 times in Tier 3
-            # - Blue Millennium Puzzle: win at least 10 times in Tier 4
-            duelist = stats.duelist
-            won = 0
-            if duelist.Name in top_duelists:
-                # Unlocks booster packs that require 20 wins against certain duelists:
-                # BEWD, Exodia, Launcher Spider, Gemini Elf, Blue-Eyes Toon Dragon,
-                # Battle Ox, Eye of Wdjat, Buster Blader.
-                won = 20
-            elif duelist.Stage != Stage.STAGE_5:
-                # Unlocks booster packs that require 10 wins against every duelist in a Tier:
-                # Cyber Harpie, Great Moth, Black Luster Soldier, Green Millennium Puzzle,
-                # plus all the booster packs listed above.
-                won = 10
-            elif duelist.ID == SpecialDuelist.SIMON:
-                # Unlocks the Yellow Millennium Puzzle booster pack
-                won = 1
-            stats.won = max(stats.won, won)
+        UNLOCKS.apply(self.save, UNLOCKS.plan(self.save, UNLOCKS.targets("pack")))
         self.update_unsaved(True)
         self.update_ui()
 
+    def run_task(self, label: str, work, done):
+        # Runs work(task) in a background thread, then done(result) from GTK's main loop.
+        assert self.task is None
+        self.task = BackgroundTask(label, work, partial(GLib.idle_add, self.on_task_finished))
+        self.task_done = done
+        for name in self.FILE_ACTIONS:
+            self.lookup_action(name).set_enabled(False)
+        self.progress_timer = GLib.timeout_add(self.PROGRESS_DELAY, self.on_task_progress)
+        self.task.start()
+
+    def on_task_progress(self):
+        if self.task is None:
+            return False
+
+        if self.progress is None:
+            self.progress = Gtk.Dialog(title=self.task.name, transient_for=self.window, destroy_with_parent=True)
+            self.progress.add_button(Gtk.STOCK_CANCEL, Gtk.ResponseType.CANCEL)
+            self.progress.connect("response", self.on_task_cancel)
+            self.progress.connect("delete-event", self.on_task_cancel)
+            bar = Gtk.ProgressBar(show_text=True, text=self.task.name, margin=12)
+            self.progress.get_content_area().add(bar)
+            self.progress.show_all()
+            # From now on, refresh the progress bar regularly.
+            self.progress_timer = GLib.timeout_add(100, self.on_task_progress)
+            return False
+
+        bar = self.progress.get_content_area().get_children()[0]
+        bar.set_fraction(self.task.progress)
+        return True
+
+    def on_task_cancel(self, *args):
+        if self.task is not None:
+            self.task.cancel()
+            self.progress.set_response_sensitive(Gtk.ResponseType.CANCEL, False)
+        # Keep the dialog around until the task actually stops.
+        return True
+
+    def on_task_finished(self, task):
+        if self.progress_timer is not None:
+            GLib.source_remove(self.progress_timer)
+            self.progress_timer = None
+        if self.progress is not None:
+            self.progress.destroy()
+            self.progress = None
+        done = self.task_done
+        self.task = self.task_done = None
+        for name in self.FILE_ACTIONS:
+            self.lookup_action(name).set_enabled(True)
+        self.update_documents_menu()
+
+        if task.error is not None:
+            self.pending.clear()
+            self.show_error("{} failed".format(task.name), str(task.error) or repr(task.error))
+        elif task.cancelled:
+            self.pending.clear()
+        else:
+            done(task.result)
+            self.open_pending()
+        return False
+
+    def show_error(self, text: str, details: str):
+        dialog = Gtk.MessageDialog(
+            transient_for=self.window,
+            flags=Gtk.DialogFlags.MODAL,
+            message_type=Gtk.MessageType.ERROR,
+            buttons=Gtk.ButtonsType.CLOSE,
+            text=text,
+        )
+        dialog.format_secondary_text(details)
+        dialog.run()
+        dialog.destroy()
+
+    def open_pending(self):
+        if self.pending and self.task is None:
+            self.open_document(self.pending.pop(0))
+
+    def switch_document(self, index: int, previous: Document = None):
+        cards, duelists = self.workspace.activate(index, previous)
+        # Refreshing the widgets fires their handlers, which flag the document as modified.
+        unsaved = self.unsaved
+        self.update_ui(cards, duelists)
+        self.unsaved = unsaved
+        self.update_title()
+        self.update_documents_menu()
+
+    def open_document(self, filename: str):
+        document = self.workspace.find(filename)
+        if document is not None:
+            self.switch_document(self.workspace.index(document))
+            return True
+
+        current = self.workspace.current
+        if filename is None:
+            self.add_document(Document.load(None))
+        elif current is not None and current.save.filename is None and not current.unsaved:
+            # A pristine empty document gets replaced instead of piling up.
+            return self.load_save(filename)
+        else:
+            label = "Loading {}".format(os.path.basename(filename))
+            self.run_task(label, partial(Document.load, filename), self.add_document)
+        return True
+
+    def add_document(self, document: Document):
+        # Another document may have loaded the same file meanwhile.
+        existing = self.workspace.find(document.save.filename)
+        if existing is None:
+            self.workspace.add(document)
+            self.update_watcher()
+            existing = document
+        self.switch_document(self.workspace.index(existing))
+
+    def close_document(self, index: int):
+        document = self.workspace.documents[index]
+        if document.unsaved and self.confirm_data_loss() != Gtk.ResponseType.OK:
+            return False
+        self.workspace.close(index)
+        if not len(self.workspace):
+            self.workspace.add(Document.load(None))
+        self.switch_document(self.workspace.active or 0, document)
+        return True
+
     def load_save(self, filename: str):
+        # Replaces the current document.
         if self.unsaved and self.confirm_data_loss() != Gtk.ResponseType.OK:
             return False
 
         if filename is None:
-            self.save = Save()
+            self.replace_document(Document.load(None), self.workspace.current, self.workspace.current.generation)
         else:
-            with open(filename, 'rb') as fd:
-                self.save = Save.load(fd)
-
-        self.update_ui()
-        self.clear_unsaved()
+            label = "Loading {}".format(os.path.basename(filename))
+            previous = self.workspace.current
+            done = partial(self.replace_document, previous=previous, generation=previous.generation)
+            self.run_task(label, partial(Document.load, filename), done)
         return True
 
+    def replace_document(self, document: Document, previous: Document, generation: int = None):
+        # The user already confirmed the loss of the changes made before the load:
+        # only ask again if the previous document was edited while the new one was loading.
+        edited = generation is None or previous.generation != generation
+        if edited and previous.unsaved and self.confirm_data_loss() != Gtk.ResponseType.OK:
+            return
+        index = self.workspace.index(previous)
+        self.workspace.replace(index, document)
+        self.switch_document(index, previous)
+        self.update_watcher()
+
     def save_save(self, filename: str):
-        with open(filename, 'wb') as fd:
-            self.save.dump(fd)
-        self.clear_unsaved()
+        document = self.workspace.current
+        data = self.save.dumps()
+        label = "Saving {}".format(os.path.basename(filename))
+        self.run_task(label, partial(Document.write, filename, data), partial(self.on_saved, document, filename, data))
+
+    def on_saved(self, document: Document, filename: str, data: bytes, result=None):
+        renamed = filename != document.save.filename
+        document.written(filename, data)
+        if document is self.workspace.current:
+            self.update_title()
+        if renamed:
+            self.update_watcher()
+            self.update_documents_menu()
@@ -0,0 +1,145 @@
+"""
+Access to the resources (user interface, stylesheet, datasets & pools).
+
+Resources are read from a single bundle when available: an uncompressed zip
+archive (RESOURCES_BUNDLE) which is opened & memory-mapped once, members being
+sliced straight out of the mapping afterwards. Without a bundle (e.g. in a
+development tree), they are read through importlib.resources, which also works
+when running from a zipapp.
+
+The bundle must be rebuilt whenever the resources change:
+
+    python -m save_editor_AGB_AY5E.bundle [--zipapp save-editor-AGB-AY5E.pyz]
+
+The zipapp is a single-file build of the command-line tools (no GUI).
+"""
+# This module is imported by models.py: modules only needed for some
+# of its functions (e.g. building the bundle) are imported by them.
+import mmap
+import os
+import struct
+import sys
+import threading
+
+from .metadata import RESOURCES_DIR
+
+
+RESOURCES_BUNDLE = RESOURCES_DIR.parent / "resources.zip"
+
+# Modules left out of the zipapp, as they require GTK.
+GUI_MODULES = ("__main__.py", "application.py")
+
+# Local file header of a zip archive's member (see the ZIP specification):
+# the member's data follows the header, the name & the extra field.
+_LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+
+
+class _Bundle():
+    # Memory-mapped bundle & resource name => (start, end) inside it.
+    data = None
+    members = None
+    lock = threading.Lock()
+
+
+def _load():
+    import zipfile
+    with _Bundle.lock:
+        if _Bundle.members is not None:
+            return
+        members = {}
+        try:
+            with open(RESOURCES_BUNDLE, "rb") as fd:
+                data = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            data = None
+        if data is not None:
+            with zipfile.ZipFile(data) as archive:
+                for info in archive.infolist():
+                    assert info.compress_type == zipfile.ZIP_STORED, info.filename
+                    header = _LOCAL_HEADER.unpack_from(data, info.header_offset)
+                    start = info.header_offset + _LOCAL_HEADER.size + header[-2] + header[-1]
+                    members[info.filename] = (start, start + info.file_size)
+        _Bundle.data = data
+        _Bundle.members = members
+
+
+def map_resource(name: str):
+    """
+    Return (buffer, start, end) for a resource (e.g. "pools/01.txt"), without copying it if possible.
+
+    The buffer supports slicing & find(), e.g. `buffer.find(b"\\n", start, end)`.
+    """
+    if _Bundle.members is None:
+        _load()
+    if name in _Bundle.members:
+        start, end = _Bundle.members[name]
+        return _Bundle.data, start, end
+    import importlib.resources
+    data = importlib.resources.files(__package__).joinpath("resources", *name.split("/")).read_bytes()
+    return data, 0, len(data)
+
+
+def read_bytes(name: str) -> bytes:
+    data, start, end = map_resource(name)
+    return data[start:end]
+
+
+def read_text(name: str) -> str:
+    return read_bytes(name).decode("utf-8")
+
+
+def build_bundle(target=RESOURCES_BUNDLE) -> int:
+    """Bundle the contents of RESOURCES_DIR into `target`. Returns the number of resources."""
+    import io
+    import zipfile
+    from .storage import atomic_write
+
+    names = sorted(path.relative_to(RESOURCES_DIR).as_posix() for path in RESOURCES_DIR.rglob("*") if path.is_file())
+    buffer = io.BytesIO()
+    # Members are stored uncompressed, so that they can be sliced out of the mapping.
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for name in names:
+            archive.write(RESOURCES_DIR / name, name)
+    atomic_write(target, buffer.getvalue())
+    return len(names)
+
+
+def build_zipapp(target, interpreter="/usr/bin/env python3") -> None:
+    """Build a single-file zipapp for the command-line tools (see tools.py)."""
+    import shutil
+    import tempfile
+    import zipapp
+
+    package = RESOURCES_DIR.parent
+    with tempfile.TemporaryDirectory() as staging:
+        destination = os.path.join(staging, package.name)
+        os.mkdir(destination)
+        for path in package.glob("*.py"):
+            if path.name not in GUI_MODULES:
+                shutil.copy2(path, destination)
+        # The resources are members of the zipapp itself.
+        shutil.copytree(RESOURCES_DIR, os.path.join(destination, RESOURCES_DIR.name))
+        zipapp.create_archive(
+            staging, target, interpreter=interpreter,
+            main="{}.tools:main".format(package.name), compressed=True,
+        )
+
+
+def main(argv=None):
+    import argparse
+    from .metadata import __version__
+
+    parser = argparse.ArgumentParser(prog="python -m save_editor_AGB_AY5E.bundle", description="Bundle the resources into a single file.")
+    parser.add_argument('--zipapp', metavar='FILE', help="also build a zipapp for the command-line tools")
+    parser.add_argument('-V', '--version', action='version', version='%(prog)s {}'.format(__version__))
+    opts = parser.parse_args(argv)
+
+    print("{}: {} resources".format(RESOURCES_BUNDLE, build_bundle()))
+    if opts.zipapp:
+        build_zipapp(opts.zipapp)
+        print("{}: {} bytes".format(opts.zipapp, os.path.getsize(opts.zipapp)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
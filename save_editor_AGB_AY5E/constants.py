@@ -1,4 +1,4 @@
-from .models import Card, Duelist, BoosterPack, load_dataset
+import threading
 
 
 class Offsets:
@@ -52,14 +52,31 @@ class FrozenModelDict(dict):
     __setattr__ = __delitem__ = __setitem__ = __delattr__
 
 
-# A frozen dict for the game's cards.
-CARDS = FrozenModelDict(load_dataset('cards', Card))
+# Frozen dicts for the game's cards, duelists & booster packs.
+# The datasets are only parsed the first time they are accessed (PEP 562),
+# so that tools working on the raw data (offsets, checksum, ...) never load them.
+DATASETS = {
+    "CARDS": ("cards", "Card"),
+    "DUELISTS": ("duelists", "Duelist"),
+    "PACKS": ("packs", "BoosterPack"),
+}
+_DATASETS_LOCK = threading.Lock()
 
-# A frozen dict for the game's duelists.
-DUELISTS = FrozenModelDict(load_dataset('duelists', Duelist))
 
-# A frozen dict for the game's duelists.
-PACKS = FrozenModelDict(load_dataset('packs', BoosterPack))
+def __getattr__(name):
+    if name not in DATASETS:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    from . import models
+    with _DATASETS_LOCK:
+        if name not in globals():
+            dataset, model = DATASETS[name]
+            globals()[name] = FrozenModelDict(models.load_dataset(dataset, getattr(models, model)))
+    return globals()[name]
+
+
+def __dir__():
+    return sorted(set(globals()) | set(DATASETS))
+
 
 # Technically, the game contains 820 cards, but the last one (Insect Monster Token)
 # cannot appear in the player's trunk/decks without cheating, hence this limit.
@@ -81,6 +98,23 @@ MAX_TRUNK_COPIES = 0x3F
 # hence the value set below.
 MAX_WON = MAX_LOST = MAX_DRAWN = 99
 
+# Cards that also exist with an alternative artwork in the game.
+# Both variants share the same restrictions (see Card.Limit) when building decks.
+ALTERNATIVE_ARTWORKS = (
+    "Blue-Eyes White Dragon",
+    "Flame Swordsman",
+    "Dark Magician",
+    "Gaia The Fierce Knight",
+    "Celtic Guardian",
+    "Tiger Axe",
+    "Thousand Dragon",
+    "Pendulum Machine",
+    "Launcher Spider",
+)
+
+# Suffix appended to the name of a card's alternative artwork.
+ALTERNATIVE_ARTWORK_SUFFIX = " (alternate artwork)"
+
 # Number of bytes used to store the statistics for a single card.
 SIZE_CARD_STATS         = 4
 
@@ -92,5 +126,7 @@ SIZE_CHECKSUM_INPUT     = 0x10B6
 
 # Various static values.
 VALUE_HEADER            = (0, 0, 1, 0)
+# The header's byte at this offset holds the game's language & may differ from VALUE_HEADER.
+HEADER_LANGUAGE         = 0x0004
 VALUE_STATIC            = (3, )
 VALUE_GAME_ID           = b'DMEX1INT'
@@ -0,0 +1,224 @@
+import functools
+
+from .decks import ExtraDeck, MainDeck, SideDeck
+from .enums import CardType
+from .legality import variant_groups
+
+
+# Smallest main deck allowed to duel.
+MIN_MAIN_DECK = 40
+
+# Card types the ratios in an Objective apply to.
+CATEGORIES = (CardType.MONSTER, CardType.MAGIC, CardType.TRAP)
+
+
+def _number(value) -> int:
+    # Some monsters have "?" as their ATK/DEF.
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+class Objective():
+    """
+    What the deck builder maximizes.
+
+    Each card is worth `atk` times its ATK plus `defense` times its DEF,
+    plus `bonus` for each of `attributes` / `types` it matches.
+    `ratios` maps card types (see CATEGORIES) to the fraction of the main deck
+    they should make up, each card away from those targets costing `penalty`
+    (which, by default, makes the ratios prevail over everything else).
+    """
+
+    def __init__(self, atk=1.0, defense=0.0, attributes=(), types=(), bonus=500.0, ratios=None, penalty=1000000.0):
+        self.atk = atk
+        self.defense = defense
+        self.attributes = frozenset(attributes)
+        self.types = frozenset(types)
+        self.bonus = bonus
+        self.ratios = dict(ratios or {})
+        self.penalty = penalty
+        assert set(self.ratios) <= set(CATEGORIES)
+        assert sum(self.ratios.values()) <= 1.0 + 1e-9
+
+    def score(self, card) -> float:
+        value = self.atk * _number(card.ATK) + self.defense * _number(card.DEF)
+        if card.Attribute in self.attributes:
+            value += self.bonus
+        if card.Type in self.types:
+            value += self.bonus
+        return value
+
+    def targets(self, size: int) -> list:
+        # Number of cards wanted for each category (None when it does not matter).
+        return [round(self.ratios[category] * size) if category in self.ratios else None for category in CATEGORIES]
+
+
+class _Candidates():
+    # Everything about the cards that does not depend on the savegame
+    # nor on the objective, computed once.
+    def __init__(self):
+        groups = variant_groups()
+        cards = groups.cards
+        self.cards = cards
+        self.limits = groups.limits
+        self.fusions = groups.fusions
+        # Variants (alternative artworks) of a card share its limit.
+        self.groups = groups.group
+        self.categories = [
+            CATEGORIES.index(card.CardType) if card.CardType in CATEGORIES else None for card in cards
+        ]
+        self.playable = [card.ID for card in cards if card.ID > 0 and card.Limit.value > 0]
+
+
+@functools.lru_cache(maxsize=None)
+def candidates() -> _Candidates:
+    return _Candidates()
+
+
+class BuildResult():
+    def __init__(self, main, extra, side, score):
+        self.main = main
+        self.extra = extra
+        self.side = side
+        self.score = score
+
+    def __repr__(self):
+        return "<BuildResult (Main: {}, Extra: {}, Side: {}, Score: {})>".format(
+            len(self.main), len(self.extra), len(self.side), self.score)
+
+    def apply(self, stats) -> None:
+        """Replace the decks in `stats` (CardsStats), moving every other copy to the trunk."""
+        stats.move_to_trunk()
+        for deck, attribute in ((self.main, "copiesMain"), (self.extra, "copiesExtra"), (self.side, "copiesSide")):
+            for card in deck:
+                card_stats = stats.cards[card.ID]
+                setattr(card_stats, attribute, getattr(card_stats, attribute) + 1)
+                card_stats.copiesTrunk -= 1
+
+
+class DeckBuilder():
+    """
+    Build the best decks (according to an Objective) from the cards owned in a savegame.
+
+    The game's restrictions are enforced: cards' limits (shared between variants),
+    fusion monsters only going to the extra deck & the decks' sizes. The main
+    deck is filled greedily, then improved by exchanging cards between categories
+    until no exchange helps. Since cards only interact through the categories'
+    counts (and the penalty is convex), that local optimum is the best main deck.
+    """
+
+    def __init__(self, objective: Objective = None, size: int = MIN_MAIN_DECK, side: int = SideDeck.LIMIT, extra: int = ExtraDeck.LIMIT):
+        assert MIN_MAIN_DECK <= size <= MainDeck.LIMIT
+        assert 0 <= side <= SideDeck.LIMIT
+        assert 0 <= extra <= ExtraDeck.LIMIT
+        self.objective = objective or Objective()
+        self.size = size
+        self.side = side
+        self.extra = extra
+
+    def build(self, stats) -> BuildResult:
+        c = candidates()
+        objective = self.objective
+        scores = [objective.score(card) for card in c.cards]
+
+        # Copies that may go into the decks, per card & per group of variants.
+        available = [0] * len(c.cards)
+        for card_id in c.playable:
+            available[card_id] = min(int(stats.cards[card_id]), c.limits[card_id])
+        room = [c.limits[group] for group in c.groups]
+
+        def take(card_id, deck):
+            available[card_id] -= 1
+            room[c.groups[card_id]] -= 1
+            deck.append(card_id)
+
+        def give_back(card_id, deck):
+            available[card_id] += 1
+            room[c.groups[card_id]] += 1
+            deck.remove(card_id)
+
+        def usable(card_id):
+            return available[card_id] > 0 and room[c.groups[card_id]] > 0
+
+        by_score = sorted(c.playable, key=lambda card_id: (-scores[card_id], card_id))
+        pools = [[card_id for card_id in by_score if not c.fusions[card_id] and c.categories[card_id] == index] for index in range(len(CATEGORIES))]
+
+        def best(pool):
+            return next((card_id for card_id in pool if usable(card_id)), None)
+
+        # Greedy start: fill each category up to its target, then complete with the best cards left.
+        targets = objective.targets(self.size)
+        main = []
+        for index, pool in enumerate(pools):
+            for i in range(min(targets[index] or 0, self.size - len(main))):
+                card_id = best(pool)
+                if card_id is None:
+                    break
+                take(card_id, main)
+        while len(main) < self.size:
+            options = [card_id for card_id in (best(pool) for pool in pools) if card_id is not None]
+            if not options:
+                raise ValueError("only {} cards available for the main deck, {} needed".format(len(main), self.size))
+            take(max(options, key=lambda card_id: scores[card_id]), main)
+
+        counts = [0] * len(CATEGORIES)
+        for card_id in main:
+            counts[c.categories[card_id]] += 1
+
+        def penalty(counts):
+            return objective.penalty * sum(
+                abs(count - target) for count, target in zip(counts, targets) if target is not None
+            )
+
+        # Local search: swap the worst card of a category for the best available one of another.
+        improved = True
+        while improved:
+            improved = False
+            current = -penalty(counts)
+            worst = [min((card_id for card_id in main if c.categories[card_id] == index), key=lambda card_id: scores[card_id], default=None) for index in range(len(CATEGORIES))]
+            for out_index, out_id in enumerate(worst):
+                if out_id is None:
+                    continue
+                give_back(out_id, main)
+                counts[out_index] -= 1
+                choice = None
+                for in_index, pool in enumerate(pools):
+                    in_id = best(pool)
+                    if in_id is None or in_id == out_id:
+                        continue
+                    counts[in_index] += 1
+                    gain = scores[in_id] - scores[out_id] - penalty(counts) - current
+                    counts[in_index] -= 1
+                    if gain > 1e-9 and (choice is None or gain > choice[0]):
+                        choice = (gain, in_index, in_id)
+                if choice is None:
+                    take(out_id, main)
+                    counts[out_index] += 1
+                    continue
+                take(choice[2], main)
+                counts[choice[1]] += 1
+                improved = True
+                break
+
+        extra = []
+        for card_id in by_score:
+            if len(extra) >= self.extra:
+                break
+            while c.fusions[card_id] and usable(card_id) and len(extra) < self.extra:
+                take(card_id, extra)
+
+        # The side deck holds the best replacements for the main deck.
+        side = []
+        for card_id in by_score:
+            if len(side) >= self.side:
+                break
+            while not c.fusions[card_id] and usable(card_id) and len(side) < self.side:
+                take(card_id, side)
+
+        decks = (MainDeck(), ExtraDeck(), SideDeck())
+        for deck, ids in zip(decks, (main, extra, side)):
+            deck.extend(c.cards[card_id] for card_id in ids)
+        score = sum(scores[card_id] for card_id in main) - penalty(counts)
+        return BuildResult(*decks, score)
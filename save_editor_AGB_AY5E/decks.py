@@ -1,8 +1,8 @@
 import random
 
-from .constants import CARDS
+from . import bundle
+from . import constants
 from .enums import DeckColor
-from .metadata import RESOURCES_DIR
 from .models import Card
 
 
@@ -60,7 +60,7 @@ class Deck():
 
     def append(self, value):
         if not isinstance(value, Card):
-            value = CARDS[value]
+            value = constants.CARDS[value]
         if len(self.cards) >= self.LIMIT:
             raise IndexError(self.LIMIT)
         self.cards.append(value)
@@ -110,9 +110,7 @@ class InitialDeck(MainDeck):
             self.pick_cards(pool, rule)
 
     def pick_cards(self, pool_number, quantity):
-        poolpath = RESOURCES_DIR / "pools" / "{:02d}.txt".format(pool_number)
-        with poolpath.open("r") as fd:
-            pool = fd.read().splitlines()
+        pool = bundle.read_text("pools/{:02d}.txt".format(pool_number)).splitlines()
         while quantity > 0:
             card = random.choice(pool)
             self.append(card)
@@ -0,0 +1,183 @@
+import os
+import random
+import struct
+
+from .constants import CARDS, DUELISTS, PACKS
+from .constants import MAX_OBTAINABLE_CARDS, MAX_TRUNK_COPIES, MAX_WON, MAX_LOST, MAX_DRAWN
+from .constants import Offsets, VALUE_GAME_ID, VALUE_HEADER, VALUE_STATIC
+from .decks import ExtraDeck, MainDeck, SideDeck
+from .enums import MonsterType, NextNationalChampionshipRound
+from .legality import variant_groups
+from .save import Save
+
+
+class SaveGenerator():
+    """
+    Generate valid (but varied) raw savegames in bulk.
+
+    Every distribution parameter accepts either a fixed value
+    or a (low, high) tuple, in which case a new value is drawn
+    uniformly from that (inclusive) range for each savegame.
+    """
+
+    CARDS_PACKER = struct.Struct('<{}I'.format(len(CARDS)))
+    MAIN_PACKER = struct.Struct('<{}H'.format(MainDeck.LIMIT))
+    SIDE_PACKER = struct.Struct('<{}H'.format(SideDeck.LIMIT))
+    EXTRA_PACKER = struct.Struct('<{}H'.format(ExtraDeck.LIMIT))
+    COUNTERS_PACKER = struct.Struct('<4H')
+    DUELISTS_PACKER = struct.Struct('<{}I'.format(len(DUELISTS)))
+    MISC_PACKER = struct.Struct('<4H')
+    TOURNAMENTS_PACKER = struct.Struct('<2Hb')
+    WORD_PACKER = struct.Struct('<H')
+
+    MAX_DAYS = (Save.MAX_DATE - Save.STARTING_DATE).days
+
+    def __init__(
+        self,
+        seed=None,
+        density=(0.0, 1.0),
+        trunk_copies=(1, 3),
+        main_fill=(0.0, 1.0),
+        side_fill=(0.0, 1.0),
+        extra_fill=(0.0, 1.0),
+        duels=(0, MAX_WON),
+        days=(0, MAX_DAYS),
+    ):
+        self.random = random.Random(seed)
+        self.density = density
+        self.trunk_copies = trunk_copies
+        self.main_fill = main_fill
+        self.side_fill = side_fill
+        self.extra_fill = extra_fill
+        self.duels = duels
+        self.days = days
+
+        # Card #000 is a dummy card and the cards past MAX_OBTAINABLE_CARDS
+        # cannot be obtained without cheating.
+        obtainable = [card for card in CARDS.values() if 0 < card.ID <= MAX_OBTAINABLE_CARDS]
+        playable = [card for card in obtainable if card.Limit.value > 0]
+        self.obtainable = [card.ID for card in obtainable]
+        # Variants (alternative artworks) of a card share its limit.
+        self.groups = variant_groups()
+        self.fusions = [card.ID for card in playable if card.MonsterType == MonsterType.FUSION]
+        self.others = [card.ID for card in playable if card.MonsterType != MonsterType.FUSION]
+        self.packs = [pack.ID for pack in PACKS.values()]
+        self.duelists = [duelist.ID for duelist in DUELISTS.values()]
+
+        # Everything that never changes from one savegame to the next
+        # is written once into the template.
+        self.template = bytearray(Offsets.EOF)
+        struct.pack_into('<{}H'.format(len(VALUE_HEADER)), self.template, Offsets.HEADER, *VALUE_HEADER)
+        self.template[Offsets.GAME_ID:Offsets.CHECKSUM] = VALUE_GAME_ID
+        self.template[Offsets.FINAL_PADDING:] = b'\xFF' * (Offsets.EOF - Offsets.FINAL_PADDING)
+        self.WORD_PACKER.pack_into(self.template, Offsets.STATIC, *VALUE_STATIC)
+
+    def draw(self, spec):
+        if not isinstance(spec, tuple):
+            return spec
+        low, high = spec
+        if isinstance(low, float) or isinstance(high, float):
+            return self.random.uniform(low, high)
+        return self.random.randint(low, high)
+
+    def fill_deck(self, usage, shared, candidates, limit, fill):
+        # `usage` counts the copies of each card in the decks, `shared`
+        # those of each group of variants (indexed by the group's ID).
+        rng = self.random
+        groups = self.groups
+        size = round(limit * min(1.0, max(0.0, self.draw(fill))))
+        pool = list(candidates)
+        deck = []
+        while len(deck) < size and pool:
+            index = rng.randrange(len(pool))
+            card = pool[index]
+            group = groups.group[card]
+            if shared[group] >= groups.limits[group]:
+                # Swap-remove exhausted cards to keep the draws O(1)
+                pool[index] = pool[-1]
+                pool.pop()
+                continue
+            usage[card] += 1
+            shared[group] += 1
+            deck.append(card)
+        deck.sort()
+        return deck
+
+    def generate_one(self) -> bytes:
+        rng = self.random
+        buffer = bytearray(self.template)
+        usage = [0] * len(CARDS)
+        shared = [0] * len(CARDS)
+        words = [0] * len(CARDS)
+
+        main = self.fill_deck(usage, shared, self.others, MainDeck.LIMIT, self.main_fill)
+        side = self.fill_deck(usage, shared, self.others + self.fusions, SideDeck.LIMIT, self.side_fill)
+        extra = self.fill_deck(usage, shared, self.fusions, ExtraDeck.LIMIT, self.extra_fill)
+        for deck, shift in ((main, 10), (side, 12), (extra, 14)):
+            for card in deck:
+                words[card] += 1 << shift
+
+        density = min(1.0, max(0.0, self.draw(self.density)))
+        owned = rng.sample(self.obtainable, round(len(self.obtainable) * density))
+        nbTrunk = 0
+        for card in owned:
+            # There must always be enough room in the trunk to move the cards in use there.
+            copies = min(self.draw(self.trunk_copies), MAX_TRUNK_COPIES - usage[card])
+            words[card] |= copies
+            nbTrunk += copies
+
+        self.CARDS_PACKER.pack_into(buffer, Offsets.STATS_CARDS, *words)
+        self.MAIN_PACKER.pack_into(buffer, Offsets.CARDS_MAIN, *main, *[0] * (MainDeck.LIMIT - len(main)))
+        self.SIDE_PACKER.pack_into(buffer, Offsets.CARDS_SIDE, *side, *[0] * (SideDeck.LIMIT - len(side)))
+        self.EXTRA_PACKER.pack_into(buffer, Offsets.CARDS_EXTRA, *extra, *[0] * (ExtraDeck.LIMIT - len(extra)))
+        self.COUNTERS_PACKER.pack_into(buffer, Offsets.NB_CARDS_TOTAL, nbTrunk, len(main), len(side), len(extra))
+
+        # Same layout as DuelistStats.word
+        duelists = [
+            min(self.draw(self.duels), MAX_WON) |
+            (min(self.draw(self.duels), MAX_LOST) << 11) |
+            (min(self.draw(self.duels), MAX_DRAWN) << 22)
+            for _ in self.duelists
+        ]
+        self.DUELISTS_PACKER.pack_into(buffer, Offsets.STATS_DUELISTS, *duelists)
+
+        days = min(self.draw(self.days), self.MAX_DAYS)
+        self.WORD_PACKER.pack_into(buffer, Offsets.DAYS_ELAPSED, days)
+        self.MISC_PACKER.pack_into(
+            buffer,
+            Offsets.STATIC,
+            *VALUE_STATIC,
+            rng.choice(self.packs),
+            rng.randrange(0xFFFF),
+            rng.choice(self.duelists),
+        )
+        self.TOURNAMENTS_PACKER.pack_into(
+            buffer,
+            Offsets.NAT_CHAMPIONSHIP,
+            rng.choice(list(NextNationalChampionshipRound)).value,
+            rng.randint(0, 1),
+            # The National Championship is held once a year.
+            rng.randint(0, min(100, days // 365)),
+        )
+        self.WORD_PACKER.pack_into(buffer, Offsets.ANNOUNCEMENTS, rng.randint(0, 3))
+        self.WORD_PACKER.pack_into(buffer, Offsets.CHECKSUM, Save.checksum(buffer))
+        return bytes(buffer)
+
+    def generate(self, count=None):
+        """Yield `count` raw savegames (or an infinite stream if `count` is None)."""
+        produced = 0
+        while count is None or produced < count:
+            yield self.generate_one()
+            produced += 1
+
+    __iter__ = generate
+
+    def write(self, directory, count, pattern="{:08d}.sav") -> int:
+        """Write `count` savegames to `directory` and return the number of files written."""
+        os.makedirs(directory, exist_ok=True)
+        written = 0
+        for index, data in enumerate(self.generate(count)):
+            with open(os.path.join(directory, pattern.format(index)), 'wb') as fd:
+                fd.write(data)
+            written += 1
+        return written
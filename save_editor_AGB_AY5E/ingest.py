@@ -0,0 +1,389 @@
+"""
+Ingest the savegames dropped into some directories, e.g. by players or emulators.
+
+    save-editor-AGB-AY5E-ingest --archive archive/ --jsonl saves.jsonl drop1/ drop2/
+
+The directories are scanned continuously. Each new (or modified) file is
+validated once it has not changed for a while, parsed by a pool of worker
+processes and handed over to the sinks, which archive it, index it, export it as JSON...
+Queues between these stages are bounded, so that a slow sink slows the
+scanning down instead of piling files up in memory.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import sys
+import threading
+import time
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from . import serialization
+from .layouts import LAYOUTS, check_integrity
+from .metadata import __version__
+from .save import Save
+from .storage import GroupCommitWriter
+
+
+# Files larger than this are rejected without being read entirely.
+MAX_SIZE = max(layout.size for layout in LAYOUTS)
+
+# With --remove, ingested files are deleted in batches of (at most) this size,
+# once the sinks have made them durable (see Ingester._remove()).
+REMOVE_BATCH = 64
+
+
+class Entry():
+    """
+    A savegame accepted for ingestion.
+
+    Entries are built by the worker processes, which send back the raw data,
+    its digest & dict representation (see the serialization module) rather
+    than a Save. Sinks needing a Save get one parsed on demand. The record is
+    None unless one of the sinks needs it (see JsonlSink.RECORDS).
+    """
+
+    def __init__(self, path, data, digest, record):
+        self.path = path
+        self.data = data
+        self.digest = digest
+        self.record = record
+
+    @property
+    def save(self) -> Save:
+        return Save.loads(self.data, self.path)
+
+    @property
+    def name(self) -> str:
+        # Name of the savegame in the archive.
+        return self.digest.hex() + ".sav"
+
+
+class Rejected(Exception):
+    pass
+
+
+class ArchiveSink():
+    """Copy the savegames to a directory, named after their digest (so duplicates are only stored once)."""
+
+    # Whether the sink needs the entries' records.
+    RECORDS = False
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.writer = GroupCommitWriter()
+
+    def handle(self, entry: Entry) -> None:
+        path = os.path.join(self.directory, entry.name)
+        if not os.path.exists(path):
+            self.writer.write(path, entry.data)
+
+    def flush(self) -> None:
+        self.writer.commit()
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class IndexSink():
+    """Append a line per savegame to a tab-separated index: digest, ingestion time & original path."""
+
+    RECORDS = False
+
+    def __init__(self, filename):
+        self.fp = open(filename, 'a', encoding='utf-8')
+
+    def handle(self, entry: Entry) -> None:
+        self.fp.write("{}\t{}\t{}\n".format(entry.digest.hex(), time.strftime("%Y-%m-%dT%H:%M:%S"), entry.path))
+        self.fp.flush()
+
+    def flush(self) -> None:
+        os.fsync(self.fp.fileno())
+
+    def close(self) -> None:
+        self.fp.close()
+
+
+class JsonlSink():
+    """Export the savegames as JSON lines (see the serialization module)."""
+
+    RECORDS = True
+
+    def __init__(self, filename):
+        self.fp = open(filename, 'a', encoding='utf-8')
+
+    def handle(self, entry: Entry) -> None:
+        self.fp.write(serialization.format_jsonl(entry.record))
+        self.fp.flush()
+
+    def flush(self) -> None:
+        os.fsync(self.fp.fileno())
+
+    def close(self) -> None:
+        self.fp.close()
+
+
+class IngestStats():
+    def __init__(self):
+        self.accepted = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def __str__(self):
+        return "{} accepted, {} rejected, {} failed".format(self.accepted, self.rejected, self.failed)
+
+
+def load_entry(path, record: bool = True) -> Entry:
+    """
+    Read, validate & parse a savegame (raises Rejected for anything else). Runs in the worker processes.
+
+    The entry's record is only built when `record` is True.
+    """
+    with open(path, 'rb') as fd:
+        data = fd.read(MAX_SIZE + 1)
+    if not check_integrity(data):
+        raise Rejected("not a valid savegame (or partially written)")
+    try:
+        save = Save.loads(data, path)
+    except (AssertionError, KeyError, ValueError, IndexError) as e:
+        raise Rejected(repr(e)) from None
+    return Entry(path, data, Save.digest_bytes(data), save.to_dict() if record else None)
+
+
+class Ingester():
+    """
+    Watch directories for new savegames and feed them to `sinks`.
+
+    Sinks are objects with handle(entry), flush() & close() methods and
+    a RECORDS attribute (see ArchiveSink). They are called from a single
+    thread, in the order the savegames were parsed, so they need no locking.
+    flush() must make the entries handled so far durable: with `remove`,
+    files are only deleted once every sink has been flushed. Files are only
+    considered once their last modification is `debounce` seconds old, and
+    files which changed since they were last handled are handled again
+    (e.g. rejected files that were still being written).
+    """
+
+    def __init__(self, directories, sinks, workers: int = None, debounce: float = 1.0, interval: float = 0.5,
+                 queue_size: int = 256, remove: bool = False, report=None):
+        self.directories = list(directories)
+        self.sinks = list(sinks)
+        # Records are only built when a sink needs them.
+        self.records = any(sink.RECORDS for sink in self.sinks)
+        self.workers = workers or os.cpu_count() or 1
+        self.debounce = debounce
+        self.interval = interval
+        self.queue_size = queue_size
+        # Whether to delete the files once every sink handled them.
+        self.remove = remove
+        # Called with (path, message) for the files which could not be ingested.
+        self.report = report or (lambda path, message: None)
+        self.stats = IngestStats()
+        # Path => signature of the file when it was last queued.
+        self.seen = {}
+        self.stopping = None
+
+    def stop(self) -> None:
+        """Stop scanning; the files already queued are still ingested. Must be called from the loop's thread."""
+        if self.stopping is not None:
+            self.stopping.set()
+
+    def scan(self) -> list:
+        """Return the files ready to be ingested, and remember them as seen."""
+        ready = []
+        now = time.time()
+        present = set()
+        for directory in self.directories:
+            try:
+                entries = list(os.scandir(directory))
+            except OSError as e:
+                self.report(directory, e.strerror or repr(e))
+                continue
+            for entry in entries:
+                # Hidden files include the temporary files of atomic writes (see storage.py).
+                if entry.name.startswith(".") or not entry.is_file():
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                present.add(entry.path)
+                signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+                if self.seen.get(entry.path) == signature or now - st.st_mtime < self.debounce:
+                    continue
+                self.seen[entry.path] = signature
+                ready.append(entry.path)
+        # Forget about the files that are gone, so that memory usage stays bounded.
+        for path in self.seen.keys() - present:
+            del self.seen[path]
+        return ready
+
+    async def _scan(self, paths, once):
+        while not self.stopping.is_set():
+            for path in self.scan():
+                # Blocks while the workers are busy (backpressure).
+                await paths.put(path)
+                if self.stopping.is_set():
+                    return
+            if once:
+                return
+            try:
+                await asyncio.wait_for(self.stopping.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _parse(self, loop, executor, paths, entries):
+        while True:
+            path = await paths.get()
+            try:
+                entry = await loop.run_in_executor(executor, load_entry, path, self.records)
+            except Rejected as e:
+                self.stats.rejected += 1
+                self.report(path, str(e))
+            except OSError as e:
+                self.stats.failed += 1
+                self.report(path, e.strerror or repr(e))
+            except Exception as e:
+                # e.g. a worker process that died: the other files are still handled.
+                self.stats.failed += 1
+                self.report(path, repr(e))
+            else:
+                await entries.put(entry)
+            finally:
+                paths.task_done()
+
+    def _dispatch(self, entry):
+        for sink in self.sinks:
+            sink.handle(entry)
+
+    def _remove(self, paths) -> list:
+        # Returns the (path, exception) pairs for the files which could not be removed.
+        for sink in self.sinks:
+            sink.flush()
+        failures = []
+        for path in paths:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                failures.append((path, e))
+        return failures
+
+    async def _sink(self, loop, executor, entries):
+        # Files handled by every sink, but not flushed yet.
+        handled = []
+        while True:
+            entry = await entries.get()
+            try:
+                await loop.run_in_executor(executor, self._dispatch, entry)
+            except Exception as e:
+                # The file is handled again if it changes (or when restarting).
+                self.stats.failed += 1
+                self.report(entry.path, repr(e))
+            else:
+                self.stats.accepted += 1
+                if self.remove:
+                    handled.append(entry.path)
+
+            # Batches are flushed as soon as the pipeline is idle, and in
+            # any case before the queue is reported as drained.
+            if handled and (entries.empty() or len(handled) >= REMOVE_BATCH):
+                batch, handled = handled, []
+                try:
+                    failures = await loop.run_in_executor(executor, self._remove, batch)
+                except Exception as e:
+                    # The sinks could not be flushed: none of the files are removed.
+                    self.stats.failed += 1
+                    self.report(batch[0], "{} files not removed: {!r}".format(len(batch), e))
+                else:
+                    for path, e in failures:
+                        self.stats.failed += 1
+                        self.report(path, "not removed: {}".format(e.strerror or repr(e)))
+            entries.task_done()
+
+    async def run(self, once: bool = False) -> IngestStats:
+        """
+        Ingest savegames until stop() is called (or, with `once`, until
+        the files currently present are ingested), then drain the queues.
+        """
+        loop = asyncio.get_running_loop()
+        self.stopping = asyncio.Event()
+        paths = asyncio.Queue(self.queue_size)
+        entries = asyncio.Queue(self.queue_size)
+        # Parsing is CPU-bound: it goes to processes, so that it is not serialized by the GIL.
+        parsers = ProcessPoolExecutor(max_workers=self.workers)
+        # A single thread calls the sinks.
+        dispatcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-sinks")
+        # Twice as many files as processes are in flight, so that none of them waits for work.
+        tasks = [asyncio.ensure_future(self._parse(loop, parsers, paths, entries)) for _ in range(2 * self.workers)]
+        tasks.append(asyncio.ensure_future(self._sink(loop, dispatcher, entries)))
+        try:
+            await self._scan(paths, once)
+        finally:
+            # Graceful shutdown: whatever was queued goes through the whole pipeline.
+            await paths.join()
+            await entries.join()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            parsers.shutdown()
+            dispatcher.shutdown()
+        return self.stats
+
+    def close(self) -> None:
+        for sink in self.sinks:
+            sink.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="save-editor-AGB-AY5E-ingest", description="Ingest the savegames dropped into some directories.")
+    parser.add_argument('directories', metavar='DIR', nargs="+", help="directories to watch")
+    parser.add_argument('--archive', metavar='DIR', help="copy the savegames to DIR, named after their digest")
+    parser.add_argument('--index', metavar='FILE', help="append the savegames' digest & path to FILE")
+    parser.add_argument('--jsonl', metavar='FILE', help="append the savegames to FILE, as JSON lines")
+    parser.add_argument('--remove', action='store_true', help="delete the savegames once ingested")
+    parser.add_argument('--once', action='store_true', help="ingest the savegames currently present and exit")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="number of worker processes parsing the savegames")
+    parser.add_argument('--debounce', type=float, default=1.0, help="seconds without changes before a file is ingested (default: %(default)s)")
+    parser.add_argument('-V', '--version', action='version', version='%(prog)s {}'.format(__version__))
+    opts = parser.parse_args(argv)
+
+    sinks = []
+    if opts.archive:
+        sinks.append(ArchiveSink(opts.archive))
+    if opts.index:
+        sinks.append(IndexSink(opts.index))
+    if opts.jsonl:
+        sinks.append(JsonlSink(opts.jsonl))
+    if not sinks and not opts.remove:
+        parser.error("nothing to do: use at least one of --archive, --index, --jsonl or --remove")
+
+    lock = threading.Lock()
+
+    def report(path, message):
+        with lock:
+            print("{}: {}".format(path, message), file=sys.stderr)
+
+    ingester = Ingester(opts.directories, sinks, opts.jobs, opts.debounce, remove=opts.remove, report=report)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, ingester.stop)
+        except (NotImplementedError, RuntimeError):
+            # Not supported on Windows: Ctrl+C stops the daemon without draining the queues.
+            pass
+    try:
+        stats = loop.run_until_complete(ingester.run(opts.once))
+    finally:
+        ingester.close()
+        loop.close()
+    print(stats, file=sys.stderr)
+    return 1 if stats.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+"""
+Opt-in timers & counters around the library's most expensive operations.
+
+Instrumentation is disabled by default. It can be turned on either
+by calling `enable()` or by setting the `SAVE_EDITOR_INSTRUMENTATION`
+environment variable to a comma-separated list of options:
+
+*   `1` or `timers`: only collect call counters & timings
+*   `profile`: also capture a cProfile profile for each operation
+*   `memory`: also record the peak memory usage (using tracemalloc) for each operation
+
+When `SAVE_EDITOR_INSTRUMENTATION_OUTPUT` is set as well, the results are written
+to that file when the interpreter exits (as Prometheus text if the file name ends
+with ".prom", as JSON otherwise).
+"""
+import atexit
+import functools
+import inspect
+import os
+import threading
+import time
+
+
+ENV_OPTIONS = "SAVE_EDITOR_INSTRUMENTATION"
+ENV_OUTPUT = "SAVE_EDITOR_INSTRUMENTATION_OUTPUT"
+
+# Checked by every instrumented call: keep this a plain module-level boolean
+# so that the cost of disabled instrumentation is a single global lookup.
+enabled = False
+profiling = False
+memory = False
+
+_lock = threading.Lock()
+_local = threading.local()
+_stats = {}
+# Operation name => pstats.Stats accumulating the profiles of all its calls.
+_profiles = {}
+# Thread currently being profiled, if any (see _start_profiler()).
+_profiled_thread = None
+
+
+class OperationStats():
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        self.peak_memory = 0
+
+    def record(self, elapsed, peak=None):
+        self.calls += 1
+        self.total += elapsed
+        self.min = elapsed if self.min is None else min(self.min, elapsed)
+        self.max = max(self.max, elapsed)
+        if peak is not None:
+            self.peak_memory = max(self.peak_memory, peak)
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "total_seconds": self.total,
+            "min_seconds": self.min or 0.0,
+            "max_seconds": self.max,
+            "mean_seconds": self.total / self.calls if self.calls else 0.0,
+            "peak_memory_bytes": self.peak_memory,
+        }
+
+
+def enable(profile: bool = False, trace_memory: bool = False) -> None:
+    global enabled, profiling, memory
+    profiling = profile
+    memory = trace_memory
+    if memory:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+    enabled = True
+
+
+def disable() -> None:
+    global enabled, profiling, memory
+    enabled = profiling = memory = False
+
+
+def reset() -> None:
+    with _lock:
+        _stats.clear()
+        _profiles.clear()
+
+
+def _start_profiler():
+    # A single profiler may be active at a time (since Python 3.12): when
+    # operations run in parallel (e.g. in a pool of threads), only one of
+    # them gets profiled, the others only get timed.
+    global _profiled_thread
+    import cProfile
+
+    with _lock:
+        if _profiled_thread is not None:
+            return None
+        _profiled_thread = threading.get_ident()
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiling tool is already active.
+        profiler = None
+        _profiled_thread = None
+    return profiler
+
+
+def _begin():
+    # Profiling & memory snapshots only apply to the outermost operation,
+    # because neither cProfile nor tracemalloc's peak can be nested.
+    depth = getattr(_local, "depth", 0)
+    _local.depth = depth + 1
+    profiler = baseline = None
+    if not depth:
+        if memory:
+            import tracemalloc
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        if profiling:
+            profiler = _start_profiler()
+    return depth, profiler, baseline, time.perf_counter()
+
+
+def _end(name, state):
+    global _profiled_thread
+    depth, profiler, baseline, start = state
+    elapsed = time.perf_counter() - start
+    _local.depth = depth
+    peak = None
+    if profiler is not None:
+        profiler.disable()
+    if baseline is not None:
+        # Only report the memory allocated on top of what was already in use
+        import tracemalloc
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+
+    with _lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = OperationStats(name)
+        stats.record(elapsed, peak)
+        if profiler is not None:
+            # Profiles are merged right away, so that memory usage
+            # does not grow with the number of calls.
+            import pstats
+            profile = _profiles.get(name)
+            if profile is None:
+                _profiles[name] = pstats.Stats(profiler)
+            else:
+                profile.add(profiler)
+            _profiled_thread = None
+
+
+def instrumented(name: str):
+    """Decorator recording timings for the wrapped function under the given name."""
+    def decorator(func):
+        if inspect.isgeneratorfunction(func):
+            # For generators, the time spent consuming the values is what matters.
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not enabled:
+                    return (yield from func(*args, **kwargs))
+                state = _begin()
+                try:
+                    return (yield from func(*args, **kwargs))
+                finally:
+                    _end(name, state)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not enabled:
+                    return func(*args, **kwargs)
+                state = _begin()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    _end(name, state)
+        return wrapper
+    return decorator
+
+
+def report() -> dict:
+    with _lock:
+        return {name: stats.as_dict() for name, stats in sorted(_stats.items())}
+
+
+def export_json(fp) -> None:
+    import json
+
+    json.dump({"operations": report()}, fp, indent=2)
+    fp.write("\n")
+
+
+def export_prometheus(fp) -> None:
+    metrics = (
+        ("calls", "save_editor_operation_calls_total", "counter", "Number of calls"),
+        ("total_seconds", "save_editor_operation_seconds_total", "counter", "Total time spent (in seconds)"),
+        ("max_seconds", "save_editor_operation_seconds_max", "gauge", "Slowest call (in seconds)"),
+        ("peak_memory_bytes", "save_editor_operation_peak_memory_bytes", "gauge", "Peak memory usage (in bytes)"),
+    )
+    operations = report()
+    for key, metric, kind, description in metrics:
+        fp.write("# HELP {} {}\n".format(metric, description))
+        fp.write("# TYPE {} {}\n".format(metric, kind))
+        for name, values in operations.items():
+            fp.write('{}{{operation="{}"}} {}\n'.format(metric, name, values[key]))
+
+
+def dump_profiles(directory) -> list:
+    """Write the captured cProfile data (one .prof file per operation) and return their paths."""
+    paths = []
+    os.makedirs(directory, exist_ok=True)
+    with _lock:
+        for name, stats in sorted(_profiles.items()):
+            path = os.path.join(directory, name + ".prof")
+            stats.dump_stats(path)
+            paths.append(path)
+    return paths
+
+
+def _export_at_exit(path):
+    with open(path, "w") as fp:
+        if path.endswith(".prom"):
+            export_prometheus(fp)
+        else:
+            export_json(fp)
+
+
+def _configure_from_environment():
+    options = {opt.strip().lower() for opt in os.environ.get(ENV_OPTIONS, "").split(",")}
+    options.discard("")
+    options.discard("0")
+    if not options:
+        return
+    enable(profile="profile" in options, trace_memory="memory" in options)
+    output = os.environ.get(ENV_OUTPUT)
+    if output:
+        atexit.register(_export_at_exit, output)
+
+
+_configure_from_environment()
@@ -0,0 +1,190 @@
+"""
+Layouts of the savegames, described as data.
+
+Each release of the game is described by a Layout: its game ID and a table
+of the fields making up the savegame (offset & struct format). A Codec is
+generated once per layout, with a precompiled structure for each field,
+and detect() picks the layout matching a savegame's game ID.
+
+Supporting another regional release only requires adding its Layout to LAYOUTS.
+"""
+import functools
+import struct
+
+from .constants import HEADER_LANGUAGE, Offsets, SIZE_CARD_STATS, SIZE_CHECKSUM_INPUT, SIZE_DUELIST_STATS
+from .constants import VALUE_GAME_ID, VALUE_HEADER, VALUE_STATIC
+from .decks import ExtraDeck, MainDeck, SideDeck
+
+
+class Layout():
+    def __init__(self, name, game_code, size, fields, values, checksum_size, language=None):
+        self.name = name
+        self.game_code = game_code
+        # Size of the savegame, in bytes.
+        self.size = size
+        # Field name => (offset, struct format), in the savegame's order.
+        self.fields = dict(fields)
+        # Field name => values of the fields which never change (e.g. the game ID).
+        self.values = dict(values)
+        # Number of 16-bit values covered by the checksum (starting at offset 0).
+        self.checksum_size = checksum_size
+        # Offset of the game's language inside the header, if any.
+        self.language = language
+        assert {"game_id", "checksum"} <= set(self.fields)
+
+    @property
+    def game_id(self) -> bytes:
+        return self.values["game_id"][0]
+
+    def __repr__(self):
+        return "<Layout {} ({})>".format(self.name, self.game_code)
+
+
+INTERNATIONAL = Layout(
+    name="international",
+    game_code="AGB-AY5E",
+    size=Offsets.EOF,
+    fields=(
+        ("header",                  (Offsets.HEADER, '{}H'.format(len(VALUE_HEADER)))),
+        ("cards",                   (Offsets.STATS_CARDS, '{}I'.format((Offsets.PADDING_1 - Offsets.STATS_CARDS) // SIZE_CARD_STATS))),
+        ("main",                    (Offsets.CARDS_MAIN, '{}H'.format(MainDeck.LIMIT))),
+        ("side",                    (Offsets.CARDS_SIDE, '{}H'.format(SideDeck.LIMIT))),
+        ("extra",                   (Offsets.CARDS_EXTRA, '{}H'.format(ExtraDeck.LIMIT))),
+        ("counters",                (Offsets.NB_CARDS_TOTAL, '4H')),
+        ("duelists",                (Offsets.STATS_DUELISTS, '{}I'.format((Offsets.PADDING_3 - Offsets.STATS_DUELISTS) // SIZE_DUELIST_STATS))),
+        ("date",                    (Offsets.DAYS_ELAPSED, 'H')),
+        ("static",                  (Offsets.STATIC, 'H')),
+        ("last_pack",               (Offsets.LAST_PACK, 'H')),
+        ("publication_victories",   (Offsets.PUB_VICTORIES, 'H')),
+        ("last_duelist",            (Offsets.LAST_DUELIST, 'H')),
+        ("nationals_round",         (Offsets.NAT_CHAMPIONSHIP, 'H')),
+        ("grandpa_cup",             (Offsets.GRANDPA_CUP, 'H')),
+        ("nationals_victories",     (Offsets.NAT_VICTORIES, 'b')),
+        ("announcements",           (Offsets.ANNOUNCEMENTS, 'H')),
+        ("game_id",                 (Offsets.GAME_ID, '{}s'.format(len(VALUE_GAME_ID)))),
+        ("checksum",                (Offsets.CHECKSUM, 'H')),
+    ),
+    values={
+        "header": VALUE_HEADER,
+        "static": VALUE_STATIC,
+        "game_id": (VALUE_GAME_ID, ),
+    },
+    checksum_size=SIZE_CHECKSUM_INPUT,
+    language=HEADER_LANGUAGE,
+)
+
+# Known layouts, tried in order by detect().
+LAYOUTS = (INTERNATIONAL, )
+
+# Layout used for new savegames.
+DEFAULT_LAYOUT = INTERNATIONAL
+
+# Fields holding actual data, as opposed to values derived from them,
+# constants & padding (see Save.digest()).
+DIGEST_FIELDS = (
+    "cards", "duelists", "date", "static", "last_pack", "publication_victories", "last_duelist",
+    "nationals_round", "grandpa_cup", "nationals_victories", "announcements",
+)
+
+
+class Slot():
+    """Precompiled accessor for one of the fields in a Layout."""
+
+    __slots__ = ("offset", "packer", "end", "single")
+
+    def __init__(self, offset, fmt):
+        self.offset = offset
+        self.packer = struct.Struct('<' + fmt)
+        self.end = offset + self.packer.size
+        # Fields holding a single value are returned as-is, not as a tuple.
+        self.single = len(self.packer.unpack(bytes(self.packer.size))) == 1
+
+    def get(self, buffer):
+        values = self.packer.unpack_from(buffer, self.offset)
+        return values[0] if self.single else values
+
+    def set(self, buffer, *values) -> None:
+        self.packer.pack_into(buffer, self.offset, *values)
+
+
+class Codec():
+    """
+    Read & write the fields of a Layout.
+
+    Each field is available as an attribute holding its Slot (e.g. `codec.date.get(data)`).
+    """
+
+    def __init__(self, layout: Layout):
+        self.layout = layout
+        self.slots = {name: Slot(offset, fmt) for name, (offset, fmt) in layout.fields.items()}
+        self.__dict__.update(self.slots)
+        self.checksum_input = struct.Struct('<{}H'.format(layout.checksum_size))
+
+        # The data ends with the checksum, padded with 0xFF up to the end of the savegame.
+        self.padding = max(slot.end for slot in self.slots.values())
+        template = bytearray(layout.size)
+        template[self.padding:] = b'\xFF' * (layout.size - self.padding)
+        for name, values in layout.values.items():
+            self.slots[name].set(template, *values)
+        self.slots["checksum"].set(template, self.compute_checksum(template))
+        self.template = bytes(template)
+
+        regions = []
+        for name in DIGEST_FIELDS:
+            slot = self.slots[name]
+            if regions and regions[-1][1] == slot.offset:
+                regions[-1] = (regions[-1][0], slot.end)
+            else:
+                regions.append((slot.offset, slot.end))
+        self.digest_regions = tuple(regions)
+
+    def new_buffer(self) -> bytearray:
+        """Return the contents of an empty savegame (constants & padding filled in)."""
+        return bytearray(self.template)
+
+    def compute_checksum(self, data) -> int:
+        chk = sum(self.checksum_input.unpack_from(data)) & 0xFFFF
+        # The checksum is stored on 16 bits: a sum of 0 yields a checksum of 0 too.
+        return ((chk ^ 0xFFFF) + 1) & 0xFFFF
+
+    def check_header(self, data) -> bool:
+        """Check the savegame's header, whatever the game's language."""
+        slot = self.slots["header"]
+        header = bytearray(data[slot.offset:slot.end])
+        if len(header) != slot.end - slot.offset:
+            return False
+        if self.layout.language is not None:
+            header[self.layout.language - slot.offset] = self.template[self.layout.language]
+        return header == self.template[slot.offset:slot.end]
+
+    def check_padding(self, data) -> bool:
+        return data.count(b'\xFF', self.padding) == len(data) - self.padding
+
+
+@functools.lru_cache(maxsize=None)
+def _codec(layout: Layout) -> Codec:
+    return Codec(layout)
+
+
+def codec(layout: Layout = None) -> Codec:
+    """Return the codec for `layout` (by default, the one used for new savegames)."""
+    return _codec(layout or DEFAULT_LAYOUT)
+
+
+def detect(data) -> Layout:
+    """Return the layout matching the game ID in a savegame's contents (None if unknown)."""
+    for layout in LAYOUTS:
+        offset = layout.fields["game_id"][0]
+        game_id = layout.game_id
+        if data[offset:offset + len(game_id)] == game_id:
+            return layout
+    return None
+
+
+def check_integrity(data) -> bool:
+    """Cheap validation of a savegame's size & checksum, used to skip partially-written files."""
+    layout = detect(data)
+    if layout is None or len(data) != layout.size:
+        return False
+    codec_ = codec(layout)
+    return codec_.checksum.get(data) == codec_.compute_checksum(data)
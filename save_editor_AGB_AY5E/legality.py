@@ -0,0 +1,173 @@
+import functools
+
+from . import constants
+from .constants import ALTERNATIVE_ARTWORKS, ALTERNATIVE_ARTWORK_SUFFIX, MAX_TRUNK_CARDS, MAX_TRUNK_COPIES
+from .decks import ExtraDeck, MainDeck, SideDeck
+from .enums import MonsterType
+
+
+# Where copies of a card can be, and the matching CardStats attributes.
+LOCATIONS = {
+    "trunk": "copiesTrunk",
+    "main": "copiesMain",
+    "side": "copiesSide",
+    "extra": "copiesExtra",
+}
+
+# Maximum number of cards in each location.
+CAPACITIES = {
+    "trunk": MAX_TRUNK_CARDS,
+    "main": MainDeck.LIMIT,
+    "side": SideDeck.LIMIT,
+    "extra": ExtraDeck.LIMIT,
+}
+
+# The number of copies in a deck is stored on 2 bits.
+MAX_DECK_COPIES = 3
+
+
+class VariantGroups():
+    # Variants (alternative artworks) of a card share its restrictions.
+    # Every card belongs to a group, identified by the ID of the original card.
+    def __init__(self):
+        cards = list(constants.CARDS.values())
+        self.cards = cards
+        self.group = list(range(len(cards)))
+        for name in ALTERNATIVE_ARTWORKS:
+            self.group[int(constants.CARDS[name + ALTERNATIVE_ARTWORK_SUFFIX])] = int(constants.CARDS[name])
+
+        self.members = [()] * len(cards)
+        for card_id, group in enumerate(self.group):
+            self.members[group] += (card_id, )
+        self.limits = [card.Limit.value for card in cards]
+        self.fusions = [card.MonsterType == MonsterType.FUSION for card in cards]
+
+    def limit(self, card_id: int) -> int:
+        # Copies of the card (and of its variants) allowed in the decks, altogether.
+        return self.limits[self.group[card_id]]
+
+
+@functools.lru_cache(maxsize=None)
+def variant_groups() -> VariantGroups:
+    return VariantGroups()
+
+
+class LegalityTracker():
+    """
+    Keep track of whether the cards of a savegame respect the game's restrictions.
+
+    Usage counters are kept per group of variants & per location, so that
+    queries are answered in constant time. After changing a card's statistics,
+    call update() with its ID. Any other change (e.g. CardsStats.reset_deck())
+    is detected through the list's own counter (see TrackedList) and triggers
+    a full refresh.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.groups = variant_groups()
+        self.refresh()
+
+    def refresh(self) -> None:
+        groups = self.groups
+        self.totals = dict.fromkeys(LOCATIONS, 0)
+        self.usage = [0] * len(groups.cards)
+        self.copies = [(0, 0, 0, 0)] * len(groups.cards)
+        self.violations = 0
+        for card_id in range(len(groups.cards)):
+            self._add(card_id, 1)
+        self.revision = self.stats.revision
+
+    def _card_violations(self, card_id) -> int:
+        trunk, main, side, extra = self.copies[card_id]
+        res = int(max(main, side, extra) > MAX_DECK_COPIES)
+        res += int(trunk + main + side + extra > MAX_TRUNK_COPIES)
+        res += int(bool(main if self.groups.fusions[card_id] else extra))
+        return res
+
+    def _group_violations(self, group) -> int:
+        return int(self.usage[group] > self.groups.limits[group])
+
+    def _add(self, card_id, sign):
+        # Add (sign=1) or remove (sign=-1) the card's contribution to the counters.
+        group = self.groups.group[card_id]
+        if sign > 0:
+            card = self.stats.cards[card_id]
+            self.copies[card_id] = tuple(getattr(card, attribute) for attribute in LOCATIONS.values())
+        self.violations -= self._group_violations(group)
+        for location, value in zip(LOCATIONS, self.copies[card_id]):
+            self.totals[location] += sign * value
+        self.usage[group] += sign * sum(self.copies[card_id][1:])
+        self.violations += sign * self._card_violations(card_id) + self._group_violations(group)
+
+    def update(self, card_id: int) -> None:
+        """Take into account changes made to the given card's statistics."""
+        card_id = int(card_id)
+        stats = self.stats
+        # Editing a single value of this card moves the list's counter by
+        # exactly one: anything else means other changes happened in the meantime.
+        if stats.revision == self.revision:
+            return
+        if stats.revision != self.revision + 1 or stats.last != card_id:
+            self.refresh()
+            return
+        self._add(card_id, -1)
+        self._add(card_id, 1)
+        self.revision = stats.revision
+
+    def _check(self):
+        if self.revision != self.stats.revision:
+            self.refresh()
+
+    def max_copies(self, card_id: int, location: str) -> int:
+        """Return the highest number of copies of the card allowed in `location` (e.g. "main")."""
+        self._check()
+        card_id = int(card_id)
+        groups = self.groups
+        copies = dict(zip(LOCATIONS, self.copies[card_id]))
+        current = copies[location]
+
+        # There must still be room for this card in the location and in the trunk,
+        # in case all copies were moved there later on.
+        room = min(
+            CAPACITIES[location] - self.totals[location],
+            MAX_TRUNK_COPIES - sum(copies.values()),
+        )
+        if location != "trunk":
+            # Fusion monsters belong in the extra deck rather than in the main
+            # deck, while any card may be in the side deck.
+            if location != "side" and groups.fusions[card_id] != (location == "extra"):
+                return 0
+            group = groups.group[card_id]
+            room = min(
+                room,
+                groups.limits[group] - self.usage[group],
+                MAX_DECK_COPIES - current,
+            )
+        return current + max(0, room)
+
+    def is_legal(self) -> bool:
+        self._check()
+        return not self.violations and all(self.totals[location] <= CAPACITIES[location] for location in LOCATIONS)
+
+    def errors(self) -> list:
+        """Describe every restriction that is not respected (slower than is_legal())."""
+        self._check()
+        groups = self.groups
+        errors = []
+        for card_id, card in enumerate(groups.cards):
+            trunk, main, side, extra = self.copies[card_id]
+            if max(main, side, extra) > MAX_DECK_COPIES:
+                errors.append("{}: more than {} copies in a deck".format(card, MAX_DECK_COPIES))
+            if trunk + main + side + extra > MAX_TRUNK_COPIES:
+                errors.append("{}: more than {} copies".format(card, MAX_TRUNK_COPIES))
+            if groups.fusions[card_id] and main:
+                errors.append("{}: fusion monsters belong in the extra deck".format(card))
+            elif not groups.fusions[card_id] and extra:
+                errors.append("{}: only fusion monsters belong in the extra deck".format(card))
+            if groups.group[card_id] == card_id and self._group_violations(card_id):
+                errors.append("{}: {} copies used, only {} allowed".format(card, self.usage[card_id], groups.limits[card_id]))
+        for location, capacity in CAPACITIES.items():
+            if self.totals[location] > capacity:
+                errors.append("{}: {} cards, only {} allowed".format(location, self.totals[location], capacity))
+        return errors
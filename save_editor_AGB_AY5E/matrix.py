@@ -0,0 +1,293 @@
+import struct
+import sys
+
+from array import array
+from datetime import timedelta
+
+from .constants import CARDS, DUELISTS, PACKS
+from .constants import MAX_OBTAINABLE_CARDS, MAX_TRUNK_CARDS
+from .constants import Offsets, SIZE_CARD_STATS, SIZE_DUELIST_STATS, VALUE_GAME_ID
+from .decks import ExtraDeck, MainDeck, SideDeck
+from .enums import Announcements, NextNationalChampionshipRound
+from .save import Save
+from .stats import CardsStats, DuelistsStats
+
+
+def _table(shift, mask):
+    # Translation table extracting a bitfield from every byte of a byte plane at once.
+    return bytes((value >> shift) & mask for value in range(256))
+
+
+class SaveMatrix():
+    """
+    Column store for a large number of savegames.
+
+    The cards' and duelists' statistics are kept as raw (little-endian) 32-bit words,
+    one row per savegame, while the remaining fields are stored as scalar columns.
+    Bitfields are extracted for a whole column at once by slicing the rows
+    into byte planes and translating them in C.
+    """
+
+    CARD_STRIDE = SIZE_CARD_STATS * len(CARDS)
+    DUELIST_STRIDE = SIZE_DUELIST_STATS * len(DUELISTS)
+
+    # Field name => list of (byte index, shift, mask, multiplier),
+    # following the layouts used by CardStats.word & DuelistStats.word.
+    CARD_FIELDS = {
+        "trunk": ((0, 0, 0xFF, 1), (1, 0, 0x03, 0x100)),
+        "main": ((1, 2, 0x03, 1), ),
+        "side": ((1, 4, 0x03, 1), ),
+        "extra": ((1, 6, 0x03, 1), ),
+        "password": ((2, 1, 0x01, 1), ),
+    }
+    DUELIST_FIELDS = {
+        "won": ((0, 0, 0xFF, 1), (1, 0, 0x07, 0x100)),
+        "lost": ((1, 3, 0x1F, 1), (2, 0, 0x3F, 0x20)),
+        "drawn": ((2, 6, 0x03, 1), (3, 0, 0xFF, 0x04)),
+    }
+
+    # Column name => (offset, struct format)
+    SCALARS = {
+        "days": (Offsets.DAYS_ELAPSED, 'H'),
+        "last_pack": (Offsets.LAST_PACK, 'H'),
+        "publication_victories": (Offsets.PUB_VICTORIES, 'H'),
+        "last_duelist": (Offsets.LAST_DUELIST, 'H'),
+        "nationals_round": (Offsets.NAT_CHAMPIONSHIP, 'H'),
+        "grandpa_cup": (Offsets.GRANDPA_CUP, 'H'),
+        "nationals_victories": (Offsets.NAT_VICTORIES, 'b'),
+        "announcements": (Offsets.ANNOUNCEMENTS, 'H'),
+    }
+
+    TABLES = {}
+
+    def __init__(self):
+        self.cards = bytearray()
+        self.duelists = bytearray()
+        self.scalars = {name: array(fmt) for name, (offset, fmt) in self.SCALARS.items()}
+        self.filenames = []
+        self.unpackers = {name: struct.Struct('<' + fmt) for name, (offset, fmt) in self.SCALARS.items()}
+
+    def __len__(self):
+        return len(self.filenames)
+
+    def append(self, data, filename=None, verify=True) -> None:
+        if verify:
+            # Cheap sanity checks only: use Save.loads() for a full validation.
+            assert len(data) == Offsets.EOF
+            assert data[Offsets.GAME_ID:Offsets.CHECKSUM] == VALUE_GAME_ID
+            assert struct.unpack_from('<H', data, Offsets.CHECKSUM)[0] == Save.checksum(data)
+        self.cards += data[Offsets.STATS_CARDS:Offsets.STATS_CARDS + self.CARD_STRIDE]
+        self.duelists += data[Offsets.STATS_DUELISTS:Offsets.STATS_DUELISTS + self.DUELIST_STRIDE]
+        for name, (offset, fmt) in self.SCALARS.items():
+            self.scalars[name].append(self.unpackers[name].unpack_from(data, offset)[0])
+        self.filenames.append(filename)
+
+    def append_save(self, save: Save) -> None:
+        self.append(save.dumps(), save.filename, False)
+
+    def extend(self, iterable) -> None:
+        for data in iterable:
+            self.append(data)
+
+    @classmethod
+    def from_files(cls, filenames, verify=True) -> "SaveMatrix":
+        matrix = cls()
+        for filename in filenames:
+            with open(filename, 'rb') as fd:
+                matrix.append(fd.read(), filename, verify)
+        return matrix
+
+    def card_words(self) -> memoryview:
+        """Return a N×821 snapshot of the cards' statistics (native byte order)."""
+        return self._words(self.cards, len(CARDS))
+
+    def duelist_words(self) -> memoryview:
+        """Return a N×25 snapshot of the duelists' statistics (native byte order)."""
+        return self._words(self.duelists, len(DUELISTS))
+
+    def _words(self, data, columns):
+        # The words are copied (a single memcpy): a view over the columns themselves
+        # would prevent the matrix from growing for as long as it is alive.
+        data = array('I', data)
+        if sys.byteorder != 'little':
+            data.byteswap()
+        if not len(self):
+            # Views cannot be cast to a shape with zeros in it, but they can be sliced down to one.
+            return memoryview(array('I', [0]) * columns).cast('B').cast('I', (1, columns))[:0]
+        return memoryview(data).cast('B').cast('I', (len(self), columns))
+
+    @classmethod
+    def _planes(cls, data, start, stride, parts):
+        planes = []
+        for index, shift, mask, multiplier in parts:
+            table = cls.TABLES.get((shift, mask))
+            if table is None:
+                table = cls.TABLES[(shift, mask)] = _table(shift, mask)
+            planes.append((data[start + index::stride].translate(table), multiplier))
+        return planes
+
+    @staticmethod
+    def _combine(planes):
+        if len(planes) == 1 and planes[0][1] == 1:
+            # Bytes objects already behave like sequences of integers.
+            return planes[0][0]
+        return [sum(values) for values in zip(*(
+            plane if multiplier == 1 else [value * multiplier for value in plane]
+            for plane, multiplier in planes
+        ))]
+
+    def card_column(self, card, field: str):
+        """Return the value of `field` for the given card in every savegame."""
+        start = int(CARDS[card]) * SIZE_CARD_STATS
+        return self._combine(self._planes(self.cards, start, self.CARD_STRIDE, self.CARD_FIELDS[field]))
+
+    def duelist_column(self, duelist, field: str):
+        """Return the value of `field` for the given duelist in every savegame."""
+        start = int(DUELISTS[duelist]) * SIZE_DUELIST_STATS
+        return self._combine(self._planes(self.duelists, start, self.DUELIST_STRIDE, self.DUELIST_FIELDS[field]))
+
+    def card_total(self, field: str, card=None) -> int:
+        """Sum `field` across all savegames, for a single card or for all of them."""
+        if card is None:
+            planes = self._planes(self.cards, 0, SIZE_CARD_STATS, self.CARD_FIELDS[field])
+        else:
+            start = int(CARDS[card]) * SIZE_CARD_STATS
+            planes = self._planes(self.cards, start, self.CARD_STRIDE, self.CARD_FIELDS[field])
+        return sum(sum(plane) * multiplier for plane, multiplier in planes)
+
+    def duelist_total(self, field: str, duelist=None) -> int:
+        """Sum `field` across all savegames, for a single duelist or for all of them."""
+        if duelist is None:
+            planes = self._planes(self.duelists, 0, SIZE_DUELIST_STATS, self.DUELIST_FIELDS[field])
+        else:
+            start = int(DUELISTS[duelist]) * SIZE_DUELIST_STATS
+            planes = self._planes(self.duelists, start, self.DUELIST_STRIDE, self.DUELIST_FIELDS[field])
+        return sum(sum(plane) * multiplier for plane, multiplier in planes)
+
+    def card_totals_per_save(self, field: str) -> list:
+        """Sum `field` over all the cards, for each savegame."""
+        planes = self._planes(self.cards, 0, SIZE_CARD_STATS, self.CARD_FIELDS[field])
+        columns = len(CARDS)
+        return [
+            sum(sum(plane[start:start + columns]) * multiplier for plane, multiplier in planes)
+            for start in range(0, len(self) * columns, columns)
+        ]
+
+    def owners(self, card) -> list:
+        """Return the indices of the savegames owning at least one copy of the given card."""
+        start = int(CARDS[card]) * SIZE_CARD_STATS
+        # Bits 0-15 hold the number of copies in the trunk & decks.
+        low = self.cards[start::self.CARD_STRIDE]
+        high = self.cards[start + 1::self.CARD_STRIDE]
+        return [index for index, (a, b) in enumerate(zip(low, high)) if a or b]
+
+    def __getitem__(self, index) -> "SaveView":
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return SaveView(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield SaveView(self, index)
+
+
+class SaveView():
+    """Read-only view over a single row of a SaveMatrix, mimicking Save's getters."""
+
+    def __init__(self, matrix: SaveMatrix, index: int):
+        self.matrix = matrix
+        self.index = index
+        self.filename = matrix.filenames[index]
+
+    def _scalar(self, name):
+        return self.matrix.scalars[name][self.index]
+
+    def card_bytes(self) -> bytes:
+        start = self.index * SaveMatrix.CARD_STRIDE
+        return bytes(self.matrix.cards[start:start + SaveMatrix.CARD_STRIDE])
+
+    def duelist_bytes(self) -> bytes:
+        start = self.index * SaveMatrix.DUELIST_STRIDE
+        return bytes(self.matrix.duelists[start:start + SaveMatrix.DUELIST_STRIDE])
+
+    def get_ingame_date(self):
+        return Save.STARTING_DATE + timedelta(days=self._scalar("days"))
+
+    def get_elapsed_days(self) -> int:
+        return self._scalar("days")
+
+    def get_next_national_championship_round(self) -> NextNationalChampionshipRound:
+        return NextNationalChampionshipRound(self._scalar("nationals_round"))
+
+    def get_national_championship_victories(self) -> int:
+        return self._scalar("nationals_victories")
+
+    def get_grandpa_cup_qualification(self) -> bool:
+        return bool(self._scalar("grandpa_cup"))
+
+    def get_cards_stats(self) -> dict:
+        data = self.card_bytes()
+        planes = {
+            field: SaveMatrix._planes(data, 0, SIZE_CARD_STATS, parts)
+            for field, parts in SaveMatrix.CARD_FIELDS.items()
+        }
+        res = {
+            field: sum(sum(plane) * multiplier for plane, multiplier in planes[field])
+            for field in ("trunk", "main", "extra", "side")
+        }
+        res.update({
+            "total": sum(res.values()),
+            "unique": sum(1 for a, b in zip(data[0::SIZE_CARD_STATS], data[1::SIZE_CARD_STATS]) if a or b),
+            "unique_max": MAX_OBTAINABLE_CARDS,
+            "trunk_max": MAX_TRUNK_CARDS,
+            "main_max": MainDeck.LIMIT,
+            "extra_max": ExtraDeck.LIMIT,
+            "side_max": SideDeck.LIMIT,
+        })
+        return res
+
+    def get_detailed_cards_stats(self) -> CardsStats:
+        return CardsStats(self.card_bytes())
+
+    def get_duelists_stats(self) -> dict:
+        data = self.duelist_bytes()
+        res = {
+            field: sum(sum(plane) * multiplier for plane, multiplier in SaveMatrix._planes(data, 0, SIZE_DUELIST_STATS, parts))
+            for field, parts in SaveMatrix.DUELIST_FIELDS.items()
+        }
+        res["total"] = res["won"] + res["drawn"] + res["lost"]
+        return res
+
+    def get_detailed_duelists_stats(self) -> DuelistsStats:
+        return DuelistsStats(self.duelist_bytes())
+
+    def get_last_pack_received(self):
+        return PACKS[self._scalar("last_pack")]
+
+    def get_last_duelist_fought(self):
+        return DUELISTS[self._scalar("last_duelist")]
+
+    def get_victories_since_last_publication(self) -> int:
+        return self._scalar("publication_victories")
+
+    def get_announcements(self) -> Announcements:
+        return Announcements(self._scalar("announcements"))
+
+    def to_save(self) -> Save:
+        save = Save(filename=self.filename)
+        save.cardsStats = self.get_detailed_cards_stats()
+        save.duelistsStats = self.get_detailed_duelists_stats()
+        save.ingameDate = self.get_ingame_date()
+        save.nextNationalChampionshipRound = self.get_next_national_championship_round()
+        save.nationalChampionshipVictories = self.get_national_championship_victories()
+        save.grandpaCupQualification = self.get_grandpa_cup_qualification()
+        save.lastPackReceived = self.get_last_pack_received()
+        save.lastDuelistFought = self.get_last_duelist_fought()
+        save.publicationVictories = self.get_victories_since_last_publication()
+        save.announcements = self.get_announcements()
+        return save
+
+    def dumps(self) -> bytes:
+        return self.to_save().dumps()
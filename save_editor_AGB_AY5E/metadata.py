@@ -1,13 +1,21 @@
 import pathlib
-from importlib.metadata import version, PackageNotFoundError
 
 __game_title__ = "Yu-Gi-Oh! - The Eternal Duelist Soul"
 __game_name__ = "YU-GI-OH!EDS"
 __game_id__ = 'AGB-AY5E'
-try:
-    __version__ = version("save_editor_AGB_AY5E")
-except PackageNotFoundError:
-    __version__ = "dev"
 
 RESOURCES_DIR = pathlib.Path(__file__).parent / "resources"
 
+
+def __getattr__(name):
+    # importlib.metadata is slow to import, so the version
+    # is only looked up when it is actually needed (PEP 562).
+    global __version__
+    if name != "__version__":
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    from importlib.metadata import version, PackageNotFoundError
+    try:
+        __version__ = version("save_editor_AGB_AY5E")
+    except PackageNotFoundError:
+        __version__ = "dev"
+    return __version__
@@ -1,10 +1,13 @@
 import csv
+import functools
+import io
 
 from dataclasses import dataclass
 from typing import Union, get_origin, get_args, get_type_hints
 
+from . import bundle
 from .enums import Attribute, CardType, Level, Limit, MonsterType, Stage, Type
-from .metadata import RESOURCES_DIR
+from .instrumentation import instrumented
 
 
 def NonEmptyString(value):
@@ -23,7 +26,7 @@ def EmptyString(value):
     return None
 
 
-@dataclass
+@dataclass(frozen=True)
 class Model:
     def __int__(self):
         return self.ID
@@ -54,7 +57,12 @@ class Card(Model):
     DEF: Union[NonEmptyString, EmptyString]
     Password: Union[Password, EmptyString]
     Limit: Limit
-    Description: str
+
+    # Descriptions are only needed when displaying a card's details,
+    # so they are kept out of the resident records and loaded on demand.
+    @property
+    def Description(self) -> str:
+        return load_description(self.ID)
 
 
 @dataclass(frozen=True)
@@ -64,12 +72,35 @@ class BoosterPack(Model):
     InternalName: str
 
 
+class _Descriptions():
+    # Resource with one description per line (in the order of the cards' IDs),
+    # memory-mapped as part of the bundle (see bundle.py).
+    data = None
+    offsets = None
+
+
+@functools.lru_cache(maxsize=64)
+def load_description(card_id: int) -> str:
+    if _Descriptions.data is None:
+        data, start, end = bundle.map_resource('descriptions.txt')
+        # Index the start of each line once, using the buffer's (C-level) find().
+        offsets = [start]
+        pos = data.find(b'\n', start, end)
+        while pos != -1:
+            offsets.append(pos + 1)
+            pos = data.find(b'\n', pos + 1, end)
+        _Descriptions.offsets = offsets
+        _Descriptions.data = data
+    offsets = _Descriptions.offsets
+    return _Descriptions.data[offsets[card_id]:offsets[card_id + 1] - 1].decode("utf-8")
+
+
+@instrumented("models.load_dataset")
 def load_dataset(filename: str, model: Model):
     hints = get_type_hints(model)
     fields = set(hints)
     none = None.__class__
-    fullpath = RESOURCES_DIR / (filename + '.csv')
-    with fullpath.open("r", newline="") as fd:
+    with io.StringIO(bundle.read_text(filename + '.csv'), newline="") as fd:
         reader = csv.DictReader(fd, dialect="excel")
 
         for row in reader:
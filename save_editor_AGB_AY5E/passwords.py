@@ -0,0 +1,168 @@
+"""
+Redeem card passwords in bulk.
+
+    save-editor-AGB-AY5E-passwords passwords.txt save1.sav save2.sav...
+
+The password list contains one 8-digit password per line.
+Blank lines and lines starting with "#" are ignored.
+"""
+import argparse
+import functools
+import sys
+
+from . import constants
+from .constants import MAX_TRUNK_CARDS, MAX_TRUNK_COPIES
+from .metadata import __version__
+from .storage import GroupCommitWriter
+
+
+class PasswordIndex():
+    # Password => card, built once from the dataset.
+    def __init__(self):
+        self.cards = {card.Password: card for card in constants.CARDS.values() if card.Password}
+
+    def __contains__(self, password):
+        return password in self.cards
+
+    def __getitem__(self, password):
+        return self.cards[password]
+
+    def get(self, password, default=None):
+        return self.cards.get(password, default)
+
+
+@functools.lru_cache(maxsize=None)
+def password_index() -> PasswordIndex:
+    return PasswordIndex()
+
+
+class PasswordList():
+    """The cards matching a list of passwords, along with the passwords that could not be used."""
+
+    def __init__(self):
+        self.cards = []
+        self.unknown = []
+        self.duplicates = []
+
+    @classmethod
+    def parse(cls, lines) -> "PasswordList":
+        index = password_index()
+        res = cls()
+        seen = set()
+        for lineno, line in enumerate(lines, 1):
+            password = line.strip()
+            if not password or password.startswith("#"):
+                continue
+            card = index.get(password)
+            if card is None:
+                res.unknown.append((lineno, password))
+            elif password in seen:
+                res.duplicates.append((lineno, password))
+            else:
+                seen.add(password)
+                res.cards.append(card)
+        return res
+
+
+class Redemption():
+    def __init__(self):
+        # Cards which were given a new copy, and those whose password
+        # could only be marked as used because the trunk was full.
+        self.added = []
+        self.full = []
+        self.already = []
+
+    def __bool__(self):
+        return bool(self.added or self.full)
+
+
+def redeem(save, cards) -> Redemption:
+    """
+    Redeem the passwords of the given cards in `save`.
+
+    Each card whose password was not used yet gets one more copy in the trunk
+    (unless it already holds MAX_TRUNK_COPIES copies, or the trunk is full)
+    and its password is marked as used.
+    """
+    stats = save.get_detailed_cards_stats()
+    trunk = int(stats)
+    res = Redemption()
+    for card in cards:
+        card_stats = stats.cards[card.ID]
+        if card_stats.password:
+            res.already.append(card)
+            continue
+        if int(card_stats) < MAX_TRUNK_COPIES and trunk < MAX_TRUNK_CARDS:
+            card_stats.copiesTrunk += 1
+            trunk += 1
+            res.added.append(card)
+        else:
+            res.full.append(card)
+        card_stats.password = True
+    return res
+
+
+def redeem_files(filenames, cards, writer=None):
+    """
+    Redeem the passwords in each savegame file, one file at a time.
+
+    Yields (filename, Redemption) pairs. Modified files are written through `writer`
+    (a GroupCommitWriter), or atomically one by one if it is None.
+    """
+    from .save import Save
+    for filename in filenames:
+        with open(filename, 'rb') as fd:
+            save = Save.load(fd)
+        res = redeem(save, cards)
+        if res:
+            save.write(filename, writer=writer)
+        yield filename, res
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="save-editor-AGB-AY5E-passwords", description="Redeem card passwords in savegames.")
+    parser.add_argument('passwords', metavar='PASSWORDS', help="file listing the passwords (- for the standard input)")
+    parser.add_argument('filenames', metavar='FILE', nargs="+", help="savegame files to update")
+    parser.add_argument('-n', '--dry-run', action='store_true', help="report what would be done without writing anything")
+    parser.add_argument('-V', '--version', action='version', version='%(prog)s {}'.format(__version__))
+    opts = parser.parse_args(argv)
+
+    if opts.passwords == "-":
+        passwords = PasswordList.parse(sys.stdin)
+    else:
+        with open(opts.passwords, 'r') as fd:
+            passwords = PasswordList.parse(fd)
+
+    for lineno, password in passwords.unknown:
+        print("{}:{}: unknown password {}".format(opts.passwords, lineno, password), file=sys.stderr)
+    for lineno, password in passwords.duplicates:
+        print("{}:{}: duplicate password {}".format(opts.passwords, lineno, password), file=sys.stderr)
+
+    status = 1 if passwords.unknown else 0
+    writer = _DryRunWriter() if opts.dry_run else GroupCommitWriter()
+    try:
+        for filename in opts.filenames:
+            # A broken file must not prevent the other ones from being updated.
+            try:
+                (_, res), = redeem_files([filename], passwords.cards, writer)
+            except (OSError, AssertionError, KeyError, ValueError, IndexError) as e:
+                print("{}: cannot update the savegame: {!r}".format(filename, e), file=sys.stderr)
+                status = 1
+                continue
+            print("{}: {} added, {} marked as used (no room left), {} already used".format(
+                filename, len(res.added), len(res.full), len(res.already)))
+    finally:
+        writer.close()
+    return status
+
+
+class _DryRunWriter():
+    def write(self, path, data):
+        pass
+
+    def close(self):
+        pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+"""
+Find the savegames matching some conditions, reading only the bytes those conditions need.
+
+    save-editor-AGB-AY5E-query -w 'card[Exodia the Forbidden One].copies > 0' *.sav
+
+Each condition compares a field with a value:
+
+*   `card[NAME or ID].FIELD`, where FIELD is one of trunk, main, side, extra,
+    copies (all of the above) or password (0/1)
+*   `duelist[NAME or ID].FIELD`, where FIELD is one of won, lost or drawn
+*   date (YYYY-MM-DD), last_pack & last_duelist (name or ID), publication_victories,
+    nationals_round (e.g. SEMI_FINAL), grandpa_cup (0/1), nationals_victories & announcements
+
+The supported operators are ==, !=, <, <=, > and >=.
+"""
+import argparse
+import collections
+import contextlib
+import itertools
+import operator
+import os
+import re
+import struct
+import sys
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from . import constants
+from .enums import NextNationalChampionshipRound
+from .layouts import codec
+from .metadata import __version__
+from .save import Save
+from .serialization import tables
+
+
+OPERATORS = {
+    "==": operator.eq,
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+# Field => (shift, mask) inside a card's/duelist's word.
+CARD_BITS = {
+    "trunk": (0, 0x3FF),
+    "main": (10, 0x3),
+    "side": (12, 0x3),
+    "extra": (14, 0x3),
+    "password": (17, 0x1),
+}
+DUELIST_BITS = {
+    "won": (0, 0x7FF),
+    "lost": (11, 0x7FF),
+    "drawn": (22, 0x3FF),
+}
+
+# Fields of the layout which can be compared directly (see layouts.py).
+SETTINGS = ("date", "last_pack", "publication_victories", "last_duelist", "nationals_round", "grandpa_cup", "nationals_victories", "announcements")
+
+# Reads closer than this are merged into a single one.
+MERGE_GAP = 64
+
+_EXPRESSION = re.compile(
+    r'^\s*(?P<field>[a-z_]+)\s*(?:\[(?P<key>[^\]]+)\])?\s*(?:\.\s*(?P<attribute>[a-z]+))?'
+    r'\s*(?P<operator>==|!=|<=|>=|<|>|=)\s*(?P<value>.+?)\s*$'
+)
+
+WORD_PACKER = struct.Struct('<I')
+
+
+class Condition():
+    """A comparison between the value at an offset (extracted by `extract`) and a constant."""
+
+    def __init__(self, text, offset, packer, extract, compare, value):
+        self.text = text
+        self.offset = offset
+        self.packer = packer
+        self.extract = extract
+        self.compare = compare
+        self.value = value
+
+    @property
+    def end(self) -> int:
+        return self.offset + self.packer.size
+
+    def __call__(self, buffer) -> bool:
+        return self.compare(self.extract(self.packer.unpack_from(buffer, self.offset)[0]), self.value)
+
+    def __repr__(self):
+        return "<Condition {!r} ({:#06x})>".format(self.text, self.offset)
+
+
+def _bits(shift, mask):
+    return lambda word: (word >> shift) & mask
+
+
+def _copies(word):
+    return (word & 0x3FF) + ((word >> 10) & 3) + ((word >> 12) & 3) + ((word >> 14) & 3)
+
+
+def _index(kind, key, indices, count):
+    # Rows are looked up by name or by ID.
+    key = key.strip()
+    if key.isdigit() and int(key) < count:
+        return int(key)
+    if key not in indices:
+        raise ValueError("unknown {} {!r}".format(kind, key))
+    return indices[key]
+
+
+def _setting(name, value):
+    value = value.strip()
+    t = tables()
+    if name == "date":
+        return (date.fromisoformat(value) - Save.STARTING_DATE).days if "-" in value else int(value)
+    if name == "last_pack" and not value.isdigit():
+        return t.packsByName[value].ID
+    if name == "last_duelist" and not value.isdigit():
+        return t.duelistIndices[value]
+    if name == "nationals_round" and not value.isdigit():
+        return NextNationalChampionshipRound[value].value
+    if name == "grandpa_cup" and value.lower() in ("true", "false"):
+        return int(value.lower() == "true")
+    return int(value, 0)
+
+
+def compile_condition(text: str, layout=None) -> Condition:
+    """Turn an expression such as "duelist[Yugi Muto].won >= 10" into a Condition."""
+    match = _EXPRESSION.match(text)
+    if match is None:
+        raise ValueError("invalid condition: {!r}".format(text))
+    field, key, attribute, op, value = match.group("field", "key", "attribute", "operator", "value")
+    codec_ = codec(layout)
+    t = tables()
+    compare = OPERATORS[op]
+
+    try:
+        if field in ("card", "duelist"):
+            if key is None or attribute is None:
+                raise ValueError("expected {}[NAME or ID].FIELD".format(field))
+            if field == "card":
+                index = _index("card", key, t.cardIndices, len(t.cardNames))
+                slot, size, bits = codec_.cards, constants.SIZE_CARD_STATS, CARD_BITS
+            else:
+                index = _index("duelist", key, t.duelistIndices, len(t.duelistNames))
+                slot, size, bits = codec_.duelists, constants.SIZE_DUELIST_STATS, DUELIST_BITS
+            if attribute == "copies" and field == "card":
+                extract = _copies
+            elif attribute in bits:
+                extract = _bits(*bits[attribute])
+            else:
+                raise ValueError("unknown {} field {!r}".format(field, attribute))
+            return Condition(text, slot.offset + index * size, WORD_PACKER, extract, compare, int(value, 0))
+
+        if field not in SETTINGS or key is not None or attribute is not None:
+            raise ValueError("unknown field")
+        slot = codec_.slots[field]
+        return Condition(text, slot.offset, slot.packer, int, compare, _setting(field, value))
+    except KeyError as e:
+        raise ValueError("{!r}: unknown {} {}".format(text, field, e)) from None
+    except ValueError as e:
+        raise ValueError("{!r}: {}".format(text, e)) from None
+
+
+class Query():
+    """
+    Conditions on savegames (all of them must hold, or any of them if `any` is True).
+
+    Only the bytes the conditions depend on are read from the files, along with
+    the game ID (so that other files never match), as a few merged reads.
+    """
+
+    def __init__(self, conditions, any=False, layout=None):
+        self.codec = codec(layout)
+        self.conditions = [
+            condition if isinstance(condition, Condition) else compile_condition(condition, layout)
+            for condition in conditions
+        ]
+        self.any = any
+        self.gameID = self.codec.game_id
+        self.plan = self._plan()
+        self._local = threading.local()
+
+    def _plan(self):
+        spans = sorted((condition.offset, condition.end) for condition in self.conditions)
+        spans.append((self.gameID.offset, self.gameID.end))
+        spans.sort()
+        plan = []
+        for start, end in spans:
+            if plan and start - plan[-1][1] <= MERGE_GAP:
+                plan[-1] = (plan[-1][0], max(plan[-1][1], end))
+            else:
+                plan.append((start, end))
+        return plan
+
+    def _buffer(self):
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = self._local.buffer = bytearray(self.codec.layout.size)
+        return buffer
+
+    def evaluate(self, buffer) -> bool:
+        """Evaluate the query on a buffer (only the parts listed in the plan need to be filled in)."""
+        if self.gameID.get(buffer) != self.codec.layout.game_id:
+            return False
+        if self.any:
+            return any(condition(buffer) for condition in self.conditions)
+        return all(condition(buffer) for condition in self.conditions)
+
+    def matches(self, path) -> bool:
+        buffer = self._buffer()
+        fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        try:
+            for start, end in self.plan:
+                data = _pread(fd, end - start, start)
+                if len(data) != end - start:
+                    # Too short to be a savegame.
+                    return False
+                buffer[start:end] = data
+        finally:
+            os.close(fd)
+        return self.evaluate(buffer)
+
+
+def _pread(fd, size, offset) -> bytes:
+    if hasattr(os, "pread"):
+        return os.pread(fd, size, offset)
+    # Each file descriptor is only used by a single thread.
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, size)
+
+
+def query_files(query: Query, paths, jobs: int = None):
+    """
+    Evaluate the query on each file, using a pool of threads.
+
+    Yields (path, result) pairs in the same order as `paths`, where result
+    is a boolean, or the OSError raised while reading the file.
+    """
+    jobs = jobs or min(32, (os.cpu_count() or 1) * 4)
+
+    def run(path):
+        try:
+            return query.matches(path)
+        except OSError as e:
+            return e
+
+    # Only a bounded number of files are in flight, so that results
+    # are streamed even for very large lists of files.
+    pending = collections.deque()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for path in paths:
+            pending.append((path, executor.submit(run, path)))
+            if len(pending) >= jobs * 4:
+                path, future = pending.popleft()
+                yield path, future.result()
+        while pending:
+            path, future = pending.popleft()
+            yield path, future.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="save-editor-AGB-AY5E-query",
+        description="Print the savegames matching some conditions.",
+        # The syntax of the conditions is described in the module's docstring.
+        epilog=__doc__.split("\n\n", 1)[1],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('filenames', metavar='FILE', nargs="*", help="savegame files to search")
+    parser.add_argument('-w', '--where', metavar='CONDITION', action='append', required=True, help="condition the savegames must match (may be repeated)")
+    parser.add_argument('--any', action='store_true', help="match savegames satisfying any of the conditions, instead of all of them")
+    parser.add_argument('-T', '--files-from', metavar='LIST', help="also read the names of the files to search from LIST, one per line (- for the standard input)")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="number of files read in parallel")
+    parser.add_argument('-V', '--version', action='version', version='%(prog)s {}'.format(__version__))
+    opts = parser.parse_args(argv)
+
+    try:
+        query = Query(opts.where, opts.any)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if opts.files_from is None:
+        listing = contextlib.nullcontext(())
+    elif opts.files_from == "-":
+        listing = contextlib.nullcontext(sys.stdin)
+    else:
+        try:
+            listing = open(opts.files_from, 'r')
+        except OSError as e:
+            parser.error("{}: {}".format(opts.files_from, e.strerror or e))
+
+    status = 1
+    with listing as fd:
+        listed = (line.rstrip("\n") for line in fd if line.strip())
+        for path, result in query_files(query, itertools.chain(opts.filenames, listed), opts.jobs):
+            if isinstance(result, OSError):
+                print("{}: {}".format(path, result.strerror or result), file=sys.stderr)
+                status = 2
+            elif result:
+                print(path, flush=True)
+                if status == 1:
+                    status = 0
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
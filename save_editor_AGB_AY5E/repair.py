@@ -0,0 +1,198 @@
+"""
+Repair savegames whose derived data is damaged.
+
+Only the cards' & duelists' statistics (and the other settings) are
+authoritative. Everything derived from them is rebuilt in place in the raw
+buffer: header, decks, counters, final padding & checksum.
+
+    save-editor-AGB-AY5E-repair [--dry-run] save1.sav save2.sav...
+"""
+import argparse
+import struct
+import sys
+
+from collections import namedtuple
+
+from . import constants
+from .constants import HEADER_LANGUAGE, MAX_TRUNK_CARDS, Offsets, VALUE_GAME_ID, VALUE_HEADER
+from .decks import ExtraDeck, MainDeck, SideDeck
+from .enums import Announcements, NextNationalChampionshipRound
+from .legality import variant_groups
+from .metadata import __version__
+from .save import Save
+from .storage import GroupCommitWriter, atomic_write
+
+
+Fix = namedtuple("Fix", ("offset", "description"))
+
+HEADER_PACKER = struct.Struct('<{}H'.format(len(VALUE_HEADER)))
+COUNTERS_PACKER = struct.Struct('<4H')
+CHECKSUM_PACKER = struct.Struct('<H')
+
+# (name, offset, capacity, shift of the 2-bit counter in the cards' words)
+DECKS = (
+    ("main", Offsets.CARDS_MAIN, MainDeck.LIMIT, 10),
+    ("side", Offsets.CARDS_SIDE, SideDeck.LIMIT, 12),
+    ("extra", Offsets.CARDS_EXTRA, ExtraDeck.LIMIT, 14),
+)
+DECK_PACKERS = {capacity: struct.Struct('<{}H'.format(capacity)) for name, offset, capacity, shift in DECKS}
+
+
+class RepairReport():
+    def __init__(self):
+        # Derived data which was rebuilt, and damage to actual data which cannot be repaired.
+        self.fixes = []
+        self.problems = []
+
+    def __bool__(self):
+        return bool(self.fixes)
+
+    @property
+    def repairable(self) -> bool:
+        return not self.problems
+
+
+def _fix(report, offset, description):
+    report.fixes.append(Fix(offset, description))
+
+
+def repair(buffer: bytearray) -> RepairReport:
+    """Rebuild the derived regions of a raw savegame, in place."""
+    report = RepairReport()
+
+    if bytes(buffer[Offsets.GAME_ID:Offsets.CHECKSUM]) != VALUE_GAME_ID:
+        # Most likely not a savegame for this game: leave it alone.
+        report.problems.append("invalid game ID")
+        return report
+
+    if len(buffer) != Offsets.EOF:
+        _fix(report, Offsets.EOF, "file size was {:#x} bytes".format(len(buffer)))
+        if len(buffer) > Offsets.EOF:
+            del buffer[Offsets.EOF:]
+        else:
+            buffer.extend(b'\xFF' * (Offsets.EOF - len(buffer)))
+
+    if not Save.check_header(buffer):
+        # The game's language is kept.
+        language = buffer[HEADER_LANGUAGE]
+        HEADER_PACKER.pack_into(buffer, Offsets.HEADER, *VALUE_HEADER)
+        buffer[HEADER_LANGUAGE] = language
+        _fix(report, Offsets.HEADER, "header")
+
+    words = struct.unpack_from('<{}I'.format(len(constants.CARDS)), buffer, Offsets.STATS_CARDS)
+    cards = list(constants.CARDS.values())
+
+    # The cards' statistics are authoritative, but may break the game's rules
+    # in ways that no amount of repairing can fix.
+    groups = variant_groups()
+    usage = [0] * len(words)
+    for card_id, word in enumerate(words):
+        usage[groups.group[card_id]] += ((word >> 10) & 3) + ((word >> 12) & 3) + ((word >> 14) & 3)
+    for group, used in enumerate(usage):
+        if used > groups.limits[group]:
+            report.problems.append("{}: {} copies used, only {} allowed".format(cards[group], used, groups.limits[group]))
+
+    settings = (
+        ("last pack", Offsets.LAST_PACK, {pack.ID for pack in constants.PACKS.values()}),
+        ("last duelist", Offsets.LAST_DUELIST, {duelist.ID for duelist in constants.DUELISTS.values()}),
+        ("national championship round", Offsets.NAT_CHAMPIONSHIP, {value.value for value in NextNationalChampionshipRound}),
+        ("announcements", Offsets.ANNOUNCEMENTS, range(Announcements.ALL + 1)),
+    )
+    for name, offset, valid in settings:
+        value = struct.unpack_from('<H', buffer, offset)[0]
+        if value not in valid:
+            report.problems.append("invalid {}: {}".format(name, value))
+
+    trunk = sum(word & 0x3FF for word in words)
+    if trunk > MAX_TRUNK_CARDS:
+        report.problems.append("trunk: {} cards, only {} allowed".format(trunk, MAX_TRUNK_CARDS))
+
+    counters = [trunk]
+    for name, offset, capacity, shift in DECKS:
+        deck = []
+        for card_id, word in enumerate(words):
+            copies = (word >> shift) & 3
+            if copies:
+                deck += [card_id] * copies
+        counters.append(len(deck))
+        if len(deck) > capacity:
+            report.problems.append("{} deck: {} cards, only {} allowed".format(name, len(deck), capacity))
+            continue
+
+        # The game does not care about the order of the cards in the decks,
+        # only about their contents and the unused slots being cleared.
+        packer = DECK_PACKERS[capacity]
+        current = packer.unpack_from(buffer, offset)
+        expected = deck + [0] * (capacity - len(deck))
+        if sorted(current[:len(deck)]) != deck:
+            packer.pack_into(buffer, offset, *expected)
+            _fix(report, offset, "{} deck rebuilt from the cards' statistics".format(name))
+        elif any(current[len(deck):]):
+            packer.pack_into(buffer, offset, *current[:len(deck)], *expected[len(deck):])
+            _fix(report, offset, "unused slots of the {} deck cleared".format(name))
+
+    current = COUNTERS_PACKER.unpack_from(buffer, Offsets.NB_CARDS_TOTAL)
+    if not report.problems and list(current) != counters:
+        COUNTERS_PACKER.pack_into(buffer, Offsets.NB_CARDS_TOTAL, *counters)
+        _fix(report, Offsets.NB_CARDS_TOTAL, "card counters were {}, now {}".format(list(current), counters))
+
+    size = Offsets.EOF - Offsets.FINAL_PADDING
+    if buffer.count(b'\xFF', Offsets.FINAL_PADDING) != size:
+        buffer[Offsets.FINAL_PADDING:] = b'\xFF' * size
+        _fix(report, Offsets.FINAL_PADDING, "final padding")
+
+    checksum = Save.checksum(buffer)
+    if CHECKSUM_PACKER.unpack_from(buffer, Offsets.CHECKSUM)[0] != checksum:
+        CHECKSUM_PACKER.pack_into(buffer, Offsets.CHECKSUM, checksum)
+        _fix(report, Offsets.CHECKSUM, "checksum")
+    return report
+
+
+def repair_files(filenames, writer=None, dry_run=False):
+    """
+    Repair savegame files one at a time, yielding (filename, RepairReport) pairs.
+
+    Files are only written back when something was fixed and nothing
+    is beyond repair, through `writer` (a GroupCommitWriter) if given.
+    """
+    for filename in filenames:
+        with open(filename, 'rb') as fd:
+            buffer = bytearray(fd.read())
+        report = repair(buffer)
+        if report and report.repairable and not dry_run:
+            if writer is None:
+                atomic_write(filename, buffer)
+            else:
+                writer.write(filename, buffer)
+        yield filename, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="save-editor-AGB-AY5E-repair", description="Repair damaged savegames.")
+    parser.add_argument('filenames', metavar='FILE', nargs="+", help="savegame files to repair")
+    parser.add_argument('-n', '--dry-run', action='store_true', help="report what would be done without writing anything")
+    parser.add_argument('-q', '--quiet', action='store_true', help="only report files which need repairs")
+    parser.add_argument('-V', '--version', action='version', version='%(prog)s {}'.format(__version__))
+    opts = parser.parse_args(argv)
+
+    status = 0
+    with GroupCommitWriter() as writer:
+        for filename in opts.filenames:
+            try:
+                (_, report), = repair_files([filename], writer, opts.dry_run)
+            except OSError as e:
+                print("{}: {!r}".format(filename, e), file=sys.stderr)
+                status = 1
+                continue
+            for problem in report.problems:
+                print("{}: cannot repair: {}".format(filename, problem), file=sys.stderr)
+                status = 1
+            for fix in report.fixes:
+                print("{}: {:#06x}: {}".format(filename, fix.offset, fix.description))
+            if not report.fixes and not report.problems and not opts.quiet:
+                print("{}: OK".format(filename))
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
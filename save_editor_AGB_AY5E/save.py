@@ -1,15 +1,21 @@
+import hashlib
 import struct
+import threading
 
 from datetime import date, timedelta
 
-from .constants import DUELISTS, PACKS
+from . import constants
 from .constants import MAX_OBTAINABLE_CARDS, MAX_TRUNK_CARDS
-from .constants import Offsets, SIZE_CHECKSUM_INPUT
-from .constants import VALUE_GAME_ID, VALUE_HEADER, VALUE_STATIC
+from .constants import SIZE_CARD_STATS, SIZE_DUELIST_STATS
 from .decks import ExtraDeck, MainDeck, SideDeck
 from .enums import Announcements, NextNationalChampionshipRound, MonsterType
+from .instrumentation import instrumented
+from .layouts import codec, detect
 from .models import BoosterPack, Duelist
-from .stats import CardsStats, DuelistsStats
+from . import serialization
+from .stats import CardsStats, DuelistsStats, TrackedStats
+from .storage import GroupCommitWriter, atomic_write
+from .transaction import SaveTransaction
 
 
 class Save():
@@ -23,125 +29,344 @@ class Save():
     # In reality, the game will stop incrementing the date as soon as December 31st, 2100 is reached.
     MAX_DATE = date(2100, 12, 31)
 
-    def __init__(self, data=None, filename=None):
-        self.cardsStats = CardsStats(data[Offsets.STATS_CARDS:] if data else None)
-        self.duelistsStats = DuelistsStats(data[Offsets.STATS_DUELISTS:] if data else None)
+    CHECKSUM_PACKER = struct.Struct('<H')
+    WORD_PACKER = struct.Struct('<I')
+    LANGUAGE_PACKER = struct.Struct('<B')
+
+    # Bits of a card's word which hold the number of copies in the decks.
+    DECK_BITS = 0xFC00
+
+    # Attribute => field of the layout (see layouts.py) for the settings.
+    SETTINGS = {
+        "ingameDate": "date",
+        "lastPackReceived": "last_pack",
+        "publicationVictories": "publication_victories",
+        "lastDuelistFought": "last_duelist",
+        "nextNationalChampionshipRound": "nationals_round",
+        "grandpaCupQualification": "grandpa_cup",
+        "nationalChampionshipVictories": "nationals_victories",
+        "announcements": "announcements",
+    }
+
+    _LOCAL = threading.local()
+
+    # Keeps only the "password used" flag (bit 17) in the third byte of a card's word.
+    DIGEST_PASSWORD_TABLE = bytes(value & 0x02 for value in range(256))
+
+    @instrumented("Save.__init__")
+    def __init__(self, data=None, filename=None, layout=None):
+        # The layout is detected from the game ID when loading a savegame.
+        if data:
+            layout = detect(data)
+            assert layout is not None and len(data) == layout.size
+        codec_ = codec(layout)
+
+        # The savegame's original contents (the base layer) and the names
+        # of the attributes modified since then (the overlay, along with
+        # the cards' & duelists' own overlays). See dumps_into().
+        self.__dict__.update(codec=codec_, base=None, edits=set())
+        self.cardsStats = CardsStats(data[codec_.cards.offset:codec_.cards.end] if data else None)
+        self.duelistsStats = DuelistsStats(data[codec_.duelists.offset:codec_.duelists.end] if data else None)
         self.ingameDate = date(self.STARTING_DATE.year, self.STARTING_DATE.month, self.STARTING_DATE.day)
         self.nextNationalChampionshipRound = NextNationalChampionshipRound.ROUND_1
         self.filename = filename
-        self.lastPackReceived = PACKS[0]
-        self.lastDuelistFought = DUELISTS[0]
+        self.lastPackReceived = constants.PACKS[0]
+        self.lastDuelistFought = constants.DUELISTS[0]
         self.publicationVictories = 0
         self.nationalChampionshipVictories = 0
         self.grandpaCupQualification = False
         self.announcements = Announcements.NONE
+        # The game's language, stored in the header (None if the layout has no such byte).
+        language = codec_.layout.language
+        self.language = None if language is None else (data or codec_.template)[language]
 
         if data:
             mainDeck = MainDeck()
             extraDeck = ExtraDeck()
             sideDeck = SideDeck()
 
-            nbTrunkCards, nbMainCards, nbSideCards, nbExtraCards = struct.unpack('<4H', data[Offsets.NB_CARDS_TOTAL:Offsets.PADDING_2])
-            mainDeck.extend(struct.unpack_from('<{}H'.format(nbMainCards), data[Offsets.CARDS_MAIN:Offsets.CARDS_MAIN + 2*nbMainCards]))
-            sideDeck.extend(struct.unpack_from('<{}H'.format(nbSideCards), data[Offsets.CARDS_SIDE:Offsets.CARDS_SIDE + 2*nbSideCards]))
-            extraDeck.extend(struct.unpack_from('<{}H'.format(nbExtraCards), data[Offsets.CARDS_EXTRA:Offsets.CARDS_EXTRA + 2*nbExtraCards]))
+            nbTrunkCards, nbMainCards, nbSideCards, nbExtraCards = codec_.counters.get(data)
+            mainDeck.extend(codec_.main.get(data)[:nbMainCards])
+            sideDeck.extend(codec_.side.get(data)[:nbSideCards])
+            extraDeck.extend(codec_.extra.get(data)[:nbExtraCards])
 
-            daysElapsed = struct.unpack('<H', data[Offsets.DAYS_ELAPSED:Offsets.STATIC])[0]
-            self.ingameDate += timedelta(days=daysElapsed)
-            lastPackReceived = struct.unpack('<H', data[Offsets.LAST_PACK:Offsets.PUB_VICTORIES])[0]
-            self.lastPackReceived = PACKS[lastPackReceived]
-            self.publicationVictories = struct.unpack('<H', data[Offsets.PUB_VICTORIES:Offsets.LAST_DUELIST])[0]
-            lastDuelistFought = struct.unpack('<H', data[Offsets.LAST_DUELIST:Offsets.PADDING_4])[0]
-            self.lastDuelistFought = DUELISTS[lastDuelistFought]
+            self.ingameDate += timedelta(days=codec_.date.get(data))
+            self.lastPackReceived = constants.PACKS[codec_.last_pack.get(data)]
+            self.publicationVictories = codec_.publication_victories.get(data)
+            self.lastDuelistFought = constants.DUELISTS[codec_.last_duelist.get(data)]
 
-            nextNationalChampionshipRound = struct.unpack('<H', data[Offsets.NAT_CHAMPIONSHIP:Offsets.GRANDPA_CUP])[0]
-            self.nextNationalChampionshipRound = NextNationalChampionshipRound(nextNationalChampionshipRound)
-            grandpaCupQualification = struct.unpack('<H', data[Offsets.GRANDPA_CUP:Offsets.NAT_VICTORIES])[0]
-            self.grandpaCupQualification = bool(grandpaCupQualification)
-            self.nationalChampionshipVictories = struct.unpack('<b', data[Offsets.NAT_VICTORIES:Offsets.PADDING_5])[0]
+            self.nextNationalChampionshipRound = NextNationalChampionshipRound(codec_.nationals_round.get(data))
+            self.grandpaCupQualification = bool(codec_.grandpa_cup.get(data))
+            self.nationalChampionshipVictories = codec_.nationals_victories.get(data)
 
-            announcements = struct.unpack('<H', data[Offsets.ANNOUNCEMENTS:Offsets.GAME_ID])[0]
-            self.announcements = Announcements(announcements)
+            self.announcements = Announcements(codec_.announcements.get(data))
 
             self.validate(data, mainDeck, extraDeck, sideDeck, nbTrunkCards, nbMainCards, nbSideCards, nbExtraCards)
+            self.__dict__["digestCache"] = (TrackedStats.generation, self.digest_bytes(data, layout))
+            self.__dict__["base"] = bytes(data)
+            self.edits.clear()
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name != "filename":
+            self.__dict__["digestCache"] = None
+            self.edits.add(name)
+
+    def __eq__(self, other):
+        if not isinstance(other, Save):
+            return NotImplemented
+        return self.digest() == other.digest()
+
+    def __hash__(self):
+        return int.from_bytes(self.digest()[:8], 'little')
+
+    @property
+    def layout(self):
+        return self.codec.layout
+
+    @classmethod
+    def digest_bytes(cls, data, layout=None) -> bytes:
+        """Compute the digest of a savegame straight from its raw contents, without parsing it."""
+        # Only the parts of the savegame that hold actual data (see layouts.DIGEST_FIELDS)
+        # are taken into account, so that equivalent savegames compare equal.
+        regions = codec(layout or detect(data)).digest_regions
+        view = memoryview(data)
+        start, end = regions[0]
+        # Bits from the cards' words that are not handled by the editor are ignored.
+        cards = bytearray(view[start:end])
+        cards[2::SIZE_CARD_STATS] = cards[2::SIZE_CARD_STATS].translate(cls.DIGEST_PASSWORD_TABLE)
+        cards[3::SIZE_CARD_STATS] = bytes(len(cards) // SIZE_CARD_STATS)
+        digest = hashlib.blake2b(cards, digest_size=16)
+        for start, end in regions[1:]:
+            digest.update(view[start:end])
+        return digest.digest()
+
+    @classmethod
+    def digest_file(cls, filename) -> bytes:
+        with open(filename, 'rb') as fd:
+            return cls.digest_bytes(fd.read())
+
+    def digest(self) -> bytes:
+        """
+        Return a digest of the savegame's contents.
+
+        The digest is cached and only recomputed after the Save or its statistics
+        have been modified. Note that changes made to the lists of statistics
+        themselves (e.g. replacing an item in CardsStats.cards) are not tracked.
+        """
+        cache = self.__dict__.get("digestCache")
+        if cache is None or cache[0] != TrackedStats.generation:
+            generation = TrackedStats.generation
+            buffer = self.get_buffer()
+            self.dumps_into(buffer)
+            cache = self.__dict__["digestCache"] = (generation, self.digest_bytes(buffer, self.layout))
+        return cache[1]
 
     def dump(self, fp) -> None:
-        fp.write(self.dumps())
+        buffer = self.get_buffer()
+        self.dumps_into(buffer)
+        fp.write(buffer)
         self.filename = fp.name
 
+    def write(self, filename, backup: bool = False, writer: GroupCommitWriter = None) -> None:
+        """Atomically write the savegame to `filename` (through `writer` for batches, if given)."""
+        buffer = self.get_buffer()
+        self.dumps_into(buffer)
+        if writer is None:
+            atomic_write(filename, buffer, backup)
+        else:
+            writer.write(filename, buffer)
+        self.filename = filename
+
+    @instrumented("Save.dumps")
     def dumps(self) -> bytes:
-        main, extra, side = self.cardsStats.as_decks()
-        nbMain = len(main)
-        nbExtra = len(extra)
-        nbSide = len(side)
-        cardSize = struct.calcsize('<H')
-
-        # The calls to ljust() allow us to pad the stats with NUL bytes
-        # to match the game's expectations.
-        cardsStats = bytes(self.cardsStats).ljust(Offsets.CARDS_MAIN - Offsets.STATS_CARDS, b'\x00')
-        duelistsStats = bytes(self.duelistsStats).ljust(Offsets.DAYS_ELAPSED - Offsets.STATS_DUELISTS, b'\x00')
-
-        fmt = (
-            '<'         # Little-endian
-            '{}H'       # Header
-            '{}s'       # Cards stats (+ padding #1)
-            '{}H{}x'    # Main cards
-            '{}H{}x'    # Side cards
-            '{}H{}x'    # Extra cards
-            '4H'        # Counters for trunk, main, side, extra
-            '2x'        # Padding #2
-            '{}s'       # Duelists stats (+ padding #3)
-            'H'         # In-game days elapsed
-            'H'         # Static value (3 = game initialized)
-            'H'         # ID of last received booster pack
-            'H'         # Number of victories since last publication
-            'H'         # ID of last duelist fought
-            '4x'        # Padding #4
-            'H'         # National Championship qualification
-            'H'         # Grandpa Cup qualification
-            'b'         # Number of victories in National Championship
-            'x'         # Padding #5
-            'H'         # Announcements
-            '{}s'       # Game ID
-        )
-        fmt = fmt.format(
-            len(VALUE_HEADER),                                  # Header
-            len(cardsStats),                                    # Cards stats + padding #1
-            nbMain, (MainDeck.LIMIT - nbMain) * cardSize,       # Main cards
-            nbSide, (SideDeck.LIMIT - nbSide) * cardSize,       # Side cards
-            nbExtra, (ExtraDeck.LIMIT - nbExtra) * cardSize,    # Extra cards
-            len(duelistsStats),                                 # Duelists stats + padding #3
-            len(VALUE_GAME_ID),                                 # Game ID
+        buffer = self.get_buffer()
+        self.dumps_into(buffer)
+        return bytes(buffer)
+
+    @staticmethod
+    def new_buffer(layout=None) -> bytearray:
+        """Return a buffer suitable for dumps_into(), with the constants & final padding already filled in."""
+        return codec(layout).new_buffer()
+
+    def get_buffer(self) -> bytearray:
+        # One reusable buffer per thread & layout, so that dumping saves in a loop does not allocate.
+        buffers = self._LOCAL.__dict__.setdefault("buffers", {})
+        buffer = buffers.get(self.layout)
+        if buffer is None:
+            buffer = buffers[self.layout] = self.codec.new_buffer()
+        return buffer
+
+    def dumps_into(self, buffer) -> None:
+        """Serialize the savegame into a buffer obtained from new_buffer()."""
+        cards = self.cardsStats.overlay
+        duelists = self.duelistsStats.overlay
+        if self.base is None:
+            self.pack_into(buffer)
+        else:
+            buffer[:len(self.base)] = self.base
+            if not (self.edits or cards or duelists):
+                return
+            self.patch_into(buffer)
+
+        # The result becomes the new base layer, so that the cost
+        # of the next serialization only depends on the next edits.
+        self.__dict__["base"] = bytes(buffer[:self.layout.size])
+        self.edits.clear()
+        cards.clear()
+        duelists.clear()
+
+    def get_decks(self):
+        """Return the IDs of the cards in the main, extra & side decks."""
+        main = []
+        extra = []
+        side = []
+        for card in self.cardsStats:
+            if card.copiesMain:
+                main += [card.card.ID] * card.copiesMain
+            if card.copiesExtra:
+                extra += [card.card.ID] * card.copiesExtra
+            if card.copiesSide:
+                side += [card.card.ID] * card.copiesSide
+        for deck, limit in ((main, MainDeck.LIMIT), (extra, ExtraDeck.LIMIT), (side, SideDeck.LIMIT)):
+            if len(deck) > limit:
+                raise IndexError(limit)
+        return main, extra, side
+
+    def get_deck_order(self):
+        """Return the IDs of the cards in the main, extra & side decks, in the order they are stored in."""
+        buffer = self.get_buffer()
+        self.dumps_into(buffer)
+        codec_ = self.codec
+        nbTrunkCards, nbMainCards, nbSideCards, nbExtraCards = codec_.counters.get(buffer)
+        return (
+            list(codec_.main.get(buffer)[:nbMainCards]),
+            list(codec_.extra.get(buffer)[:nbExtraCards]),
+            list(codec_.side.get(buffer)[:nbSideCards]),
         )
-        args = [
-            *VALUE_HEADER,
-            cardsStats,
-            *main,
-            *side,
-            *extra,
-            int(self.cardsStats),
-            len(main),
-            len(side),
-            len(extra),
-            duelistsStats,
-            (self.ingameDate - self.STARTING_DATE).days,
-            *VALUE_STATIC,
-            self.lastPackReceived,
-            self.publicationVictories,
-            self.lastDuelistFought,
-            self.nextNationalChampionshipRound,
-            int(self.grandpaCupQualification),
-            self.nationalChampionshipVictories,
-            self.announcements,
-            VALUE_GAME_ID,
-        ]
-
-        data = [struct.pack(fmt, *args)]
-        data.extend([
-            struct.pack('<H', self.checksum(data[0])),
-            b'\xFF' * (Offsets.EOF - Offsets.FINAL_PADDING),
-        ])
-        return b''.join(data)
+
+    def set_deck_order(self, main, extra, side) -> None:
+        """
+        Change the order of the cards inside the decks.
+
+        The decks must hold the same cards as get_decks() returns. The order is
+        kept until the contents of the decks change (see patch_into()).
+        """
+        decks = (list(main), list(extra), list(side))
+        for name, deck, expected in zip(("main", "extra", "side"), decks, self.get_decks()):
+            if sorted(deck) != expected:
+                raise ValueError("{} deck: the cards do not match the statistics".format(name))
+
+        # The order becomes part of the base layer.
+        codec_ = self.codec
+        buffer = self.get_buffer()
+        self.dumps_into(buffer)
+        main, extra, side = decks
+        for slot, deck, limit in ((codec_.main, main, MainDeck.LIMIT), (codec_.side, side, SideDeck.LIMIT), (codec_.extra, extra, ExtraDeck.LIMIT)):
+            slot.set(buffer, *deck, *[0] * (limit - len(deck)))
+        codec_.checksum.set(buffer, codec_.compute_checksum(buffer))
+        self.__dict__["base"] = bytes(buffer[:self.layout.size])
+        self.__dict__["digestCache"] = None
+
+    def get_setting(self, attribute: str) -> int:
+        """Return the raw value of one of the SETTINGS."""
+        if attribute == "ingameDate":
+            return self.get_elapsed_days()
+        return int(getattr(self, attribute))
+
+    def pack_into(self, buffer) -> None:
+        """Serialize the whole savegame into a buffer obtained from new_buffer()."""
+        codec_ = self.codec
+        main, extra, side = self.get_decks()
+        buffer[:len(codec_.template)] = codec_.template
+        codec_.cards.set(buffer, *[card.word for card in self.cardsStats])
+        for slot, deck, limit in ((codec_.main, main, MainDeck.LIMIT), (codec_.side, side, SideDeck.LIMIT), (codec_.extra, extra, ExtraDeck.LIMIT)):
+            slot.set(buffer, *deck, *[0] * (limit - len(deck)))
+        codec_.counters.set(buffer, int(self.cardsStats), len(main), len(side), len(extra))
+        codec_.duelists.set(buffer, *[int(duelist) for duelist in self.duelistsStats])
+        for attribute, field in self.SETTINGS.items():
+            codec_.slots[field].set(buffer, self.get_setting(attribute))
+        if self.layout.language is not None:
+            buffer[self.layout.language] = self.language
+        codec_.checksum.set(buffer, codec_.compute_checksum(buffer))
+
+    def _patch(self, buffer, offset, packer, *values) -> int:
+        # Pack the values & return the difference it made to the checksum's input.
+        start = offset & ~1
+        end = min((offset + packer.size + 1) & ~1, 2 * self.layout.checksum_size)
+        fmt = '<{}H'.format(max(0, end - start) // 2)
+        old = sum(struct.unpack_from(fmt, buffer, start))
+        packer.pack_into(buffer, offset, *values)
+        return sum(struct.unpack_from(fmt, buffer, start)) - old
+
+    def patch_into(self, buffer) -> None:
+        """
+        Apply the overlay to a copy of the base layer.
+
+        Only the words & settings which were edited get written, so that the rest
+        (e.g. the bits & padding not handled by the editor) is left untouched.
+        """
+        codec_ = self.codec
+        # The checksum is the opposite of the sum of its input, which lets it be updated incrementally.
+        total = -codec_.checksum.get(buffer)
+
+        cards = self.cardsStats.cards
+        indices = range(len(cards)) if "cardsStats" in self.edits else sorted(self.cardsStats.overlay)
+        words = []
+        for index in indices:
+            offset = codec_.cards.offset + index * SIZE_CARD_STATS
+            words.append((offset, self.WORD_PACKER.unpack_from(buffer, offset)[0], cards[index].word))
+
+        # The decks are only rebuilt when their contents changed, so that
+        # the order of the cards inside them is preserved otherwise.
+        decks = None
+        if any((old ^ new) & self.DECK_BITS for offset, old, new in words):
+            decks = self.get_decks()
+
+        counters = list(codec_.counters.get(buffer))
+        for offset, old, new in words:
+            if old != new:
+                counters[0] += (new & 0x3FF) - (old & 0x3FF)
+                total += self._patch(buffer, offset, self.WORD_PACKER, new)
+
+        if decks is not None:
+            main, extra, side = decks
+            for slot, deck, limit in ((codec_.main, main, MainDeck.LIMIT), (codec_.side, side, SideDeck.LIMIT), (codec_.extra, extra, ExtraDeck.LIMIT)):
+                total += self._patch(buffer, slot.offset, slot.packer, *deck, *[0] * (limit - len(deck)))
+            counters[1:] = len(main), len(side), len(extra)
+        total += self._patch(buffer, codec_.counters.offset, codec_.counters.packer, *counters)
+
+        duelists = self.duelistsStats.duelists
+        indices = range(len(duelists)) if "duelistsStats" in self.edits else sorted(self.duelistsStats.overlay)
+        for index in indices:
+            offset = codec_.duelists.offset + index * SIZE_DUELIST_STATS
+            total += self._patch(buffer, offset, self.WORD_PACKER, duelists[index].word)
+
+        for attribute in self.edits:
+            if attribute in self.SETTINGS:
+                slot = codec_.slots[self.SETTINGS[attribute]]
+                total += self._patch(buffer, slot.offset, slot.packer, self.get_setting(attribute))
+        if "language" in self.edits and self.layout.language is not None:
+            total += self._patch(buffer, self.layout.language, self.LANGUAGE_PACKER, self.language)
+
+        codec_.checksum.set(buffer, -total & 0xFFFF)
+
+    @staticmethod
+    def check_header(data) -> bool:
+        """Check the savegame's header, whatever the game's language."""
+        return codec(detect(data)).check_header(data)
+
+    def to_dict(self) -> dict:
+        """Return a JSON-compatible representation of the savegame (see the serialization module)."""
+        return serialization.to_dict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Save":
+        return serialization.from_dict(cls, data)
+
+    def edit(self) -> SaveTransaction:
+        """Start a transaction for bulk edits to the cards & duelists (see SaveTransaction)."""
+        return SaveTransaction(self)
 
     @classmethod
     def load(cls, fp) -> "Save":
@@ -152,26 +377,28 @@ class Save():
         return cls(s, filename)
 
     @staticmethod
+    @instrumented("Save.checksum")
     def checksum(data) -> int:
-        chk = sum(struct.unpack_from('<{}H'.format(SIZE_CHECKSUM_INPUT), data)) & 0xFFFF
-        chk = (chk ^ 0xFFFF) + 1
-        return chk
+        return codec(detect(data)).compute_checksum(data)
 
+    @instrumented("Save.validate")
     def validate(self, data, mainDeck, extraDeck, sideDeck, nbTrunkCards, nbMainCards, nbSideCards, nbExtraCards) -> None:
+        codec_ = self.codec
+
         # Make sure the save data has the proper length
-        assert len(data) == Offsets.EOF
+        assert len(data) == self.layout.size
 
         # ... the save is for this game
-        assert data[Offsets.GAME_ID:Offsets.CHECKSUM] == VALUE_GAME_ID
+        assert codec_.game_id.get(data) == self.layout.game_id
 
         # ... we have a proper checksum
-        assert struct.unpack('<H', data[Offsets.CHECKSUM:Offsets.FINAL_PADDING])[0] == self.checksum(data)
+        assert codec_.checksum.get(data) == codec_.compute_checksum(data)
 
         # ... the header is correct
-        assert struct.unpack_from('<{}H'.format(len(VALUE_HEADER)), data) == VALUE_HEADER
+        assert codec_.check_header(data)
 
         # ... and so is the final padding
-        assert data.count(b'\xFF', Offsets.FINAL_PADDING) == (Offsets.EOF - Offsets.FINAL_PADDING)
+        assert codec_.check_padding(data)
 
         # ... the stats & actual decks agree
         main, extra, side = self.cardsStats.as_decks()
@@ -179,7 +406,7 @@ class Save():
         assert extra == extraDeck
         assert side == sideDeck
 
-        # ... the numbers add up
+        # ... the numbers add up
         assert nbTrunkCards == int(self.cardsStats)
         assert nbMainCards == len(main)
         assert nbExtraCards == len(extra)
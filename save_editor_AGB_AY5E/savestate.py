@@ -0,0 +1,191 @@
+"""
+Read & write the savegame mirrored in work RAM from emulator save states.
+
+When the game starts, it copies the savegame to the on-board work RAM at 0x02011C20
+(see docs/TechnicalDetails.md), so save states hold the live (and possibly newer) data.
+mGBA save states are supported, whether they are stored as raw state dumps,
+gzip-compressed dumps or PNG screenshots embedding a zlib-compressed state.
+"""
+import gzip
+import os
+import struct
+import zlib
+
+from .constants import Offsets
+from .metadata import __game_id__
+from .save import Save
+from .storage import atomic_write
+
+
+# Layout of mGBA's serialized state (see GBASerializedState in mGBA's sources).
+MGBA_STATE_SIZE = 0x61000
+MGBA_GAME_CODE = 0x001C
+MGBA_WRAM = 0x21000
+
+# Location of the savegame's mirror in the on-board work RAM.
+WRAM_BASE_ADDRESS = 0x02000000
+SAVEGAME_ADDRESS = 0x02011C20
+
+REGION_OFFSET = MGBA_WRAM + SAVEGAME_ADDRESS - WRAM_BASE_ADDRESS
+REGION_SIZE = Offsets.FINAL_PADDING
+REGION_END = REGION_OFFSET + REGION_SIZE
+
+GAME_CODE = __game_id__.split('-')[-1].encode('ascii')
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_STATE_CHUNK = b'gbAs'
+GZIP_SIGNATURE = b'\x1f\x8b'
+
+CHUNK_HEADER = struct.Struct('>I4s')
+CHUNK_CRC = struct.Struct('>I')
+READ_SIZE = 0x4000
+
+
+class SaveStateError(ValueError):
+    pass
+
+
+def _check_game(state):
+    if state[MGBA_GAME_CODE:MGBA_GAME_CODE + len(GAME_CODE)] != GAME_CODE:
+        raise SaveStateError("not a save state for {}".format(__game_id__))
+
+
+def _read_png_state(fd, length):
+    # Stream the state chunk through the decompressor,
+    # stopping as soon as the savegame's region has been reached.
+    decompressor = zlib.decompressobj()
+    state = bytearray()
+    while length > 0 and len(state) < REGION_END:
+        data = fd.read(min(READ_SIZE, length))
+        if not data:
+            break
+        length -= len(data)
+        state += decompressor.decompress(data, REGION_END - len(state))
+        while decompressor.unconsumed_tail and len(state) < REGION_END:
+            state += decompressor.decompress(decompressor.unconsumed_tail, REGION_END - len(state))
+    return state
+
+
+def read_region(path) -> bytes:
+    """Extract the raw savegame region (0x2170 bytes) from a save state file."""
+    with open(path, 'rb') as fd:
+        magic = fd.read(len(PNG_SIGNATURE))
+        fd.seek(0)
+
+        if magic.startswith(PNG_SIGNATURE):
+            fd.seek(len(PNG_SIGNATURE))
+            while True:
+                header = fd.read(CHUNK_HEADER.size)
+                if len(header) < CHUNK_HEADER.size:
+                    raise SaveStateError("no state found in PNG file")
+                length, kind = CHUNK_HEADER.unpack(header)
+                if kind == PNG_STATE_CHUNK:
+                    state = _read_png_state(fd, length)
+                    break
+                fd.seek(length + CHUNK_CRC.size, os.SEEK_CUR)
+        elif magic.startswith(GZIP_SIGNATURE):
+            with gzip.GzipFile(fileobj=fd) as gz:
+                state = gz.read(REGION_END)
+        else:
+            header = fd.read(MGBA_GAME_CODE + len(GAME_CODE))
+            _check_game(header)
+            fd.seek(REGION_OFFSET)
+            state = fd.read(REGION_SIZE)
+            if len(state) < REGION_SIZE:
+                raise SaveStateError("truncated save state")
+            return state
+
+    if len(state) < REGION_END:
+        raise SaveStateError("truncated save state")
+    _check_game(state)
+    return bytes(state[REGION_OFFSET:REGION_END])
+
+
+def region_to_savegame(region, recompute_checksum: bool = True) -> bytearray:
+    """Turn a savegame region into the contents of a regular savegame file."""
+    data = Save.new_buffer()
+    data[:REGION_SIZE] = region
+    if recompute_checksum:
+        # The checksum in the RAM mirror is only updated when the game
+        # writes the savegame back to the cartridge.
+        Save.CHECKSUM_PACKER.pack_into(data, Offsets.CHECKSUM, Save.checksum(data))
+    return data
+
+
+def load(path, recompute_checksum: bool = True) -> Save:
+    return Save.loads(region_to_savegame(read_region(path), recompute_checksum), path)
+
+
+def write_region(path, region) -> None:
+    """Replace the savegame region inside an existing save state file."""
+    assert len(region) == REGION_SIZE
+    with open(path, 'rb') as fd:
+        magic = fd.read(len(PNG_SIGNATURE))
+
+    if magic.startswith(PNG_SIGNATURE):
+        with open(path, 'rb') as fd:
+            contents = fd.read()
+        output = [PNG_SIGNATURE]
+        offset = len(PNG_SIGNATURE)
+        found = False
+        while offset < len(contents):
+            length, kind = CHUNK_HEADER.unpack_from(contents, offset)
+            start = offset + CHUNK_HEADER.size
+            end = start + length + CHUNK_CRC.size
+            if kind == PNG_STATE_CHUNK:
+                state = bytearray(zlib.decompress(contents[start:start + length]))
+                _check_game(state)
+                state[REGION_OFFSET:REGION_END] = region
+                data = zlib.compress(state)
+                output.extend([
+                    CHUNK_HEADER.pack(len(data), kind),
+                    data,
+                    CHUNK_CRC.pack(zlib.crc32(kind + data)),
+                ])
+                found = True
+            else:
+                output.append(contents[offset:end])
+            offset = end
+        if not found:
+            raise SaveStateError("no state found in PNG file")
+        atomic_write(path, b''.join(output))
+
+    elif magic.startswith(GZIP_SIGNATURE):
+        with gzip.open(path, 'rb') as fd:
+            state = bytearray(fd.read())
+        _check_game(state)
+        state[REGION_OFFSET:REGION_END] = region
+        atomic_write(path, gzip.compress(state))
+
+    else:
+        # Raw states are patched in place: only the savegame region is rewritten.
+        with open(path, 'r+b') as fd:
+            _check_game(fd.read(MGBA_GAME_CODE + len(GAME_CODE)))
+            fd.seek(REGION_OFFSET)
+            fd.write(region)
+
+
+def dump(save: Save, path) -> None:
+    buffer = save.get_buffer()
+    save.dumps_into(buffer)
+    write_region(path, bytes(buffer[:REGION_SIZE]))
+
+
+def iter_regions(paths):
+    """Yield (path, region) for each save state, skipping files that cannot be read."""
+    for path in paths:
+        try:
+            yield path, read_region(path)
+        except (OSError, SaveStateError, zlib.error, EOFError):
+            continue
+
+
+def iter_saves(directory, suffixes=('.ss0', '.ss1', '.ss2', '.ss3', '.ss4', '.ss5', '.ss6', '.ss7', '.ss8', '.ss9', '.png')):
+    """Yield (path, Save) for each valid save state in `directory`."""
+    with os.scandir(directory) as entries:
+        paths = sorted(entry.path for entry in entries if entry.is_file() and entry.name.lower().endswith(suffixes))
+    for path, region in iter_regions(paths):
+        try:
+            yield path, Save.loads(region_to_savegame(region), path)
+        except (AssertionError, ValueError, KeyError, IndexError):
+            continue
@@ -0,0 +1,242 @@
+"""
+Text representation of savegames, as dicts & JSON lines.
+
+A savegame is represented as a dict like the following one (cards & duelists
+with no copies/duels are omitted, and so are fields set to zero):
+
+    {
+        "filename": "AY5E.sav",
+        "date": "2001-03-14",
+        "last_pack": "Dark Magician",
+        "publication_victories": 2,
+        "last_duelist": "Yugi Muto",
+        "nationals_round": "ROUND_1",
+        "grandpa_cup": false,
+        "nationals_victories": 0,
+        "announcements": ["NEW_DUELISTS_AVAILABLE"],
+        "language": 2,
+        "cards": {"Dark Magician": {"trunk": 2, "main": 1, "password": true, "unknown": 65536}},
+        "decks": {"main": ["Mystical Elf", "Dark Magician"], "extra": [], "side": []},
+        "duelists": {"Yugi Muto": {"won": 3, "lost": 1}}
+    }
+
+The game's language (a byte of the header) is only present when it differs from
+the default, and so are the bits of the cards' words that the editor does not
+handle ("unknown") and the order of the cards in the decks (when they are not
+sorted by ID). Converting such a dict back into a Save yields the exact same
+dumps() output, except for the bytes which do not belong to any field of the
+layout (e.g. the unused entries of the decks), which are reset.
+"""
+import functools
+import json
+
+from datetime import date
+
+from . import constants
+from .enums import Announcements, NextNationalChampionshipRound
+from .stats import CardStats
+
+
+# Field name in the dicts => CardStats/DuelistStats attribute.
+CARD_FIELDS = {
+    "trunk": "copiesTrunk",
+    "main": "copiesMain",
+    "side": "copiesSide",
+    "extra": "copiesExtra",
+    "password": "password",
+    "unknown": "unknownBits",
+}
+DUELIST_FIELDS = {
+    "won": "won",
+    "lost": "lost",
+    "drawn": "drawn",
+}
+
+# Field name in the dicts => largest value that fits in the word (see CardStats.word & DuelistStats.word).
+CARD_MAXIMUMS = {
+    "trunk": 0x3FF,
+    "main": 0x3,
+    "side": 0x3,
+    "extra": 0x3,
+    "unknown": 0xFFFFFFFF & ~CardStats.KNOWN_BITS,
+}
+DUELIST_MAXIMUMS = {
+    "won": 0x7FF,
+    "lost": 0x7FF,
+    "drawn": 0x3FF,
+}
+
+# Decks, in the order used by Save.get_decks().
+DECKS = ("main", "extra", "side")
+
+# Announcements are listed individually.
+ANNOUNCEMENTS = (Announcements.NEW_DUELISTS_AVAILABLE, Announcements.NEW_PACK_AVAILABLE)
+
+
+class _Tables():
+    # Lookup tables built once from the datasets, so that encoding & decoding
+    # records does not go through FrozenModelDict's (linear) lookups by ID.
+    def __init__(self):
+        self.cardNames = [card.Name for card in constants.CARDS.values()]
+        self.cardIndices = {name: index for index, name in enumerate(self.cardNames)}
+        self.duelistNames = [duelist.Name for duelist in constants.DUELISTS.values()]
+        self.duelistIndices = {name: index for index, name in enumerate(self.duelistNames)}
+        self.packs = {pack.ID: pack for pack in constants.PACKS.values()}
+        self.packsByName = dict(constants.PACKS)
+        self.duelists = list(constants.DUELISTS.values())
+
+
+@functools.lru_cache(maxsize=None)
+def tables() -> _Tables:
+    return _Tables()
+
+
+def _lookup(value, indices, names):
+    if isinstance(value, int):
+        if not 0 <= value < len(names):
+            raise KeyError(value)
+        return value
+    return indices[value]
+
+
+def to_dict(save) -> dict:
+    t = tables()
+    res = {}
+    if save.filename is not None:
+        res["filename"] = str(save.filename)
+    res.update({
+        "date": save.get_ingame_date().isoformat(),
+        "last_pack": save.get_last_pack_received().Name,
+        "publication_victories": save.get_victories_since_last_publication(),
+        "last_duelist": save.get_last_duelist_fought().Name,
+        "nationals_round": save.get_next_national_championship_round().name,
+        "grandpa_cup": save.get_grandpa_cup_qualification(),
+        "nationals_victories": save.get_national_championship_victories(),
+        "announcements": [flag.name for flag in ANNOUNCEMENTS if flag in save.get_announcements()],
+    })
+    language = save.layout.language
+    if language is not None and save.language != save.codec.template[language]:
+        res["language"] = save.language
+
+    cards = {}
+    for name, stats in zip(t.cardNames, save.get_detailed_cards_stats()):
+        fields = {key: getattr(stats, attribute) for key, attribute in CARD_FIELDS.items() if getattr(stats, attribute)}
+        if fields:
+            cards[name] = fields
+    duelists = {}
+    for name, stats in zip(t.duelistNames, save.get_detailed_duelists_stats()):
+        fields = {key: getattr(stats, attribute) for key, attribute in DUELIST_FIELDS.items() if getattr(stats, attribute)}
+        if fields:
+            duelists[name] = fields
+    res["cards"] = cards
+    order = save.get_deck_order()
+    if order != save.get_decks():
+        res["decks"] = {
+            name: [t.cardNames[card_id] for card_id in deck]
+            for name, deck in zip(DECKS, order)
+        }
+    res["duelists"] = duelists
+    return res
+
+
+def _apply(stats, fields, table, maximums):
+    unknown = set(fields) - set(table)
+    if unknown:
+        raise KeyError(", ".join(sorted(unknown)))
+    values = {attribute: 0 for attribute in table.values()}
+    for key, value in fields.items():
+        if key == "password":
+            value = bool(value)
+        elif not isinstance(value, int) or not 0 <= value <= maximums[key] or (key == "unknown" and value & ~maximums[key]):
+            raise ValueError("{}: invalid value for {}: {!r}".format(stats, key, value))
+        values[table[key]] = value
+    # Same as assigning the word, minus the change tracking (see TrackedStats):
+    # the Save is brand new and nothing has been derived from it yet.
+    stats.__dict__.update(values)
+
+
+def from_dict(cls, data: dict):
+    """Build an instance of `cls` (Save or a subclass) from a dict made by to_dict()."""
+    t = tables()
+    save = cls(filename=data.get("filename"))
+
+    if "date" in data:
+        save.set_ingame_date(date.fromisoformat(data["date"]))
+    if "last_pack" in data:
+        value = data["last_pack"]
+        save.set_last_pack_received(t.packs[value] if isinstance(value, int) else t.packsByName[value])
+    if "publication_victories" in data:
+        save.set_victories_since_last_publication(int(data["publication_victories"]))
+    if "last_duelist" in data:
+        save.set_last_duelist_fought(t.duelists[_lookup(data["last_duelist"], t.duelistIndices, t.duelistNames)])
+    if "nationals_round" in data:
+        value = data["nationals_round"]
+        save.set_next_national_championship_round(
+            NextNationalChampionshipRound(value) if isinstance(value, int) else NextNationalChampionshipRound[value]
+        )
+    if "grandpa_cup" in data:
+        save.set_grandpa_cup_qualification(bool(data["grandpa_cup"]))
+    if "nationals_victories" in data:
+        save.set_national_championship_victories(int(data["nationals_victories"]))
+    if "announcements" in data:
+        value = data["announcements"]
+        if isinstance(value, int):
+            save.set_announcements(value)
+        else:
+            save.set_announcements(functools.reduce(lambda a, b: a | Announcements[b], value, Announcements.NONE))
+    if "language" in data:
+        value = data["language"]
+        if save.layout.language is None or not isinstance(value, int) or not 0 <= value <= 0xFF:
+            raise ValueError("invalid language: {!r}".format(value))
+        save.language = value
+
+    cards = save.get_detailed_cards_stats().cards
+    for key, fields in data.get("cards", {}).items():
+        stats = cards[_lookup(key, t.cardIndices, t.cardNames)]
+        _apply(stats, fields, CARD_FIELDS, CARD_MAXIMUMS)
+        stats.validate()
+    # Raises an IndexError if a deck contains too many cards.
+    decks = save.get_decks()
+
+    duelists = save.get_detailed_duelists_stats().duelists
+    for key, fields in data.get("duelists", {}).items():
+        _apply(duelists[_lookup(key, t.duelistIndices, t.duelistNames)], fields, DUELIST_FIELDS, DUELIST_MAXIMUMS)
+
+    # Last, as the order is stored in the base layer (see Save.set_deck_order()),
+    # which the untracked changes made above would not be part of otherwise.
+    if "decks" in data:
+        unknown = set(data["decks"]) - set(DECKS)
+        if unknown:
+            raise KeyError(", ".join(sorted(unknown)))
+        save.set_deck_order(*(
+            [_lookup(card, t.cardIndices, t.cardNames) for card in data["decks"][name]] if name in data["decks"] else deck
+            for name, deck in zip(DECKS, decks)
+        ))
+    return save
+
+
+def format_jsonl(data: dict) -> str:
+    """Format a dict made by to_dict() as a JSON line (including the final newline)."""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def write_jsonl(fp, saves) -> int:
+    """Write the given saves to a text file, one JSON object per line. Returns the number of saves written."""
+    count = 0
+    for save in saves:
+        fp.write(format_jsonl(to_dict(save)))
+        count += 1
+    return count
+
+
+def read_jsonl(fp, cls=None):
+    """Lazily read saves written by write_jsonl(), skipping blank lines."""
+    if cls is None:
+        from .save import Save as cls
+    for lineno, line in enumerate(fp, 1):
+        if not line.strip():
+            continue
+        try:
+            yield from_dict(cls, json.loads(line))
+        except (KeyError, ValueError, IndexError, AssertionError) as e:
+            raise ValueError("line {}: {!r}".format(lineno, e)) from e
@@ -1,9 +1,10 @@
 import itertools
 import struct
 
-from .constants import CARDS, DUELISTS
+from . import constants
 from .decks import Deck, ExtraDeck, MainDeck, SideDeck
 from .enums import MonsterType
+from .instrumentation import instrumented
 
 
 def splitter(data, size):
@@ -14,17 +15,63 @@ def splitter(data, size):
         index += size
 
 
-class CardStats():
+class TrackedStats():
+    # Number of changes made to statistics after their creation.
+    # Values derived from the statistics (e.g. Save.digest()) are cached
+    # along with this counter, and recomputed whenever it has moved since.
+    # Construction writes to __dict__ directly, so that loading new saves
+    # does not invalidate the values cached for other saves.
+    generation = 0
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        TrackedStats.generation += 1
+        self.edited()
+
+    def edited(self):
+        # Record the change in the list holding these statistics (see TrackedList.record()).
+        owner = self.__dict__.get("owner")
+        if owner is not None:
+            owner.record(self.__dict__["index"])
+
+
+class TrackedList(TrackedStats):
+    # Statistics for every card/duelist, along with the indices of those edited since
+    # the overlay was last cleared. Override `ITEMS` in subclasses.
+    #
+    # `revision` counts the changes made to this list only (unlike `generation`),
+    # and `last` is the index of the latest item edited (None when the whole list
+    # was replaced): see LegalityTracker.update().
+    ITEMS = None
+
+    def _attach(self):
+        self.__dict__.setdefault("overlay", set())
+        self.__dict__.setdefault("revision", 0)
+        self.__dict__.setdefault("last", None)
+        for index, stats in enumerate(self.__dict__[self.ITEMS]):
+            stats.__dict__.update(owner=self, index=index)
+
+    def record(self, index):
+        # Only the edited words get serialized again (see Save.dumps_into()).
+        self.overlay.add(index)
+        self.__dict__.update(revision=self.revision + 1, last=index)
+
+    def edited(self):
+        # The whole list was replaced.
+        self._attach()
+        self.overlay.update(range(len(self.__dict__[self.ITEMS])))
+        self.__dict__.update(revision=self.revision + 1, last=None)
+
+
+class CardStats(TrackedStats):
     PACKER = struct.Struct('<I')
 
+    # Bits of the word handled by the editor. The others are kept as-is.
+    KNOWN_BITS = 0x2FFFF
+
     def __init__(self, card, data=None):
-        self.card = card
-        value = self.PACKER.unpack(data)[0] if data else 0
-        self.password = bool(value & 0x20000)
-        self.copiesTrunk = value & 0x3FF
-        self.copiesMain = (value >> 10) & 0x3
-        self.copiesSide = (value >> 12) & 0x3
-        self.copiesExtra = (value >> 14) & 0x3
+        self.__dict__["card"] = card
+        self._decode(self.PACKER.unpack(data)[0] if data else 0)
         self.validate()
 
     @property
@@ -44,7 +91,8 @@ class CardStats():
     def __str__(self):
         return str(self.card)
 
-    def __bytes__(self):
+    @property
+    def word(self):
         # (u32) counts + flags1
         #     0-9 = # of copies in the trunk
         #     10-11 = # of copies in main deck
@@ -53,22 +101,43 @@ class CardStats():
         #     16 = ?
         #     17 = 1 if password has been used already, 0 otherwise
         #     18-31 = ?
-        return self.PACKER.pack(
+        return (
             (self.copiesTrunk & 0x3FF) |
             ((self.copiesMain & 0x3) << 10) |
             ((self.copiesSide & 0x3) << 12) |
             ((self.copiesExtra & 0x3) << 14) |
-            (int(bool(self.password)) << 17)
+            (int(bool(self.password)) << 17) |
+            self.unknownBits
+        )
+
+    @word.setter
+    def word(self, value):
+        self._decode(value)
+
+    def _decode(self, value):
+        self.__dict__.update(
+            password=bool(value & 0x20000),
+            copiesTrunk=value & 0x3FF,
+            copiesMain=(value >> 10) & 0x3,
+            copiesSide=(value >> 12) & 0x3,
+            copiesExtra=(value >> 14) & 0x3,
+            unknownBits=value & ~self.KNOWN_BITS,
         )
 
+    def __bytes__(self):
+        return self.PACKER.pack(self.word)
+
+
+class CardsStats(TrackedList):
+    ITEMS = "cards"
 
-class CardsStats():
     def __init__(self, data=None):
         it = itertools.repeat(None) if not data else splitter(data, CardStats.PACKER.size)
-        self.cards = [CardStats(card, next(it)) for card in CARDS.values()]
+        self.__dict__["cards"] = [CardStats(card, next(it)) for card in constants.CARDS.values()]
+        self._attach()
 
     def reset_deck(self, deck: Deck):
-        self.cards = [CardStats(card) for card in CARDS.values()]
+        self.cards = [CardStats(card) for card in constants.CARDS.values()]
         for card in deck:
             target = "copiesExtra" if card.card.MonsterType == MonsterType.FUSION else "copiesMain"
             copies = getattr(self.cards[card.ID], target)
@@ -96,8 +165,9 @@ class CardsStats():
         return sum(card.copiesTrunk for card in self.cards)
 
     def __getitem__(self, key):
-        return self.cards[int(CARDS[key])]
+        return self.cards[int(constants.CARDS[key])]
 
+    @instrumented("CardsStats.as_decks")
     def as_decks(self):
         main = MainDeck()
         extra = ExtraDeck()
@@ -116,44 +186,55 @@ class CardsStats():
         return b''.join(bytes(value) for value in self)
 
 
-class DuelistStats():
+class DuelistStats(TrackedStats):
     PACKER = struct.Struct('<I')
 
     def __init__(self, duelist, data=None):
-        self.duelist = duelist
-        value = self.PACKER.unpack(data)[0] if data else 0
-        self.won = value & 0x7FF
-        self.drawn = (value >> 11) & 0x7FF
-        self.lost = (value >> 22) & 0x3FF
+        self.__dict__["duelist"] = duelist
+        self._decode(self.PACKER.unpack(data)[0] if data else 0)
 
     def __str__(self):
         return str(self.duelist)
 
-    def __int__(self):
-        return ((self.drawn & 0x3FF) << 22) + ((self.lost & 0x7FF) << 11) + (self.won & 0x7FF)
-
-    def __bytes__(self):
+    @property
+    def word(self):
         # (u32) stats
         #     0-10  = won
         #     11-21 = lost
         #     22-31 = drawn
-        return self.PACKER.pack(
-            (self.won & 0x7FF) |
-            ((self.lost & 0x7FF) << 11) |
-            ((self.drawn & 0x3FF) << 22)
+        return ((self.drawn & 0x3FF) << 22) | ((self.lost & 0x7FF) << 11) | (self.won & 0x7FF)
+
+    @word.setter
+    def word(self, value):
+        self._decode(value)
+
+    def _decode(self, value):
+        self.__dict__.update(
+            won=value & 0x7FF,
+            lost=(value >> 11) & 0x7FF,
+            drawn=(value >> 22) & 0x3FF,
         )
 
+    def __int__(self):
+        return self.word
+
+    def __bytes__(self):
+        return self.PACKER.pack(self.word)
+
+
+class DuelistsStats(TrackedList):
+    ITEMS = "duelists"
 
-class DuelistsStats():
     def __init__(self, data=None):
         it = itertools.repeat(None) if not data else splitter(data, DuelistStats.PACKER.size)
-        self.duelists = [DuelistStats(duelist, next(it)) for duelist in DUELISTS.values()]
+        self.__dict__["duelists"] = [DuelistStats(duelist, next(it)) for duelist in constants.DUELISTS.values()]
+        self._attach()
 
     def __iter__(self):
         return iter(self.duelists)
 
     def __getitem__(self, key):
-        return self.duelists[int(DUELISTS[key])-1]
+        return self.duelists[int(constants.DUELISTS[key])]
 
     def __bytes__(self):
         return b''.join(bytes(value) for value in self)
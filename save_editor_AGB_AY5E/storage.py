@@ -0,0 +1,210 @@
+import functools
+import os
+import shutil
+import tempfile
+import threading
+
+
+@functools.lru_cache(maxsize=None)
+def _umask() -> int:
+    # The umask can only be read by changing it: do it once, before
+    # other threads get a chance to create files with the wrong one.
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+# Read at import time, while no other thread is writing files.
+_umask()
+
+
+def _create_temporary(path):
+    directory, name = os.path.split(os.path.abspath(path))
+    mode = 0o666 & ~_umask()
+    fd, tmp = tempfile.mkstemp(prefix=".{}.".format(name), suffix=".tmp", dir=directory)
+    try:
+        # Keep the permissions of the file being replaced, if any.
+        mode = os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        # mkstemp() creates files readable by their owner only:
+        # new files get the usual permissions instead.
+        pass
+    os.chmod(tmp, mode)
+    return fd, tmp
+
+
+def _write_all(fd, data):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def _rotate_backup(path):
+    # The previous version stays in place until the new one replaces it,
+    # so the backup is created as a hard link (or a copy) rather than a rename.
+    if not os.path.exists(path):
+        return
+    directory, name = os.path.split(os.path.abspath(path))
+    tmp = os.path.join(directory, ".{}.bak.tmp".format(name))
+    try:
+        os.unlink(tmp)
+    except FileNotFoundError:
+        pass
+    try:
+        os.link(path, tmp)
+    except OSError:
+        shutil.copy2(path, tmp)
+    os.replace(tmp, path + ".bak")
+
+
+def fsync_directory(directory) -> None:
+    # Make the renames durable. Not all platforms support opening directories.
+    try:
+        fd = os.open(directory, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path, data, backup: bool = False, fsync: bool = True) -> None:
+    """
+    Replace the contents of `path` with `data` atomically.
+
+    The data is written to a temporary file in the same directory, which then
+    replaces the target. A crash leaves either the old or the new contents,
+    never a truncated file. When `backup` is True, the previous contents
+    are kept in a file with the same name plus a ".bak" suffix.
+    """
+    fd, tmp = _create_temporary(path)
+    try:
+        try:
+            _write_all(fd, data)
+            if fsync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        if backup:
+            _rotate_backup(path)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    if fsync:
+        fsync_directory(os.path.dirname(os.path.abspath(path)))
+
+
+class GroupCommitWriter():
+    """
+    Atomic writer for bulk jobs, which amortizes the cost of fsync() over batches of files.
+
+    Files are written to temporary files right away, but they only replace
+    their targets once a batch is committed: after `max_pending` files, after
+    `max_delay` seconds, or when commit() / close() is called. Each commit fsyncs
+    the temporary files, renames them and then fsyncs the affected directories.
+    A file is thus never left half-written and at most `max_delay` seconds
+    (or `max_pending` files) worth of work can be lost on a crash.
+
+    Commits made in the background (after `max_delay` seconds) cannot report
+    failures to the caller: they are raised by the next call to write(),
+    commit() or close() instead.
+    """
+
+    def __init__(self, max_pending: int = 64, max_delay: float = 1.0, backup: bool = False):
+        self.max_pending = max_pending
+        self.max_delay = max_delay
+        self.backup = backup
+        self.pending = []
+        self.lock = threading.RLock()
+        self.timer = None
+        self.committed = 0
+        # Exception raised by the last background commit, if any.
+        self.failure = None
+
+    def _check(self):
+        with self.lock:
+            failure, self.failure = self.failure, None
+        if failure is not None:
+            raise failure
+
+    def _commit_later(self):
+        # Runs on the timer's thread.
+        try:
+            self.commit()
+        except BaseException as e:
+            with self.lock:
+                self.failure = e
+
+    def write(self, path, data) -> None:
+        self._check()
+        fd, tmp = _create_temporary(path)
+        try:
+            _write_all(fd, data)
+        except BaseException:
+            os.close(fd)
+            os.unlink(tmp)
+            raise
+
+        with self.lock:
+            self.pending.append((fd, tmp, path))
+            if len(self.pending) >= self.max_pending:
+                self.commit()
+            elif self.timer is None and self.max_delay is not None:
+                self.timer = threading.Timer(self.max_delay, self._commit_later)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def commit(self) -> int:
+        """Make every pending file durable and return the number of files committed."""
+        self._check()
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            pending, self.pending = self.pending, []
+            if not pending:
+                return 0
+
+            directories = set()
+            remaining = [tmp for fd, tmp, path in pending]
+            try:
+                try:
+                    for fd, tmp, path in pending:
+                        os.fsync(fd)
+                finally:
+                    for fd, tmp, path in pending:
+                        os.close(fd)
+
+                for fd, tmp, path in pending:
+                    if self.backup:
+                        _rotate_backup(path)
+                    os.replace(tmp, path)
+                    remaining.remove(tmp)
+                    directories.add(os.path.dirname(os.path.abspath(path)))
+            except BaseException:
+                for tmp in remaining:
+                    try:
+                        os.unlink(tmp)
+                    except FileNotFoundError:
+                        pass
+                raise
+            for directory in directories:
+                fsync_directory(directory)
+            self.committed += len(pending)
+            return len(pending)
+
+    def close(self) -> None:
+        self.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,52 @@
+import threading
+
+
+class Cancelled(Exception):
+    pass
+
+
+class BackgroundTask():
+    """
+    Run `work(task)` in a background thread, then call `callback(task)`.
+
+    The callback is called from the background thread too: GUIs should
+    wrap it to hand the task over to their main loop (e.g. with GLib.idle_add).
+    Once it has been called, either `result`, `error` or `cancelled` is set.
+    `work` may report its progress through report() and should call check()
+    regularly, so that cancellation requests are honoured.
+    """
+
+    def __init__(self, name, work, callback):
+        self.name = name
+        self.work = work
+        self.callback = callback
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.cancelled = False
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def cancel(self) -> None:
+        self.stopping.set()
+
+    def check(self) -> None:
+        if self.stopping.is_set():
+            raise Cancelled()
+
+    def report(self, progress: float) -> None:
+        self.progress = min(1.0, max(0.0, progress))
+
+    def _run(self):
+        try:
+            self.result = self.work(self)
+        except Cancelled:
+            self.cancelled = True
+        except Exception as e:
+            self.error = e
+        finally:
+            self.progress = 1.0
+            self.callback(self)
@@ -0,0 +1,33 @@
+"""
+Entry point for the command-line tools, used by the zipapp build (see bundle.py):
+
+    python save-editor-AGB-AY5E.pyz repair --dry-run *.sav
+"""
+import argparse
+import importlib
+import sys
+
+from .metadata import __version__
+
+
+# Command => module (whose main() implements it).
+TOOLS = {
+    "passwords": "passwords",
+    "repair": "repair",
+    "query": "query",
+    "ingest": "ingest",
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="save-editor-AGB-AY5E-tools", description="Command-line tools for the savegames.")
+    parser.add_argument('tool', choices=sorted(TOOLS), help="tool to run")
+    parser.add_argument('arguments', nargs=argparse.REMAINDER, help="the tool's arguments (see TOOL --help)")
+    parser.add_argument('-V', '--version', action='version', version='%(prog)s {}'.format(__version__))
+    opts = parser.parse_args(argv)
+    module = importlib.import_module("." + TOOLS[opts.tool], __package__)
+    return module.main(opts.arguments)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
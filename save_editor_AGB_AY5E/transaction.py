@@ -0,0 +1,181 @@
+from . import constants
+from .constants import MAX_DRAWN, MAX_LOST, MAX_TRUNK_CARDS, MAX_TRUNK_COPIES, MAX_WON
+from .decks import ExtraDeck, MainDeck, SideDeck
+from .enums import MonsterType
+from .legality import variant_groups
+from .stats import CardStats, DuelistStats
+
+
+class TransactionError(ValueError):
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+class SaveTransaction():
+    """
+    Bulk edits to the cards' & duelists' statistics of a Save.
+
+    Changes are staged inside the transaction and only validated once,
+    when it gets committed. The Save is left untouched if any of the game's
+    constraints is violated. Use it through Save.edit():
+
+        with save.edit() as tx:
+            tx.set_cards({"Dark Magician": {"copiesTrunk": 3}})
+            tx.set_duelists({"Yugi Muto": {"won": 10}})
+    """
+
+    CARD_FIELDS = ("copiesTrunk", "copiesMain", "copiesSide", "copiesExtra", "password", "unknownBits")
+    DUELIST_FIELDS = ("won", "lost", "drawn")
+
+    def __init__(self, save):
+        self.save = save
+        self.cards = {}
+        self.duelists = {}
+        self.closed = False
+
+    @staticmethod
+    def _fields(stats, fields):
+        return {field: getattr(stats, field) for field in fields}
+
+    def _stage(self, staged, current, fields, scratch, values, dataset):
+        if isinstance(values, dict):
+            items = ((int(dataset[key]), value) for key, value in values.items())
+        else:
+            # Arrays of words, indexed by the card's/duelist's ID.
+            values = list(values)
+            if len(values) != len(current):
+                raise ValueError("expected {} values, got {}".format(len(current), len(values)))
+            items = enumerate(values)
+
+        for index, value in items:
+            entry = staged.get(index)
+            if entry is None:
+                entry = staged[index] = self._fields(current[index], fields)
+            if isinstance(value, dict):
+                unknown = set(value) - set(fields)
+                if unknown:
+                    raise KeyError(", ".join(sorted(unknown)))
+                entry.update(value)
+            else:
+                # Decoded without going through TrackedStats.__setattr__(): the scratch
+                # statistics belong to no Save, whose digest would be invalidated otherwise.
+                scratch._decode(int(value))
+                entry.update(self._fields(scratch, fields))
+
+    def set_cards(self, values) -> None:
+        """
+        Stage new values for some cards.
+
+        `values` is either a mapping from a card (name, ID or Card) to a word
+        or to a dict of CardStats attributes, or a sequence of words for all the cards.
+        """
+        assert not self.closed
+        self._stage(
+            self.cards, self.save.get_detailed_cards_stats().cards, self.CARD_FIELDS,
+            CardStats(constants.CARDS[0]), values, constants.CARDS,
+        )
+
+    def set_duelists(self, values) -> None:
+        """Same as set_cards(), for the duelists (using DuelistStats attributes)."""
+        assert not self.closed
+        self._stage(
+            self.duelists, self.save.get_detailed_duelists_stats().duelists, self.DUELIST_FIELDS,
+            DuelistStats(constants.DUELISTS[0]), values, constants.DUELISTS,
+        )
+
+    def validate(self) -> list:
+        """Return the list of constraints violated by the staged changes."""
+        errors = []
+        cards = self.save.get_detailed_cards_stats().cards
+        entries = [self.cards.get(index) or self._fields(stats, self.CARD_FIELDS) for index, stats in enumerate(cards)]
+
+        # Only the cards being modified are checked individually,
+        # while the decks' & trunk's sizes are checked as a whole.
+        totals = {"copiesTrunk": 0, "copiesMain": 0, "copiesSide": 0, "copiesExtra": 0}
+        for index, entry in enumerate(entries):
+            card = cards[index].card
+            for field in totals:
+                value = entry[field]
+                if not isinstance(value, int) or value < 0:
+                    errors.append("{}: invalid value for {}: {!r}".format(card, field, value))
+                    entry = entries[index] = None
+                    break
+                totals[field] += value
+            if entry is None or index not in self.cards:
+                continue
+            unknown = entry["unknownBits"]
+            if not isinstance(unknown, int) or not 0 <= unknown <= 0xFFFFFFFF or unknown & CardStats.KNOWN_BITS:
+                errors.append("{}: invalid value for unknownBits: {!r}".format(card, unknown))
+            if entry["copiesMain"] > 3 or entry["copiesSide"] > 3 or entry["copiesExtra"] > 3:
+                errors.append("{}: more than 3 copies in a deck".format(card))
+            usage = entry["copiesMain"] + entry["copiesSide"] + entry["copiesExtra"]
+            if entry["copiesTrunk"] + usage > MAX_TRUNK_COPIES:
+                errors.append("{}: more than {} copies".format(card, MAX_TRUNK_COPIES))
+            if card.MonsterType == MonsterType.FUSION and entry["copiesMain"]:
+                errors.append("{}: fusion monsters belong in the extra deck".format(card))
+            elif card.MonsterType != MonsterType.FUSION and entry["copiesExtra"]:
+                errors.append("{}: only fusion monsters belong in the extra deck".format(card))
+
+        # Variants (alternative artworks) of a card share the same restrictions.
+        groups = variant_groups()
+        for group in sorted({groups.group[index] for index in self.cards}):
+            members = [entries[index] for index in groups.members[group]]
+            if None in members:
+                continue
+            usage = sum(entry["copiesMain"] + entry["copiesSide"] + entry["copiesExtra"] for entry in members)
+            if usage > groups.limits[group]:
+                errors.append("{}: {} copies used, only {} allowed".format(cards[group].card, usage, groups.limits[group]))
+
+        for field, deck in (("copiesMain", MainDeck), ("copiesSide", SideDeck), ("copiesExtra", ExtraDeck)):
+            if totals[field] > deck.LIMIT:
+                errors.append("{}: {} cards, only {} allowed".format(deck.__name__, totals[field], deck.LIMIT))
+        if totals["copiesTrunk"] > MAX_TRUNK_CARDS:
+            errors.append("trunk: {} cards, only {} allowed".format(totals["copiesTrunk"], MAX_TRUNK_CARDS))
+
+        duelists = self.save.get_detailed_duelists_stats().duelists
+        limits = {"won": MAX_WON, "lost": MAX_LOST, "drawn": MAX_DRAWN}
+        for index, entry in self.duelists.items():
+            for field, limit in limits.items():
+                value = entry[field]
+                if not isinstance(value, int) or not 0 <= value <= limit:
+                    errors.append("{}: invalid value for {}: {!r}".format(duelists[index].duelist, field, value))
+        return errors
+
+    def commit(self) -> None:
+        assert not self.closed
+        errors = self.validate()
+        if errors:
+            self.rollback()
+            raise TransactionError(errors)
+
+        cards = self.save.get_detailed_cards_stats().cards
+        duelists = self.save.get_detailed_duelists_stats().duelists
+        backup = [(stats, stats.word) for stats in cards] + [(stats, stats.word) for stats in duelists]
+        try:
+            for staged, current in ((self.cards, cards), (self.duelists, duelists)):
+                for index, entry in staged.items():
+                    for field, value in entry.items():
+                        setattr(current[index], field, value)
+        except BaseException:
+            for stats, word in backup:
+                stats.word = word
+            raise
+        finally:
+            self.closed = True
+
+    def rollback(self) -> None:
+        self.cards.clear()
+        self.duelists.clear()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.closed:
+            return
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
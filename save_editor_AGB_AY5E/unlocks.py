@@ -0,0 +1,389 @@
+"""
+Requirements for unlocking the game's duelists & booster packs.
+
+The game does not store which duelists or packs are available: they are derived
+from the duelists' statistics, the cards owned by the player and the number
+of National Championship victories. The rules are described as data below
+(see UNLOCKS) and can be evaluated against a single Save, or against all
+the savegames in a SaveMatrix at once.
+"""
+from abc import ABC, abstractmethod
+from collections import namedtuple
+
+from .constants import CARDS, DUELISTS, PACKS
+from .constants import MAX_WON, SIZE_CARD_STATS
+from .enums import SpecialDuelist, Stage
+
+
+# A single change to a savegame: `field` is one of "won", "trunk" or "nationals",
+# `key` the Duelist/Card involved (None for "nationals") and `value` the new value.
+Edit = namedtuple("Edit", ("field", "key", "value"))
+
+# Translation table mapping a zero byte to 1 and anything else to 0.
+_MISSING = bytes([1]) + bytes(255)
+
+
+class Requirement(ABC):
+    # Requirements are resolved in increasing order of priority when planning,
+    # so that the cheapest (most specific) edits are made first.
+    PRIORITY = 0
+
+    @abstractmethod
+    def edits(self, state) -> list:
+        """Return the edits needed for `state` to satisfy this requirement."""
+
+    @abstractmethod
+    def column(self, state) -> list:
+        """Return whether this requirement is satisfied, for every savegame in the matrix."""
+
+
+class Wins(Requirement):
+    """Win at least `count` times against each of the given duelists."""
+
+    PRIORITY = 1
+
+    def __init__(self, duelists, count: int):
+        self.duelists = tuple(DUELISTS[duelist] for duelist in duelists)
+        self.count = count
+
+    def edits(self, state):
+        return [
+            Edit("won", duelist, self.count)
+            for duelist in self.duelists
+            if state.won(duelist) < self.count
+        ]
+
+    def column(self, state):
+        result = [True] * len(state)
+        for duelist in self.duelists:
+            result = [ok and won >= self.count for ok, won in zip(result, state.won_column(duelist))]
+        return result
+
+    def __str__(self):
+        return "win {} time(s) against {}".format(self.count, ", ".join(str(duelist) for duelist in self.duelists))
+
+
+class TotalWins(Requirement):
+    """Win at least `count` times in total against the given duelists."""
+
+    PRIORITY = 4
+
+    def __init__(self, duelists, count: int):
+        self.duelists = tuple(DUELISTS[duelist] for duelist in duelists)
+        self.count = count
+
+    def edits(self, state):
+        wins = [state.won(duelist) for duelist in self.duelists]
+        missing = self.count - sum(wins)
+        if missing <= 0:
+            return []
+        # Spread the missing victories over as few duelists as possible.
+        edits = []
+        for won, duelist in sorted(zip(wins, self.duelists), key=lambda item: -item[0]):
+            added = min(missing, MAX_WON - won)
+            if added > 0:
+                edits.append(Edit("won", duelist, won + added))
+                missing -= added
+            if not missing:
+                break
+        return edits
+
+    def column(self, state):
+        totals = [0] * len(state)
+        for duelist in self.duelists:
+            totals = [total + won for total, won in zip(totals, state.won_column(duelist))]
+        return [total >= self.count for total in totals]
+
+    def __str__(self):
+        return "win {} time(s) in total against {}".format(self.count, ", ".join(str(duelist) for duelist in self.duelists))
+
+
+class Owns(Requirement):
+    """Own at least one copy of each of the given cards (in the trunk or the decks)."""
+
+    PRIORITY = 2
+
+    def __init__(self, cards):
+        self.cards = tuple(CARDS[card] for card in cards)
+
+    def edits(self, state):
+        return [Edit("trunk", card, 1) for card in self.cards if not state.owns(card)]
+
+    def column(self, state):
+        return state.owns_column(self.cards)
+
+    def __str__(self):
+        if len(self.cards) > 3:
+            return "own a copy of {} cards".format(len(self.cards))
+        return "own a copy of {}".format(", ".join(str(card) for card in self.cards))
+
+
+class NationalVictories(Requirement):
+    """Win the National Championship at least `count` times."""
+
+    PRIORITY = 3
+
+    def __init__(self, count: int):
+        self.count = count
+
+    def edits(self, state):
+        if state.nationals() >= self.count:
+            return []
+        return [Edit("nationals", None, self.count)]
+
+    def column(self, state):
+        return [victories >= self.count for victories in state.nationals_column()]
+
+    def __str__(self):
+        return "win the National Championship {} time(s)".format(self.count)
+
+
+class Unlocked():
+    """
+    Have unlocked another duelist or booster pack first.
+
+    This is not a Requirement by itself: UnlockRules replaces it
+    with the requirements of the other duelist or pack (see _leaves()).
+    """
+
+    def __init__(self, kind: str, name: str):
+        assert kind in ("duelist", "pack")
+        self.kind = kind
+        self.name = name
+
+    def __str__(self):
+        return "unlock {} first".format(self.name)
+
+
+class _SaveState():
+    def __init__(self, save):
+        self.cards = save.get_detailed_cards_stats()
+        self.duelists = save.get_detailed_duelists_stats()
+        self.victories = save.get_national_championship_victories()
+        self.overrides = {}
+
+    def apply(self, edit):
+        key = (edit.field, edit.key)
+        self.overrides[key] = max(self.overrides.get(key, 0), edit.value)
+
+    def won(self, duelist):
+        return max(self.duelists.duelists[duelist.ID].won, self.overrides.get(("won", duelist), 0))
+
+    def owns(self, card):
+        return bool(int(self.cards.cards[card.ID]) or self.overrides.get(("trunk", card)))
+
+    def nationals(self):
+        return max(self.victories, self.overrides.get(("nationals", None), 0))
+
+
+class _MatrixState():
+    def __init__(self, matrix):
+        self.matrix = matrix
+        self.wins = {}
+        self.missing = None
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def won_column(self, duelist):
+        column = self.wins.get(duelist.ID)
+        if column is None:
+            column = self.wins[duelist.ID] = self.matrix.duelist_column(duelist.ID, "won")
+        return column
+
+    def nationals_column(self):
+        return self.matrix.scalars["nationals_victories"]
+
+    def owns_column(self, cards):
+        if self.missing is None:
+            # Bits 0-15 hold the number of copies in the trunk & decks:
+            # OR both bytes for every card in every savegame in a single operation.
+            low = self.matrix.cards[0::SIZE_CARD_STATS]
+            high = self.matrix.cards[1::SIZE_CARD_STATS]
+            owned = int.from_bytes(low, 'little') | int.from_bytes(high, 'little')
+            self.missing = owned.to_bytes(len(low), 'little').translate(_MISSING)
+
+        columns = len(CARDS)
+        if len(cards) == 1:
+            return [not missing for missing in self.missing[cards[0].ID::columns]]
+        mask = bytearray(columns)
+        for card in cards:
+            mask[card.ID] = 1
+        masked = (
+            int.from_bytes(self.missing, 'little') & int.from_bytes(bytes(mask) * len(self), 'little')
+        ).to_bytes(len(self.missing), 'little')
+        return [not masked.count(1, start, start + columns) for start in range(0, len(masked), columns)]
+
+
+class UnlockReport():
+    def __init__(self):
+        self.duelists = []
+        self.packs = []
+        self.missing = {}
+
+    def __repr__(self):
+        return "<UnlockReport duelists={} packs={} missing={}>".format(len(self.duelists), len(self.packs), len(self.missing))
+
+
+class UnlockRules():
+    """
+    Requirement graph for the duelists & packs.
+
+    `duelists` and `packs` map a name to the list of requirements
+    that must all be satisfied for it to be unlocked. Targets without
+    any requirement are available from the start.
+    """
+
+    def __init__(self, duelists: dict, packs: dict):
+        self.rules = {}
+        for kind, rules in (("duelist", duelists), ("pack", packs)):
+            for name, requirements in rules.items():
+                self.rules[(kind, name)] = tuple(requirements)
+
+    def _leaves(self, kind, name, seen):
+        if (kind, name) in seen:
+            return
+        seen.add((kind, name))
+        for requirement in self.rules[(kind, name)]:
+            if isinstance(requirement, Unlocked):
+                yield from self._leaves(requirement.kind, requirement.name, seen)
+            else:
+                yield requirement
+
+    def missing(self, state, kind: str, name: str) -> list:
+        return [requirement for requirement in self._leaves(kind, name, set()) if requirement.edits(state)]
+
+    def evaluate(self, save) -> UnlockReport:
+        """Report which duelists & packs are unlocked and what is missing for the others."""
+        state = _SaveState(save)
+        report = UnlockReport()
+        for (kind, name) in self.rules:
+            missing = self.missing(state, kind, name)
+            if missing:
+                report.missing[(kind, name)] = missing
+            elif kind == "duelist":
+                report.duelists.append(name)
+            else:
+                report.packs.append(name)
+        return report
+
+    def evaluate_matrix(self, matrix) -> dict:
+        """
+        Evaluate the rules for every savegame in a SaveMatrix.
+
+        Returns a dict mapping (kind, name) to a list of booleans,
+        with one entry per savegame.
+        """
+        state = _MatrixState(matrix)
+        columns = {}
+        results = {}
+        for key in self.rules:
+            result = [True] * len(matrix)
+            for requirement in self._leaves(*key, set()):
+                column = columns.get(id(requirement))
+                if column is None:
+                    column = columns[id(requirement)] = requirement.column(state)
+                result = [a and b for a, b in zip(result, column)]
+            results[key] = result
+        return results
+
+    def plan(self, save, targets) -> list:
+        """
+        Compute the smallest set of edits needed to unlock the given targets.
+
+        `targets` is an iterable of (kind, name) pairs, e.g. ("pack", "Exodia").
+        """
+        state = _SaveState(save)
+        seen = set()
+        requirements = []
+        for kind, name in targets:
+            requirements.extend(self._leaves(kind, name, seen))
+        requirements.sort(key=lambda requirement: requirement.PRIORITY)
+
+        for requirement in requirements:
+            for edit in requirement.edits(state):
+                state.apply(edit)
+        return [Edit(field, key, value) for (field, key), value in state.overrides.items()]
+
+    def targets(self, kind: str) -> list:
+        return [key for key in self.rules if key[0] == kind]
+
+    @staticmethod
+    def apply(save, edits) -> None:
+        cards = save.get_detailed_cards_stats()
+        duelists = save.get_detailed_duelists_stats()
+        for edit in edits:
+            if edit.field == "won":
+                stats = duelists.duelists[edit.key.ID]
+                stats.won = max(stats.won, edit.value)
+            elif edit.field == "trunk":
+                stats = cards.cards[edit.key.ID]
+                if not int(stats):
+                    stats.copiesTrunk = edit.value
+            elif edit.field == "nationals":
+                save.set_national_championship_victories(max(edit.value, save.get_national_championship_victories()))
+            else:
+                raise ValueError(edit.field)
+
+
+def _stage(stage: Stage) -> list:
+    return [duelist.Name for duelist in DUELISTS.values() if duelist.ID and duelist.Stage == stage]
+
+
+def _build():
+    duelists = {}
+    for duelist in DUELISTS.values():
+        if not duelist.ID:
+            continue
+        if duelist.Stage == Stage.STAGE_1:
+            duelists[duelist.Name] = []
+        elif duelist.ID == SpecialDuelist.SIMON:
+            duelists[duelist.Name] = [NationalVictories(2)]
+        elif duelist.ID == SpecialDuelist.PEGASUS:
+            duelists[duelist.Name] = [Owns(["Toon World"])]
+        elif duelist.ID == SpecialDuelist.TRUSDALE:
+            # Due to a bug in the game, this includes the non-playable cards too
+            # (the 3 tickets, the 3 Egyptian god cards & "Insect Monster Token").
+            duelists[duelist.Name] = [
+                Unlocked("duelist", DUELISTS[SpecialDuelist.SIMON].Name),
+                Wins([SpecialDuelist.SIMON], 1),
+                Owns([card.Name for card in CARDS.values() if card.ID]),
+            ]
+        else:
+            # Defeat every duelist in the previous stage N times to unlock stage N.
+            previous = Stage(duelist.Stage.value - 1)
+            duelists[duelist.Name] = [Wins(_stage(previous), duelist.Stage.value)]
+
+    # The game does not document which of these duelists unlocks which pack,
+    # hence a single requirement shared by all of them.
+    top = Wins([
+        "Yugi Muto", "Joey Wheeler",
+        "Mako Tsunami", "Mai Valentine",
+        "Umbra & Lumis", "Marik Ishtar",
+        "Seto Kaiba", "Yami Yugi",
+    ], 20)
+    stages = {stage: _stage(stage) for stage in Stage if stage != Stage.STAGE_5}
+    packs = {
+        "Tiger Axe": [Wins(stages[Stage.STAGE_1], 2)],
+        "Garoozis": [Wins(stages[Stage.STAGE_2], 3)],
+        "Blue-Eyes Ultimate Dragon": [Wins(stages[Stage.STAGE_3], 4)],
+        "Judge Man": [TotalWins(stages[Stage.STAGE_1], 10)],
+        "Gate Guardian": [TotalWins(stages[Stage.STAGE_2], 10)],
+        "Relinquished": [TotalWins(stages[Stage.STAGE_3], 10)],
+        "Blue Millennium Puzzle": [TotalWins(stages[Stage.STAGE_4], 10)],
+        "Cyber Harpie": [Wins(stages[Stage.STAGE_1], 10)],
+        "Great Moth": [Wins(stages[Stage.STAGE_2], 10)],
+        "Black Luster Soldier": [Wins(stages[Stage.STAGE_3], 10)],
+        "Green Millennium Puzzle": [Wins(stages[Stage.STAGE_4], 10)],
+        "Yellow Millennium Puzzle": [Wins([SpecialDuelist.SIMON], 1)],
+    }
+    for name in (
+        "Blue-Eyes White Dragon", "Exodia", "Launcher Spider", "Gemini Elf",
+        "Blue-Eyes Toon Dragon", "Battle Ox", "Eye of Wdjat", "Buster Blader",
+    ):
+        packs[name] = [top]
+    assert all(name in PACKS for name in packs)
+    return UnlockRules(duelists, packs)
+
+
+UNLOCKS = _build()
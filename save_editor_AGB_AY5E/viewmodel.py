@@ -0,0 +1,201 @@
+"""
+View-models for the Cards & Duelists tabs.
+
+They compute the contents of the lists' rows, the bounds of their spin buttons
+and the statistics displayed below the lists, without depending on GTK.
+The application only copies their results into its widgets.
+"""
+from .constants import MAX_DRAWN, MAX_LOST, MAX_OBTAINABLE_CARDS, MAX_TRUNK_CARDS, MAX_WON
+from .decks import ExtraDeck, MainDeck, SideDeck
+from .enums import CardColumn, DuelistColumn
+from .instrumentation import instrumented
+from .legality import LOCATIONS, variant_groups
+from .workspace import static_columns
+
+
+def compute_card_usage(used, limit):
+    limit = int(limit)
+    return used * 100 / max(1, limit) if limit else 100
+
+
+# Copies in each deck are stored on 2 bits (so up to 9 copies used altogether)
+# and limits go up to 3: the "used" columns are looked up rather than computed.
+_MAX_USED = 9
+_USAGE = [[compute_card_usage(used, limit) for limit in range(4)] for used in range(_MAX_USED + 1)]
+_USAGE_TEXT = [["{}/{}".format(used, limit) for limit in range(4)] for used in range(_MAX_USED + 1)]
+
+# Bits 10-15 of a card's word (copies in the main, side & extra decks)
+# => (copies in the main/extra decks, copies in the side deck, copies used).
+_DECKS = [
+    (((bits & 3) + (bits >> 4)), (bits >> 2) & 3, (bits & 3) + ((bits >> 2) & 3) + (bits >> 4))
+    for bits in range(64)
+]
+
+
+def _percentage(value, total) -> str:
+    return "({:.2f}%)".format(value * 100 / total)
+
+
+class CardsView():
+    """The Cards tab for a Document (see workspace.py)."""
+
+    # Columns of the list computed by rows(), in order.
+    COLUMNS = (CardColumn.TRUNK, CardColumn.MAIN_EXTRA, CardColumn.SIDE, CardColumn.PASSWORD, CardColumn.USED, CardColumn.LIMIT)
+
+    def __init__(self, document):
+        self.document = document
+        self.columns = static_columns()
+
+    def _row(self, word, limit) -> tuple:
+        main_extra, side, used = _DECKS[(word >> 10) & 0x3F]
+        return (word & 0x3FF, main_extra, side, bool(word & 0x20000), _USAGE[used][limit], _USAGE_TEXT[used][limit])
+
+    @instrumented("CardsView.rows")
+    def rows(self, indices=None) -> list:
+        """Return (row index, values for COLUMNS) pairs for the given rows (all of them by default)."""
+        words = self.document.card_words()
+        limits = self.columns.cardLimits
+        if indices is None:
+            indices = range(len(words))
+        return [(index, self._row(words[index], limits[index])) for index in indices]
+
+    def row(self, index: int) -> tuple:
+        card_id = self.columns.cardIDs[index]
+        word = self.document.save.get_detailed_cards_stats().cards[card_id].word
+        return self._row(word, self.columns.cardLimits[index])
+
+    def location(self, index: int, column: CardColumn) -> str:
+        """Return where the copies edited through a column are (see legality.LOCATIONS)."""
+        if column == CardColumn.TRUNK:
+            return "trunk"
+        if column == CardColumn.SIDE:
+            return "side"
+        if column != CardColumn.MAIN_EXTRA:
+            raise ValueError(column)
+        card_id = self.columns.cardIDs[index]
+        return "extra" if variant_groups().fusions[card_id] else "main"
+
+    def bounds(self, index: int, column: CardColumn):
+        """Return the current value & the upper bound of a spin button."""
+        location = self.location(index, column)
+        card_id = self.columns.cardIDs[index]
+        stats = self.document.save.get_detailed_cards_stats().cards[card_id]
+        value = stats.copiesMain + stats.copiesExtra if column == CardColumn.MAIN_EXTRA else getattr(stats, LOCATIONS[location])
+        # The legality tracker takes the card's variants (alternative artworks),
+        # the room left in the decks & in the trunk into account.
+        return value, self.document.legality.max_copies(card_id, location)
+
+    def set_value(self, index: int, column: CardColumn, value: int) -> bool:
+        """Change the number of copies in a column. Returns whether anything changed."""
+        attribute = LOCATIONS[self.location(index, column)]
+        card_id = self.columns.cardIDs[index]
+        stats = self.document.save.get_detailed_cards_stats().cards[card_id]
+        if getattr(stats, attribute) == value:
+            return False
+        setattr(stats, attribute, value)
+        self.document.legality.update(card_id)
+        return True
+
+    def toggle_password(self, index: int) -> bool:
+        """Toggle the "password used" flag of a card and return its new value."""
+        card_id = self.columns.cardIDs[index]
+        stats = self.document.save.get_detailed_cards_stats().cards[card_id]
+        stats.password = not stats.password
+        self.document.legality.update(card_id)
+        return stats.password
+
+    @instrumented("CardsView.summary")
+    def summary(self) -> dict:
+        """Return the texts of the statistics below the list, by name (e.g. "trunk_pct")."""
+        # Unlike the list, the statistics take every card into account (including ID 0).
+        unique = trunk = main = side = extra = 0
+        for word in (stats.word for stats in self.document.save.get_detailed_cards_stats()):
+            if not word & 0xFFFF:
+                continue
+            unique += 1
+            trunk += word & 0x3FF
+            main += (word >> 10) & 3
+            side += (word >> 12) & 3
+            extra += (word >> 14) & 3
+        maximums = (
+            ("unique", unique, MAX_OBTAINABLE_CARDS),
+            ("trunk", trunk, MAX_TRUNK_CARDS),
+            ("main", main, MainDeck.LIMIT),
+            ("extra", extra, ExtraDeck.LIMIT),
+            ("side", side, SideDeck.LIMIT),
+        )
+        res = {"total": str(trunk + main + extra + side)}
+        for name, value, maximum in maximums:
+            res[name] = "{}/{}".format(value, maximum)
+            res[name + "_pct"] = _percentage(value, maximum)
+        return res
+
+
+class DuelistsView():
+    """The Duelists tab for a Document (see workspace.py)."""
+
+    # Columns of the list computed by rows(), in order.
+    COLUMNS = (DuelistColumn.WON, DuelistColumn.DRAWN, DuelistColumn.LOST)
+
+    ATTRIBUTES = {
+        DuelistColumn.WON: "won",
+        DuelistColumn.DRAWN: "drawn",
+        DuelistColumn.LOST: "lost",
+    }
+
+    MAXIMUMS = {
+        DuelistColumn.WON: MAX_WON,
+        DuelistColumn.DRAWN: MAX_DRAWN,
+        DuelistColumn.LOST: MAX_LOST,
+    }
+
+    def __init__(self, document):
+        self.document = document
+        self.columns = static_columns()
+
+    @staticmethod
+    def _row(word) -> tuple:
+        # Same layout as DuelistStats.word
+        return (word & 0x7FF, (word >> 22) & 0x3FF, (word >> 11) & 0x7FF)
+
+    @instrumented("DuelistsView.rows")
+    def rows(self, indices=None) -> list:
+        """Return (row index, values for COLUMNS) pairs for the given rows (all of them by default)."""
+        words = self.document.duelist_words()
+        if indices is None:
+            indices = range(len(words))
+        return [(index, self._row(words[index])) for index in indices]
+
+    def _stats(self, index):
+        return self.document.save.get_detailed_duelists_stats().duelists[self.columns.duelistIDs[index]]
+
+    def row(self, index: int) -> tuple:
+        return self._row(self._stats(index).word)
+
+    def bounds(self, index: int, column: DuelistColumn):
+        """Return the current value & the upper bound of a spin button."""
+        return getattr(self._stats(index), self.ATTRIBUTES[column]), self.MAXIMUMS[column]
+
+    def set_value(self, index: int, column: DuelistColumn, value: int) -> bool:
+        """Change the number of duels in a column. Returns whether anything changed."""
+        stats = self._stats(index)
+        attribute = self.ATTRIBUTES[column]
+        if getattr(stats, attribute) == value:
+            return False
+        setattr(stats, attribute, value)
+        return True
+
+    def summary(self) -> dict:
+        """Return the texts of the statistics below the list, by name (e.g. "won_pct")."""
+        # Unlike the list, the statistics take every duelist into account (including ID 0).
+        won = drawn = lost = 0
+        for word in (stats.word for stats in self.document.save.get_detailed_duelists_stats()):
+            won += word & 0x7FF
+            lost += (word >> 11) & 0x7FF
+            drawn += (word >> 22) & 0x3FF
+        total = won + drawn + lost
+        res = {"total": str(total)}
+        for name, value in (("won", won), ("drawn", drawn), ("lost", lost)):
+            res[name] = "{}/{}".format(value, total)
+            res[name + "_pct"] = _percentage(value, max(1, total))
+        return res
@@ -0,0 +1,282 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+
+from datetime import timedelta
+
+from .constants import DUELISTS, PACKS
+from .decks import ExtraDeck, MainDeck, SideDeck
+from .enums import Announcements, NextNationalChampionshipRound
+from .layouts import check_integrity
+from .legality import variant_groups
+from .save import Save
+
+
+class _StatSource():
+    # Fallback change detection, by polling the file's metadata.
+    def __init__(self, path, interval):
+        self.path = path
+        self.interval = interval
+        self.signature = self._signature()
+
+    def _signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def wait(self, timeout) -> bool:
+        time.sleep(min(timeout, self.interval))
+        signature = self._signature()
+        changed = signature != self.signature
+        self.signature = signature
+        return changed
+
+    def close(self):
+        pass
+
+
+class _InotifySource():
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_CLOEXEC = 0o2000000
+    EVENT = struct.Struct('iIII')
+
+    def __init__(self, path):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+
+        # Watch the directory rather than the file itself, so that
+        # emulators replacing the file (e.g. through a rename) are handled too.
+        directory, name = os.path.split(os.path.abspath(path))
+        self.name = os.fsencode(name)
+        mask = self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, "inotify_add_watch")
+
+    def wait(self, timeout) -> bool:
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return False
+        data = os.read(self.fd, 64 * 1024)
+        changed = False
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = data[offset:offset + length].rstrip(b'\x00')
+            offset += length
+            changed |= name == self.name
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FileWatcher():
+    """
+    Call `callback(path)` from a background thread whenever `path` changes.
+
+    inotify is used when available (Linux), with stat() polling as a fallback.
+    Notifications are debounced: the callback only fires once the file has
+    not changed for `debounce` seconds, so that partial writes are skipped.
+    """
+
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, path, callback, debounce: float = 0.3, polling: bool = False):
+        self.path = path
+        self.callback = callback
+        self.debounce = debounce
+        self.source = None
+        if not polling:
+            try:
+                self.source = _InotifySource(path)
+            except (OSError, AttributeError):
+                pass
+        if self.source is None:
+            self.source = _StatSource(path, self.POLL_INTERVAL)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="FileWatcher", daemon=True)
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.source.close()
+
+    def _run(self):
+        last_change = None
+        while not self.stopped.is_set():
+            timeout = self.debounce if last_change is not None else self.POLL_INTERVAL
+            if self.source.wait(timeout):
+                last_change = time.monotonic()
+            elif last_change is not None and time.monotonic() - last_change >= self.debounce:
+                last_change = None
+                self.callback(self.path)
+
+
+class SaveChanges():
+    def __init__(self):
+        self.cards = []
+        self.duelists = []
+        self.fields = []
+        self.conflicts = []
+
+    def __bool__(self):
+        return bool(self.cards or self.duelists or self.fields)
+
+
+class SaveSynchronizer():
+    """
+    Merge external changes to a savegame file into an open Save.
+
+    `base` holds the file's contents as last seen by the editor. When the file
+    changes, only the cards, duelists & fields whose words differ from `base`
+    are applied to the Save. A conflict is reported when the same word has also
+    been modified (differently) inside the editor since then, and when changes
+    from both sides add up to more cards than a deck or a card's limit allow.
+    """
+
+    # (shift of the 2-bit counter in the cards' words, capacity) for each deck.
+    DECKS = ((10, MainDeck.LIMIT), (12, SideDeck.LIMIT), (14, ExtraDeck.LIMIT))
+
+    # Field of the layout (see layouts.py) => (attribute, conversion)
+    FIELDS = {
+        "date": ("ingameDate", lambda value: Save.STARTING_DATE + timedelta(days=value)),
+        "last_pack": ("lastPackReceived", lambda value: PACKS[value]),
+        "publication_victories": ("publicationVictories", int),
+        "last_duelist": ("lastDuelistFought", lambda value: DUELISTS[value]),
+        "nationals_round": ("nextNationalChampionshipRound", NextNationalChampionshipRound),
+        "grandpa_cup": ("grandpaCupQualification", bool),
+        "nationals_victories": ("nationalChampionshipVictories", int),
+        "announcements": ("announcements", Announcements),
+    }
+
+    def __init__(self, save: Save, data=None):
+        self.save = save
+        self.base = bytes(data) if data is not None else save.dumps()
+
+    @staticmethod
+    def check(data) -> bool:
+        """Cheap validation, used to skip partially-written files."""
+        return check_integrity(data)
+
+    def _diff(self, slot, local, remote):
+        base = slot.get(self.base)
+        local = slot.get(local)
+        remote = slot.get(remote)
+        changed = []
+        conflicts = []
+        for index, (b, l, r) in enumerate(zip(base, local, remote)):
+            if b == r:
+                continue
+            if l != b and l != r:
+                conflicts.append(index)
+            else:
+                changed.append((index, r))
+        return changed, conflicts
+
+    def _illegal(self, merged, local, remote) -> set:
+        """
+        Return the cards responsible for the merged words breaking the game's rules.
+
+        Only cards whose words differ between both sides are taken into account:
+        using either side's words for all of them restores that side's decks.
+        """
+        groups = variant_groups()
+        candidates = [index for index, (l, r) in enumerate(zip(local, remote)) if l != r]
+        usage = [0] * len(merged)
+        for index, word in enumerate(merged):
+            usage[groups.group[index]] += ((word >> 10) & 3) + ((word >> 12) & 3) + ((word >> 14) & 3)
+
+        illegal = {index for index in candidates if usage[groups.group[index]] > groups.limits[groups.group[index]]}
+        for shift, capacity in self.DECKS:
+            if sum((word >> shift) & 3 for word in merged) > capacity:
+                illegal.update(index for index in candidates if ((local[index] ^ remote[index]) >> shift) & 3)
+        return illegal
+
+    def merge(self, data, prefer: str = None) -> SaveChanges:
+        """
+        Apply the changes between `base` and `data` to the Save.
+
+        When conflicts are detected and `prefer` is None, nothing gets applied
+        and the conflicts are reported. Otherwise, `prefer` ("local" or "remote")
+        determines which version wins for the conflicting values (including,
+        for changes that would break the game's rules, all the cards involved).
+        """
+        assert prefer in (None, "local", "remote")
+        result = SaveChanges()
+        local = self.save.dumps()
+
+        codec_ = self.save.codec
+        cards, cardConflicts = self._diff(codec_.cards, local, data)
+        duelists, duelistConflicts = self._diff(codec_.duelists, local, data)
+        fields = []
+        fieldConflicts = []
+        for name in self.FIELDS:
+            b, l, r = (codec_.slots[name].get(buf) for buf in (self.base, local, data))
+            if b == r:
+                continue
+            if l != b and l != r:
+                fieldConflicts.append(name)
+            else:
+                fields.append((name, r))
+
+        result.conflicts = (
+            [("card", index) for index in cardConflicts] +
+            [("duelist", index) for index in duelistConflicts] +
+            [("field", name) for name in fieldConflicts]
+        )
+        if result.conflicts and prefer is None:
+            return result
+        if prefer == "remote":
+            cards += [(index, codec_.cards.get(data)[index]) for index in cardConflicts]
+            duelists += [(index, codec_.duelists.get(data)[index]) for index in duelistConflicts]
+            fields += [(name, codec_.slots[name].get(data)) for name in fieldConflicts]
+
+        # Changes which do not conflict individually may still add up to illegal decks,
+        # which the Save could not even be serialized with.
+        localWords = codec_.cards.get(local)
+        remoteWords = codec_.cards.get(data)
+        merged = list(localWords)
+        for index, word in cards:
+            merged[index] = word
+        illegal = self._illegal(merged, localWords, remoteWords)
+        if illegal:
+            if prefer is None:
+                result.conflicts = [("card", index) for index in sorted(illegal)]
+                return result
+            words = localWords if prefer == "local" else remoteWords
+            cards = [(index, word) for index, word in cards if index not in illegal]
+            cards += [(index, words[index]) for index in sorted(illegal) if words[index] != localWords[index]]
+
+        cardsStats = self.save.get_detailed_cards_stats().cards
+        for index, word in cards:
+            cardsStats[index].word = word
+            result.cards.append(index)
+        duelistsStats = self.save.get_detailed_duelists_stats().duelists
+        for index, word in duelists:
+            duelistsStats[index].word = word
+            result.duelists.append(index)
+        for name, value in fields:
+            attribute, convert = self.FIELDS[name]
+            setattr(self.save, attribute, convert(value))
+            result.fields.append(name)
+
+        self.base = bytes(data)
+        return result
@@ -0,0 +1,194 @@
+import functools
+import os
+
+from array import array
+
+from . import constants
+from .legality import LegalityTracker
+from .save import Save
+from .storage import atomic_write
+from .watcher import SaveSynchronizer
+
+
+class StaticColumns():
+    # Columns of the cards' & duelists' lists which do not depend on the savegame
+    # (ID, name, stage, limit). They are built once and shared by all the documents.
+    def __init__(self):
+        cards = [card for card in constants.CARDS.values() if card.ID > 0]
+        self.cardIDs = array('H', (card.ID for card in cards))
+        self.cardNames = tuple(card.Name for card in cards)
+        self.cardLimits = array('B', (card.Limit.value for card in cards))
+
+        duelists = [duelist for duelist in constants.DUELISTS.values() if duelist.ID > 0]
+        self.duelistIDs = array('B', (duelist.ID for duelist in duelists))
+        self.duelistNames = tuple(duelist.Name for duelist in duelists)
+        self.duelistStages = tuple(duelist.Stage.value for duelist in duelists)
+
+
+@functools.lru_cache(maxsize=None)
+def static_columns() -> StaticColumns:
+    return StaticColumns()
+
+
+def _changed(old, new):
+    return [index for index, (a, b) in enumerate(zip(old, new)) if a != b]
+
+
+class Document():
+    """One of the savegames opened in the workspace."""
+
+    # Files are read piecewise, so that loads from slow (e.g. network) mounts
+    # can report their progress and be cancelled.
+    CHUNK_SIZE = 4096
+
+    def __init__(self, save: Save, data=None):
+        self.save = save
+        self.sync = SaveSynchronizer(save, data)
+        # Number of times the document was flagged as modified, so that callers
+        # can tell whether it was edited in the meantime (e.g. during a load).
+        self.generation = 0
+        self.unsaved = False
+        self.watcher = None
+        self.tracker = None
+
+    @property
+    def unsaved(self) -> bool:
+        return self._unsaved
+
+    @unsaved.setter
+    def unsaved(self, value: bool):
+        if value:
+            self.generation += 1
+        self._unsaved = bool(value)
+
+    @property
+    def legality(self) -> LegalityTracker:
+        # Built on first use, so that opening a document stays cheap.
+        if self.tracker is None:
+            self.tracker = LegalityTracker(self.save.get_detailed_cards_stats())
+        return self.tracker
+
+    @classmethod
+    def load(cls, filename=None, task=None) -> "Document":
+        """Load a document, optionally from a BackgroundTask (see tasks.py)."""
+        if filename is None:
+            return cls(Save())
+        data = bytearray()
+        with open(filename, 'rb') as fd:
+            size = max(1, os.fstat(fd.fileno()).st_size)
+            for chunk in iter(lambda: fd.read(cls.CHUNK_SIZE), b''):
+                data += chunk
+                if task is not None:
+                    task.check()
+                    task.report(0.9 * len(data) / size)
+        data = bytes(data)
+        document = cls(Save.loads(data, filename), data)
+        if task is not None:
+            task.check()
+        return document
+
+    @staticmethod
+    def write(filename, data, task=None) -> None:
+        # The data is serialized by the caller beforehand, so that the save
+        # can still be edited while it gets written (possibly from another thread).
+        if task is not None:
+            task.check()
+        atomic_write(filename, data)
+
+    def written(self, filename, data) -> None:
+        """Record that `data` was written to `filename` by write()."""
+        self.save.filename = filename
+        self.sync.base = data
+        self.unsaved = self.save.dumps() != data
+
+    @property
+    def title(self) -> str:
+        return os.path.basename(self.save.filename) if self.save.filename is not None else "Untitled"
+
+    # The per-document part of the lists is kept as arrays of raw words
+    # (one per row, in the same order as the static columns), so that switching
+    # between documents only refreshes the rows that actually differ.
+    def card_words(self) -> array:
+        return array('I', (stats.word for stats in self.save.get_detailed_cards_stats().cards[1:]))
+
+    def duelist_words(self) -> array:
+        return array('I', (stats.word for stats in self.save.get_detailed_duelists_stats().duelists[1:]))
+
+    def close(self) -> None:
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+
+
+class Workspace():
+    """
+    The documents opened in the editor, and which one is currently displayed.
+
+    The static columns are shared by every document, so opening
+    another savegame costs little more than parsing it.
+    """
+
+    def __init__(self):
+        self.columns = static_columns()
+        self.documents = []
+        self.active = None
+
+    def __len__(self):
+        return len(self.documents)
+
+    def __iter__(self):
+        return iter(self.documents)
+
+    @property
+    def current(self) -> Document:
+        return self.documents[self.active] if self.active is not None else None
+
+    def index(self, document: Document) -> int:
+        return self.documents.index(document)
+
+    def find(self, filename) -> Document:
+        if filename is None:
+            return None
+        path = os.path.realpath(filename)
+        for document in self.documents:
+            if document.save.filename is not None and os.path.realpath(document.save.filename) == path:
+                return document
+        return None
+
+    def add(self, document: Document) -> int:
+        self.documents.append(document)
+        return len(self.documents) - 1
+
+    def replace(self, index: int, document: Document) -> Document:
+        old = self.documents[index]
+        old.close()
+        self.documents[index] = document
+        return old
+
+    def close(self, index: int) -> Document:
+        document = self.documents.pop(index)
+        document.close()
+        if not self.documents:
+            self.active = None
+        elif self.active is not None and self.active >= index:
+            self.active = max(0, self.active - 1)
+        return document
+
+    def activate(self, index: int, previous: Document = None):
+        """
+        Make the document at `index` the current one.
+
+        Returns the indices of the cards' & duelists' rows which differ from
+        the `previous` document (by default, the current one), or (None, None)
+        when every row must be refreshed.
+        """
+        if previous is None:
+            previous = self.current
+        self.active = index
+        document = self.documents[index]
+        if previous is None or previous is document:
+            return None, None
+        return (
+            _changed(previous.card_words(), document.card_words()),
+            _changed(previous.duelist_words(), document.duelist_words()),
+        )
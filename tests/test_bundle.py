@@ -0,0 +1,89 @@
+import contextlib
+import io
+import mmap
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+import zipfile
+
+from unittest import mock
+
+from save_editor_AGB_AY5E import bundle, tools
+from save_editor_AGB_AY5E.generator import SaveGenerator
+from save_editor_AGB_AY5E.metadata import RESOURCES_DIR
+
+
+class BundleTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.reset()
+        self.addCleanup(self.reset)
+
+    @staticmethod
+    def reset():
+        # Forget the bundle opened by previous calls (the mapping may still be in use).
+        bundle._Bundle.data = bundle._Bundle.members = None
+
+    def test_fallback(self):
+        with mock.patch.object(bundle, "RESOURCES_BUNDLE", os.path.join(self.directory.name, "missing.zip")):
+            data, start, end = bundle.map_resource("pools/01.txt")
+            self.assertEqual(data[start:end], (RESOURCES_DIR / "pools" / "01.txt").read_bytes())
+            self.assertEqual(bundle.read_text("styles.css"), (RESOURCES_DIR / "styles.css").read_text("utf-8"))
+
+    def test_bundle(self):
+        target = os.path.join(self.directory.name, "resources.zip")
+        count = bundle.build_bundle(target)
+        with zipfile.ZipFile(target) as archive:
+            self.assertEqual(len(archive.namelist()), count)
+            self.assertIn("pools/01.txt", archive.namelist())
+
+        with mock.patch.object(bundle, "RESOURCES_BUNDLE", target):
+            for name in ("cards.csv", "pools/01.txt", "descriptions.txt"):
+                data, start, end = bundle.map_resource(name)
+                # Members are sliced straight out of the mapping.
+                self.assertIsInstance(data, mmap.mmap)
+                self.assertEqual(data[start:end], (RESOURCES_DIR / name).read_bytes(), name)
+            with self.assertRaises(FileNotFoundError):
+                bundle.read_bytes("unknown.txt")
+
+    def test_zipapp(self):
+        target = os.path.join(self.directory.name, "tools.pyz")
+        bundle.build_zipapp(target)
+        with zipfile.ZipFile(target) as archive:
+            names = archive.namelist()
+        self.assertIn("save_editor_AGB_AY5E/tools.py", names)
+        self.assertIn("save_editor_AGB_AY5E/resources/cards.csv", names)
+        self.assertNotIn("save_editor_AGB_AY5E/application.py", names)
+
+        # The tools run from the zipapp alone, resources included.
+        path = os.path.join(self.directory.name, "save.sav")
+        with open(path, 'wb') as fd:
+            fd.write(next(SaveGenerator(seed=50).generate(1)))
+        result = subprocess.run(
+            [sys.executable, "-I", target, "repair", "--dry-run", path],
+            capture_output=True, text=True, cwd=self.directory.name,
+        )
+        self.assertEqual((result.returncode, result.stdout), (0, "{}: OK\n".format(path)), result.stderr)
+
+
+class ToolsTest(unittest.TestCase):
+    def test_dispatch(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "save.sav")
+            with open(path, 'wb') as fd:
+                fd.write(next(SaveGenerator(seed=51).generate(1)))
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                self.assertEqual(tools.main(["query", "-w", "date >= 0", path]), 0)
+            self.assertEqual(output.getvalue(), path + "\n")
+
+        with contextlib.redirect_stderr(io.StringIO()):
+            with self.assertRaises(SystemExit):
+                tools.main(["unknown"])
+
+
+if __name__ == "__main__":
+    unittest.main()
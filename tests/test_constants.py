@@ -0,0 +1,56 @@
+import json
+import subprocess
+import sys
+import unittest
+
+import save_editor_AGB_AY5E
+from save_editor_AGB_AY5E import constants
+
+
+# Reports which of the lazily-loaded parts were loaded by a given statement.
+PROBE = """
+import json, sys
+{}
+from save_editor_AGB_AY5E import constants
+print(json.dumps({{
+    "datasets": sorted(name for name in constants.DATASETS if name in vars(constants)),
+    "modules": sorted(name for name in ("cProfile", "importlib.metadata", "tracemalloc") if name in sys.modules),
+}}))
+"""
+
+
+def probe(statement):
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(statement)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output)
+
+
+class LazyLoadingTest(unittest.TestCase):
+    def test_import(self):
+        # Working on the raw data does not require the datasets.
+        result = probe("from save_editor_AGB_AY5E.save import Save; Save.checksum(bytes(0x8000))")
+        self.assertEqual(result, {"datasets": [], "modules": []})
+
+    def test_first_access(self):
+        result = probe("from save_editor_AGB_AY5E import CARDS")
+        self.assertEqual(result["datasets"], ["CARDS"])
+
+    def test_datasets(self):
+        self.assertIs(constants.CARDS, constants.CARDS)
+        self.assertEqual(constants.CARDS["Dark Magician"].Name, "Dark Magician")
+        self.assertIn("DUELISTS", dir(constants))
+        with self.assertRaises(AttributeError):
+            constants.UNKNOWN
+
+    def test_package(self):
+        from save_editor_AGB_AY5E.save import Save
+        self.assertIs(save_editor_AGB_AY5E.Save, Save)
+        self.assertIn("SaveMatrix", dir(save_editor_AGB_AY5E))
+        with self.assertRaises(AttributeError):
+            save_editor_AGB_AY5E.UNKNOWN
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+
+from save_editor_AGB_AY5E import constants
+from save_editor_AGB_AY5E.deckbuilder import CATEGORIES, DeckBuilder, Objective
+from save_editor_AGB_AY5E.enums import CardType, MonsterType
+from save_editor_AGB_AY5E.legality import LegalityTracker, variant_groups
+from save_editor_AGB_AY5E.save import Save
+
+
+def collection(copies=3):
+    # A new savegame with `copies` copies of every card in the trunk.
+    save = Save()
+    stats = save.get_detailed_cards_stats()
+    for card_stats in stats.cards[1:]:
+        card_stats.copiesTrunk = copies
+    return save, stats
+
+
+class DeckBuilderTest(unittest.TestCase):
+    def check(self, save, stats, result):
+        result.apply(stats)
+        tracker = LegalityTracker(stats)
+        self.assertTrue(tracker.is_legal(), tracker.errors())
+        self.assertEqual(save.get_decks(), tuple(
+            sorted(card.ID for card in deck) for deck in (result.main, result.extra, result.side)
+        ))
+        # The serialized savegame is valid.
+        Save.loads(save.dumps())
+
+    def test_build(self):
+        save, stats = collection()
+        result = DeckBuilder().build(stats)
+        self.assertEqual((len(result.main), len(result.extra), len(result.side)), (40, 20, 15))
+        self.assertTrue(all(card.MonsterType == MonsterType.FUSION for card in result.extra))
+        self.assertFalse(any(card.MonsterType == MonsterType.FUSION for card in list(result.main) + list(result.side)))
+        self.check(save, stats, result)
+
+        # Without ratios, the main deck holds the highest ATK available.
+        groups = variant_groups()
+        room = list(groups.limits)
+        best = []
+        for card in sorted(constants.CARDS.values(), key=lambda card: -Objective().score(card)):
+            if card.ID > 0 and not groups.fusions[card.ID] and room[groups.group[card.ID]] > 0:
+                copies = min(3, card.Limit.value, room[groups.group[card.ID]])
+                room[groups.group[card.ID]] -= copies
+                best += [Objective().score(card)] * copies
+        self.assertEqual(result.score, sum(best[:40]))
+
+    def test_ratios(self):
+        save, stats = collection()
+        objective = Objective(ratios={CardType.MONSTER: 0.5, CardType.MAGIC: 0.25, CardType.TRAP: 0.25})
+        result = DeckBuilder(objective, size=44, side=0, extra=0).build(stats)
+        counts = [sum(card.CardType == category for card in result.main) for category in CATEGORIES]
+        self.assertEqual(counts, [22, 11, 11])
+        self.assertEqual((len(result.extra), len(result.side)), (0, 0))
+        self.check(save, stats, result)
+
+    def test_few_cards(self):
+        save, stats = collection(copies=0)
+        stats.cards[constants.CARDS["Dark Magician"].ID].copiesTrunk = 3
+        with self.assertRaises(ValueError):
+            DeckBuilder().build(stats)
+
+    def test_variants(self):
+        # Both artworks share the limit of the original card.
+        save, stats = collection(copies=0)
+        for name in constants.ALTERNATIVE_ARTWORKS:
+            stats.cards[constants.CARDS[name].ID].copiesTrunk = 3
+            stats.cards[constants.CARDS[name + constants.ALTERNATIVE_ARTWORK_SUFFIX].ID].copiesTrunk = 3
+        with self.assertRaises(ValueError):
+            DeckBuilder(side=0).build(stats)
+
+    def test_invalid(self):
+        with self.assertRaises(AssertionError):
+            DeckBuilder(size=39)
+        with self.assertRaises(AssertionError):
+            Objective(ratios={CardType.MONSTER: 0.75, CardType.TRAP: 0.5})
+
+
+if __name__ == "__main__":
+    unittest.main()
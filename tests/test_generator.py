@@ -0,0 +1,33 @@
+import unittest
+
+from save_editor_AGB_AY5E.generator import SaveGenerator
+from save_editor_AGB_AY5E.legality import LegalityTracker, variant_groups
+from save_editor_AGB_AY5E.save import Save
+
+
+class SaveGeneratorTest(unittest.TestCase):
+    def test_reproducible(self):
+        self.assertEqual(list(SaveGenerator(seed=1).generate(3)), list(SaveGenerator(seed=1).generate(3)))
+        self.assertNotEqual(list(SaveGenerator(seed=1).generate(3)), list(SaveGenerator(seed=2).generate(3)))
+
+    def test_variants_share_limits(self):
+        # Full decks drawn from the variants only: they run out of copies quickly.
+        groups = variant_groups()
+        variants = [card_id for card_id, group in enumerate(groups.group) if len(groups.members[group]) > 1]
+        generator = SaveGenerator(seed=4, main_fill=1.0, side_fill=1.0, extra_fill=0.0)
+        generator.others = [card_id for card_id in variants if card_id in generator.others]
+
+        for data in generator.generate(20):
+            stats = Save.loads(data).get_detailed_cards_stats()
+            for group in set(groups.group):
+                usage = sum(stats.cards[card_id].usage for card_id in groups.members[group])
+                self.assertLessEqual(usage, groups.limits[group])
+
+    def test_legal(self):
+        for data in SaveGenerator(seed=5).generate(20):
+            tracker = LegalityTracker(Save.loads(data).get_detailed_cards_stats())
+            self.assertTrue(tracker.is_legal(), tracker.errors())
+
+
+if __name__ == "__main__":
+    unittest.main()
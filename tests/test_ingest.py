@@ -0,0 +1,84 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from save_editor_AGB_AY5E.generator import SaveGenerator
+from save_editor_AGB_AY5E.ingest import ArchiveSink, Ingester, JsonlSink, load_entry
+from save_editor_AGB_AY5E.save import Save
+
+
+class IngestTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.drop = os.path.join(self.directory.name, "drop")
+        os.mkdir(self.drop)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def add(self, name, data):
+        path = os.path.join(self.drop, name)
+        with open(path, 'wb') as fd:
+            fd.write(data)
+        # Old enough to be ingested right away.
+        past = time.time() - 60
+        os.utime(path, (past, past))
+        return path
+
+    def test_load_entry(self):
+        data = next(SaveGenerator(seed=7).generate(1))
+        path = self.add("a.sav", data)
+        entry = load_entry(path)
+        self.assertEqual(entry.digest, Save.digest_bytes(data))
+        self.assertEqual(entry.record, Save.loads(data).to_dict() | {"filename": path})
+        self.assertIsNone(load_entry(path, record=False).record)
+
+    def test_ingest_once(self):
+        saves = list(SaveGenerator(seed=7).generate(2))
+        for index, data in enumerate(saves):
+            self.add("{}.sav".format(index), data)
+        self.add("partial.sav", saves[0][:100])
+
+        archive = os.path.join(self.directory.name, "archive")
+        jsonl = os.path.join(self.directory.name, "saves.jsonl")
+        reports = []
+        sinks = [ArchiveSink(archive), JsonlSink(jsonl)]
+        ingester = Ingester([self.drop], sinks, workers=1, remove=True, report=lambda *args: reports.append(args))
+        try:
+            stats = asyncio.run(ingester.run(once=True))
+        finally:
+            ingester.close()
+
+        self.assertEqual((stats.accepted, stats.rejected, stats.failed), (2, 1, 0))
+        self.assertEqual([path for path, message in reports], [os.path.join(self.drop, "partial.sav")])
+        self.assertEqual(sorted(os.listdir(archive)), sorted(Save.digest_bytes(data).hex() + ".sav" for data in saves))
+        with open(jsonl, encoding='utf-8') as fd:
+            self.assertEqual(len([json.loads(line) for line in fd]), 2)
+        # Only the rejected file is left.
+        self.assertEqual(os.listdir(self.drop), ["partial.sav"])
+
+    def test_records_only_when_needed(self):
+        archive = ArchiveSink(os.path.join(self.directory.name, "archive"))
+        self.assertFalse(Ingester([self.drop], [archive]).records)
+        jsonl = JsonlSink(os.path.join(self.directory.name, "saves.jsonl"))
+        try:
+            self.assertTrue(Ingester([self.drop], [archive, jsonl]).records)
+        finally:
+            jsonl.close()
+
+    def test_remove_failures(self):
+        path = self.add("a.sav", b"")
+        directory = os.path.join(self.drop, "directory.sav")
+        os.mkdir(directory)
+        ingester = Ingester([self.drop], [])
+        # The other files are still removed.
+        failures = ingester._remove([directory, path])
+        self.assertEqual([failure[0] for failure in failures], [directory])
+        self.assertFalse(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import pstats
+import tempfile
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from save_editor_AGB_AY5E import instrumentation
+
+
+@instrumentation.instrumented("test.work")
+def work(value):
+    return sum(range(value))
+
+
+@instrumentation.instrumented("test.outer")
+def outer(value):
+    return work(value) + work(value)
+
+
+class InstrumentationTest(unittest.TestCase):
+    def setUp(self):
+        instrumentation.reset()
+
+    def tearDown(self):
+        instrumentation.disable()
+        instrumentation.reset()
+
+    def test_disabled(self):
+        self.assertEqual(work(10), 45)
+        self.assertEqual(instrumentation.report(), {})
+
+    def test_timers(self):
+        instrumentation.enable()
+        outer(100)
+        report = instrumentation.report()
+        self.assertEqual(report["test.outer"]["calls"], 1)
+        self.assertEqual(report["test.work"]["calls"], 2)
+        self.assertLessEqual(report["test.work"]["max_seconds"], report["test.outer"]["total_seconds"])
+
+    def test_profiles_from_threads(self):
+        instrumentation.enable(profile=True)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            self.assertEqual(list(executor.map(work, [1000] * 200)), [sum(range(1000))] * 200)
+        self.assertEqual(instrumentation.report()["test.work"]["calls"], 200)
+
+        # A single accumulated profile is kept per operation.
+        self.assertIsInstance(instrumentation._profiles["test.work"], pstats.Stats)
+        with tempfile.TemporaryDirectory() as directory:
+            paths = instrumentation.dump_profiles(directory)
+            self.assertEqual(paths, [os.path.join(directory, "test.work.prof")])
+            pstats.Stats(paths[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
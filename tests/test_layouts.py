@@ -0,0 +1,73 @@
+import unittest
+
+from save_editor_AGB_AY5E.constants import HEADER_LANGUAGE, Offsets, VALUE_GAME_ID
+from save_editor_AGB_AY5E.generator import SaveGenerator
+from save_editor_AGB_AY5E.layouts import DEFAULT_LAYOUT, INTERNATIONAL, check_integrity, codec, detect
+from save_editor_AGB_AY5E.save import Save
+
+
+class LayoutTest(unittest.TestCase):
+    def setUp(self):
+        self.data = next(SaveGenerator(seed=47).generate(1))
+        self.codec = codec(INTERNATIONAL)
+
+    def test_detect(self):
+        self.assertIs(detect(self.data), INTERNATIONAL)
+        self.assertIs(detect(self.data[:Offsets.CHECKSUM]), INTERNATIONAL)
+        self.assertIsNone(detect(bytes(len(self.data))))
+        self.assertIs(codec(), self.codec)
+        self.assertIs(DEFAULT_LAYOUT, INTERNATIONAL)
+
+    def test_slots(self):
+        self.assertEqual(self.codec.game_id.get(self.data), VALUE_GAME_ID)
+        self.assertEqual(self.codec.date.offset, Offsets.DAYS_ELAPSED)
+        self.assertEqual(len(self.codec.main.get(self.data)), 60)
+        # The fields follow each other, in the savegame's order.
+        offsets = [slot.offset for slot in self.codec.slots.values()]
+        self.assertEqual(offsets, sorted(offsets))
+        self.assertEqual(self.codec.padding, Offsets.FINAL_PADDING)
+
+        buffer = bytearray(self.data)
+        self.codec.last_pack.set(buffer, 3)
+        self.assertEqual(self.codec.last_pack.get(buffer), 3)
+        self.assertEqual(buffer[:Offsets.LAST_PACK], self.data[:Offsets.LAST_PACK])
+        self.assertEqual(buffer[Offsets.LAST_PACK + 2:], self.data[Offsets.LAST_PACK + 2:])
+
+    def test_template(self):
+        template = self.codec.new_buffer()
+        self.assertEqual(len(template), INTERNATIONAL.size)
+        self.assertTrue(check_integrity(bytes(template)))
+        self.assertTrue(self.codec.check_header(template))
+        self.assertTrue(self.codec.check_padding(template))
+        self.assertEqual(bytes(template), Save.new_buffer())
+
+    def test_header(self):
+        buffer = bytearray(self.data)
+        buffer[HEADER_LANGUAGE] = 0x05
+        self.assertTrue(self.codec.check_header(buffer))
+        buffer[HEADER_LANGUAGE + 1] = 0x05
+        self.assertFalse(self.codec.check_header(buffer))
+        self.assertFalse(self.codec.check_header(self.data[:4]))
+
+    def test_integrity(self):
+        self.assertTrue(check_integrity(self.data))
+        self.assertFalse(check_integrity(self.data[:-1]))
+        self.assertFalse(check_integrity(self.data + b"\xFF"))
+        buffer = bytearray(self.data)
+        buffer[Offsets.STATS_CARDS] ^= 1
+        self.assertFalse(check_integrity(buffer))
+        self.codec.checksum.set(buffer, self.codec.compute_checksum(buffer))
+        self.assertTrue(check_integrity(buffer))
+        self.assertEqual(self.codec.compute_checksum(buffer), Save.checksum(buffer))
+
+    def test_digest_regions(self):
+        # The derived fields (decks, counters & checksum) are left out.
+        regions = self.codec.digest_regions
+        self.assertEqual(regions[0], (Offsets.STATS_CARDS, Offsets.PADDING_1))
+        for name in ("main", "counters", "checksum", "game_id"):
+            slot = self.codec.slots[name]
+            self.assertFalse(any(start < slot.end and slot.offset < end for start, end in regions), name)
+
+
+if __name__ == "__main__":
+    unittest.main()
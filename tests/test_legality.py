@@ -0,0 +1,74 @@
+import unittest
+
+from save_editor_AGB_AY5E.generator import SaveGenerator
+from save_editor_AGB_AY5E.legality import LegalityTracker, variant_groups
+from save_editor_AGB_AY5E.save import Save
+from save_editor_AGB_AY5E.stats import CardsStats
+
+
+def load(seed):
+    return Save.loads(next(SaveGenerator(seed=seed).generate(1)))
+
+
+class LegalityTrackerTest(unittest.TestCase):
+    def assertFresh(self, tracker):
+        # The counters must match those of a tracker built from scratch.
+        expected = LegalityTracker(tracker.stats)
+        self.assertEqual(tracker.is_legal(), expected.is_legal())
+        self.assertEqual(tracker.copies, expected.copies)
+        self.assertEqual(tracker.totals, expected.totals)
+        self.assertEqual(tracker.violations, expected.violations)
+
+    def test_edits_in_other_saves(self):
+        stats = load(3).get_detailed_cards_stats()
+        other = load(4).get_detailed_cards_stats()
+        tracker = LegalityTracker(stats)
+        tracker.refresh = None
+
+        # Edits made to another savegame must not cause a full refresh.
+        other.cards[0].copiesTrunk += 1
+        stats.cards[1].copiesTrunk += 1
+        tracker.update(1)
+        self.assertEqual(tracker.copies[1][0], stats.cards[1].copiesTrunk)
+
+    def test_edit_of_another_card(self):
+        stats = load(3).get_detailed_cards_stats()
+        tracker = LegalityTracker(stats)
+
+        stats.cards[5].copiesTrunk += 1
+        tracker.update(1)
+        self.assertFresh(tracker)
+
+        stats.cards[7].copiesTrunk += 1
+        stats.cards[7].copiesTrunk += 1
+        tracker.update(7)
+        self.assertFresh(tracker)
+
+    def test_list_replaced(self):
+        stats = load(3).get_detailed_cards_stats()
+        tracker = LegalityTracker(stats)
+        stats.cards = list(stats.cards)
+        stats.cards[2].copiesTrunk += 1
+        self.assertFresh(tracker)
+
+    def test_fusions_in_decks(self):
+        fusions = variant_groups().fusions
+        fusion = fusions.index(True)
+        other = fusions.index(False, 1)
+        tracker = LegalityTracker(CardsStats())
+
+        self.assertEqual(tracker.max_copies(fusion, "main"), 0)
+        self.assertGreater(tracker.max_copies(fusion, "extra"), 0)
+        # Any card may be in the side deck, fusion monsters included.
+        self.assertGreater(tracker.max_copies(fusion, "side"), 0)
+        self.assertGreater(tracker.max_copies(other, "main"), 0)
+        self.assertEqual(tracker.max_copies(other, "extra"), 0)
+        self.assertGreater(tracker.max_copies(other, "side"), 0)
+
+        tracker.stats.cards[fusion].copiesSide = 1
+        tracker.update(fusion)
+        self.assertTrue(tracker.is_legal())
+
+
+if __name__ == "__main__":
+    unittest.main()
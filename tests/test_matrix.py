@@ -0,0 +1,33 @@
+import unittest
+
+from save_editor_AGB_AY5E.generator import SaveGenerator
+from save_editor_AGB_AY5E.matrix import SaveMatrix
+from save_editor_AGB_AY5E.save import Save
+
+
+class SaveMatrixTest(unittest.TestCase):
+    def test_append_after_views(self):
+        saves = list(SaveGenerator(seed=2).generate(3))
+        matrix = SaveMatrix()
+        matrix.extend(saves[:2])
+
+        cards = matrix.card_words()
+        duelists = matrix.duelist_words()
+        # The views are still alive: the matrix must be able to grow anyway.
+        matrix.append(saves[2])
+        self.assertEqual(len(matrix), 3)
+
+        self.assertEqual(cards.shape[0], 2)
+        self.assertEqual(duelists.shape[0], 2)
+        stats = Save.loads(saves[1]).get_detailed_cards_stats().cards
+        self.assertEqual(cards.tolist()[1], [card.word for card in stats])
+        self.assertEqual(matrix.card_words().shape[0], 3)
+
+    def test_empty(self):
+        matrix = SaveMatrix()
+        self.assertEqual(matrix.card_words().shape, (0, len(Save().get_detailed_cards_stats().cards)))
+        self.assertEqual(matrix.duelist_words().tolist(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from save_editor_AGB_AY5E.passwords import PasswordList, main, password_index, redeem
+from save_editor_AGB_AY5E.save import Save
+
+
+class PasswordsTest(unittest.TestCase):
+    def setUp(self):
+        self.cards = sorted(password_index().cards.values(), key=lambda card: card.ID)[:2]
+
+    def test_parse(self):
+        passwords = PasswordList.parse(["# comment", "", self.cards[0].Password, "00000000", self.cards[0].Password])
+        self.assertEqual(passwords.cards, [self.cards[0]])
+        self.assertEqual(passwords.unknown, [(4, "00000000")])
+        self.assertEqual(passwords.duplicates, [(5, self.cards[0].Password)])
+
+    def test_redeem(self):
+        save = Save()
+        res = redeem(save, self.cards)
+        self.assertEqual(res.added, self.cards)
+        stats = save.get_detailed_cards_stats().cards[self.cards[0].ID]
+        self.assertEqual((stats.copiesTrunk, stats.password), (1, True))
+        # Passwords can only be used once.
+        res = redeem(save, self.cards)
+        self.assertFalse(res)
+        self.assertEqual(res.already, self.cards)
+
+    def test_damaged_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [os.path.join(directory, name) for name in ("passwords.txt", "good.sav", "bad.sav")]
+            with open(paths[0], 'w') as fd:
+                fd.write("\n".join(card.Password for card in self.cards))
+            data = Save().dumps()
+            with open(paths[1], 'wb') as fd:
+                fd.write(data)
+            # A pack that does not exist (KeyError when loading the savegame).
+            damaged = bytearray(data)
+            codec = Save().codec
+            codec.last_pack.set(damaged, 0xFF)
+            codec.checksum.set(damaged, codec.compute_checksum(damaged))
+            with open(paths[2], 'wb') as fd:
+                fd.write(damaged)
+
+            stdout, stderr = io.StringIO(), io.StringIO()
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                status = main([paths[0], paths[2], paths[1]])
+            self.assertEqual(status, 1)
+            self.assertIn("bad.sav: cannot update the savegame", stderr.getvalue())
+            self.assertIn("good.sav: 2 added", stdout.getvalue())
+            with open(paths[1], 'rb') as fd:
+                save = Save.load(fd)
+            self.assertTrue(save.get_detailed_cards_stats().cards[self.cards[1].ID].password)
+
+
+if __name__ == "__main__":
+    unittest.main()
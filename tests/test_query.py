@@ -0,0 +1,119 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from datetime import date
+
+from save_editor_AGB_AY5E import constants
+from save_editor_AGB_AY5E.constants import Offsets
+from save_editor_AGB_AY5E.generator import SaveGenerator
+from save_editor_AGB_AY5E.query import MERGE_GAP, Query, compile_condition, main, query_files
+from save_editor_AGB_AY5E.save import Save
+
+
+YUGI = constants.DUELISTS["Yugi Muto"].ID
+DARK_MAGICIAN = constants.CARDS["Dark Magician"].ID
+
+
+class QueryTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.paths = []
+        self.saves = []
+        for index, data in enumerate(SaveGenerator(seed=48).generate(12)):
+            save = Save.loads(data)
+            if index % 3 == 0:
+                save.get_detailed_cards_stats().cards[DARK_MAGICIAN].password = True
+            path = os.path.join(self.directory.name, "{:02}.sav".format(index))
+            save.write(path)
+            self.paths.append(path)
+            self.saves.append(save)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def expected(self, predicate):
+        return [path for path, save in zip(self.paths, self.saves) if predicate(save)]
+
+    def found(self, conditions, any=False):
+        query = Query(conditions, any)
+        return [path for path in self.paths if query.matches(path)]
+
+    def test_conditions(self):
+        def card(save):
+            return save.get_detailed_cards_stats().cards[DARK_MAGICIAN]
+
+        def yugi(save):
+            return save.get_detailed_duelists_stats().duelists[YUGI]
+
+        cases = (
+            ("card[Dark Magician].copies > 1", lambda save: int(card(save)) > 1),
+            ("card[{}].trunk <= 2".format(DARK_MAGICIAN), lambda save: card(save).copiesTrunk <= 2),
+            ("card[Dark Magician].password == 1", lambda save: card(save).password),
+            ("duelist[Yugi Muto].won >= 20", lambda save: yugi(save).won >= 20),
+            ("duelist[{}].lost < 10".format(YUGI), lambda save: yugi(save).lost < 10),
+            ("date >= 2003-01-01", lambda save: save.get_ingame_date() >= date(2003, 1, 1)),
+            ("grandpa_cup = true", lambda save: save.grandpaCupQualification),
+            ("last_duelist == Espa Roba", lambda save: save.lastDuelistFought.Name == "Espa Roba"),
+        )
+        for condition, predicate in cases:
+            self.assertEqual(self.found([condition]), self.expected(predicate), condition)
+
+        conditions = [cases[0][0], cases[3][0]]
+        self.assertEqual(self.found(conditions), self.expected(lambda save: cases[0][1](save) and cases[3][1](save)))
+        self.assertEqual(self.found(conditions, any=True), self.expected(lambda save: cases[0][1](save) or cases[3][1](save)))
+
+    def test_invalid(self):
+        for condition in ("card[Dark Magician] > 1", "card[Unknown].copies > 1", "duelist[1].copies > 1",
+                          "unknown > 1", "date[1] > 1", "last_pack == Unknown", "copies"):
+            with self.assertRaises(ValueError, msg=condition):
+                compile_condition(condition)
+
+    def test_plan(self):
+        query = Query(["date > 0", "announcements > 0", "card[1].copies > 0"])
+        # The game ID is always read, and close reads are merged.
+        self.assertEqual(query.plan, [
+            (Offsets.STATS_CARDS + 4, Offsets.STATS_CARDS + 8),
+            (Offsets.DAYS_ELAPSED, Offsets.CHECKSUM),
+        ])
+        self.assertLessEqual(Offsets.ANNOUNCEMENTS - Offsets.DAYS_ELAPSED, MERGE_GAP)
+
+    def test_other_files(self):
+        query = Query(["date >= 0"])
+        short = os.path.join(self.directory.name, "short.sav")
+        other = os.path.join(self.directory.name, "other.sav")
+        with open(short, 'wb') as fd:
+            fd.write(b"\0" * Offsets.DAYS_ELAPSED)
+        with open(other, 'wb') as fd:
+            fd.write(b"\0" * Offsets.EOF)
+        missing = os.path.join(self.directory.name, "missing.sav")
+        results = list(query_files(query, [self.paths[0], short, other, missing], jobs=2))
+        self.assertEqual([path for path, result in results], [self.paths[0], short, other, missing])
+        self.assertEqual([result for path, result in results[:3]], [True, False, False])
+        self.assertIsInstance(results[3][1], OSError)
+
+    def test_main(self):
+        listing = os.path.join(self.directory.name, "files.txt")
+        with open(listing, 'w') as fd:
+            fd.write("\n".join(self.paths[1:]) + "\n\n")
+        expected = self.expected(lambda save: save.get_detailed_duelists_stats().duelists[YUGI].won >= 20)
+        self.assertTrue(expected)
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            status = main(["-w", "duelist[Yugi Muto].won >= 20", "-T", listing, "-j", "3", self.paths[0]])
+        self.assertEqual(status, 0)
+        self.assertEqual(output.getvalue().splitlines(), expected)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(main(["-w", "duelist[Yugi Muto].won > 99", *self.paths]), 1)
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertEqual(main(["-w", "date > 0", os.path.join(self.directory.name, "missing.sav")]), 2)
+            with self.assertRaises(SystemExit):
+                main(["-w", "unknown > 0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from save_editor_AGB_AY5E import constants
+from save_editor_AGB_AY5E.constants import Offsets
+from save_editor_AGB_AY5E.generator import SaveGenerator
+from save_editor_AGB_AY5E.repair import COUNTERS_PACKER, main, repair, repair_files
+from save_editor_AGB_AY5E.save import Save
+
+
+class RepairTest(unittest.TestCase):
+    def setUp(self):
+        self.data = next(SaveGenerator(seed=44).generate(1))
+
+    def check_repaired(self, buffer, *offsets):
+        report = repair(buffer)
+        self.assertTrue(report.repairable, report.problems)
+        self.assertEqual([fix.offset for fix in report.fixes], list(offsets))
+        self.assertEqual(Save.loads(bytes(buffer)), Save.loads(self.data))
+        # Nothing is left to repair.
+        self.assertFalse(repair(buffer))
+
+    def test_intact(self):
+        buffer = bytearray(self.data)
+        report = repair(buffer)
+        self.assertFalse(report)
+        self.assertTrue(report.repairable)
+        self.assertEqual(buffer, self.data)
+
+    def test_counters(self):
+        buffer = bytearray(self.data)
+        COUNTERS_PACKER.pack_into(buffer, Offsets.NB_CARDS_TOTAL, 0, 0, 0, 0)
+        self.check_repaired(buffer, Offsets.NB_CARDS_TOTAL)
+        self.assertEqual(buffer, self.data)
+
+    def test_checksum(self):
+        buffer = bytearray(self.data)
+        buffer[Offsets.CHECKSUM] ^= 0xFF
+        self.check_repaired(buffer, Offsets.CHECKSUM)
+        self.assertEqual(buffer, self.data)
+
+    def test_decks(self):
+        # The decks get rebuilt in a different order, but the checksum
+        # does not depend on the order of the 16-bit values it covers.
+        buffer = bytearray(self.data)
+        buffer[Offsets.CARDS_MAIN:Offsets.CARDS_MAIN + 2] = b"\0\0"
+        buffer[Offsets.CARDS_SIDE + 2 * 14:Offsets.CARDS_SIDE + 2 * 15] = b"\1\0"
+        self.check_repaired(buffer, Offsets.CARDS_MAIN, Offsets.CARDS_SIDE)
+
+    def test_size_and_padding(self):
+        buffer = bytearray(self.data[:Offsets.FINAL_PADDING + 1])
+        buffer[Offsets.HEADER] = 0x12
+        self.check_repaired(buffer, Offsets.EOF, Offsets.HEADER)
+        self.assertEqual(buffer, self.data)
+
+        buffer = bytearray(self.data + b"\0")
+        buffer[Offsets.FINAL_PADDING] = 0
+        self.check_repaired(buffer, Offsets.EOF, Offsets.FINAL_PADDING)
+
+    def test_problems(self):
+        buffer = bytearray(self.data)
+        # Too many copies of Dark Magician in the decks (alternate artwork included).
+        for name in ("Dark Magician", "Dark Magician" + constants.ALTERNATIVE_ARTWORK_SUFFIX):
+            offset = Offsets.STATS_CARDS + 4 * constants.CARDS[name].ID
+            buffer[offset + 1] |= 0x0C
+        report = repair(buffer)
+        self.assertFalse(report.repairable)
+        self.assertEqual(len(report.problems), 1)
+        self.assertIn("Dark Magician", report.problems[0])
+
+        buffer = bytearray(self.data)
+        buffer[Offsets.GAME_ID] ^= 0xFF
+        report = repair(buffer)
+        self.assertEqual(report.problems, ["invalid game ID"])
+        self.assertFalse(report)
+
+    def test_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "save.sav")
+            with open(path, 'wb') as fd:
+                fd.write(self.data[:-1])
+
+            (filename, report), = repair_files([path], dry_run=True)
+            self.assertEqual((filename, [fix.offset for fix in report.fixes]), (path, [Offsets.EOF]))
+            self.assertEqual(os.path.getsize(path), len(self.data) - 1)
+
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                self.assertEqual(main([path]), 0)
+                self.assertEqual(main(["-q", path]), 0)
+                self.assertEqual(main([path]), 0)
+            self.assertEqual(output.getvalue().splitlines(), [
+                "{}: {:#06x}: file size was 0x7fff bytes".format(path, Offsets.EOF),
+                "{}: OK".format(path),
+            ])
+            with open(path, 'rb') as fd:
+                self.assertEqual(fd.read(), self.data)
+
+            with contextlib.redirect_stderr(io.StringIO()):
+                self.assertEqual(main([os.path.join(directory, "missing.sav")]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
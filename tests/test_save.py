@@ -0,0 +1,167 @@
+import os
+import random
+import tempfile
+import threading
+import unittest
+
+from datetime import date
+
+from save_editor_AGB_AY5E import constants
+from save_editor_AGB_AY5E.constants import Offsets
+from save_editor_AGB_AY5E.generator import SaveGenerator
+from save_editor_AGB_AY5E.save import Save
+
+
+class DumpTest(unittest.TestCase):
+    def test_loads_dumps(self):
+        for data in SaveGenerator(seed=10).generate(5):
+            self.assertEqual(Save.loads(data).dumps(), data)
+
+    def test_new_save(self):
+        save = Save()
+        data = save.dumps()
+        self.assertEqual(len(data), save.layout.size)
+        self.assertEqual(Save.loads(data).dumps(), data)
+
+    def test_dumps_into(self):
+        save = Save.loads(next(SaveGenerator(seed=11).generate(1)))
+        save.set_ingame_date(date(2002, 2, 2))
+        buffer = Save.new_buffer()
+        save.dumps_into(buffer)
+        self.assertEqual(bytes(buffer), save.dumps())
+        self.assertEqual(Save.loads(bytes(buffer)).get_ingame_date(), date(2002, 2, 2))
+
+    def test_reused_buffer(self):
+        first, second = (Save.loads(data) for data in SaveGenerator(seed=12).generate(2))
+        # Each thread serializes into a single buffer, but the results are independent copies.
+        self.assertIs(first.get_buffer(), second.get_buffer())
+        data = first.dumps()
+        self.assertNotEqual(second.dumps(), data)
+        self.assertEqual(Save.loads(data), first)
+
+        buffers = []
+        thread = threading.Thread(target=lambda: buffers.append(first.get_buffer()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(buffers[0], first.get_buffer())
+
+    def test_write(self):
+        save = Save.loads(next(SaveGenerator(seed=13).generate(1)))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "save.sav")
+            save.write(path)
+            self.assertEqual(save.filename, path)
+            with open(path, 'rb') as fd:
+                self.assertEqual(fd.read(), save.dumps())
+
+
+class BaseLayerTest(unittest.TestCase):
+    def full(self, save):
+        # The whole savegame, serialized from scratch.
+        buffer = Save.new_buffer()
+        save.pack_into(buffer)
+        return bytes(buffer)
+
+    def test_patch(self):
+        rng = random.Random(45)
+        for data in SaveGenerator(seed=45).generate(10):
+            save = Save.loads(data)
+            cards = save.get_detailed_cards_stats().cards
+            duelists = save.get_detailed_duelists_stats().duelists
+            for i in range(rng.randrange(1, 5)):
+                card = rng.choice(cards[1:])
+                card.copiesTrunk = rng.randrange(10)
+                duelists[rng.randrange(1, len(duelists))].won = rng.randrange(100)
+            if rng.random() < 0.5:
+                card = next(card for card in cards if card.copiesMain)
+                card.copiesMain -= 1
+                card.copiesTrunk += 1
+            save.publicationVictories = rng.randrange(100)
+            self.assertEqual(save.dumps(), self.full(save))
+            # The result becomes the new base layer.
+            self.assertEqual(save.base, self.full(save))
+            self.assertFalse(save.edits or save.cardsStats.overlay or save.duelistsStats.overlay)
+
+    def test_untouched_data(self):
+        data = bytearray(next(SaveGenerator(seed=46).generate(1)))
+        save = Save.loads(bytes(data))
+        codec = save.codec
+        dark_magician = codec.cards.offset + 4 * constants.CARDS["Dark Magician"].ID
+        data[dark_magician + 3] = 0x80
+        data[Offsets.PADDING_1] = 0x42
+        data[Offsets.HEADER + 4] = 0x01
+        main, extra, side = save.get_deck_order()
+        codec.main.set(data, *main[::-1], *codec.main.get(data)[len(main):])
+        codec.checksum.set(data, codec.compute_checksum(data))
+
+        save = Save.loads(bytes(data))
+        save.get_detailed_cards_stats().cards[constants.CARDS["Dark Magician"].ID].copiesTrunk += 1
+        save.get_detailed_duelists_stats().duelists[constants.DUELISTS["Yugi Muto"].ID].won += 1
+        save.publicationVictories += 1
+        result = save.dumps()
+        self.assertEqual(result[dark_magician + 3], 0x80)
+        self.assertEqual(result[Offsets.PADDING_1], 0x42)
+        self.assertEqual(result[Offsets.HEADER + 4], 0x01)
+        self.assertEqual(save.get_deck_order()[0], main[::-1])
+        self.assertEqual(codec.checksum.get(result), codec.compute_checksum(result))
+        self.assertEqual(Save.loads(result), save)
+
+        # The decks are rebuilt once their contents change.
+        card = next(card for card in save.get_detailed_cards_stats().cards if card.copiesMain)
+        card.copiesMain -= 1
+        card.copiesTrunk += 1
+        self.assertEqual(save.get_deck_order()[0], save.get_decks()[0])
+
+
+class DigestTest(unittest.TestCase):
+    def setUp(self):
+        self.data = next(SaveGenerator(seed=14).generate(1))
+        self.save = Save.loads(self.data)
+
+    def test_raw_data(self):
+        self.assertEqual(Save.digest_bytes(self.data), self.save.digest())
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "save.sav")
+            with open(path, 'wb') as fd:
+                fd.write(self.data)
+            self.assertEqual(Save.digest_file(path), self.save.digest())
+
+    def test_equality(self):
+        other = Save.loads(self.data)
+        self.assertEqual(other, self.save)
+        self.assertEqual(hash(other), hash(self.save))
+        self.assertEqual(len({self.save, other, Save()}), 2)
+        self.assertNotEqual(self.save, Save())
+
+    def test_ignored_data(self):
+        # Bits the editor does not handle and the order of the decks are left out.
+        data = bytearray(self.data)
+        codec = self.save.codec
+        data[codec.cards.offset + 3] |= 0x80
+        codec.checksum.set(data, codec.compute_checksum(data))
+        self.assertEqual(Save.loads(bytes(data)), self.save)
+
+        other = Save.loads(self.data)
+        main, extra, side = other.get_deck_order()
+        other.set_deck_order(main[::-1], extra[::-1], side[::-1])
+        self.assertEqual(other, self.save)
+
+    def test_cache(self):
+        digest = self.save.digest()
+        # Loading other saves keeps the cached digest.
+        Save.loads(next(SaveGenerator(seed=15).generate(1)))
+        self.assertIsNotNone(self.save.digestCache)
+        self.assertIs(self.save.digest(), digest)
+
+        self.save.get_detailed_duelists_stats().duelists[constants.DUELISTS["Yugi Muto"].ID].won += 1
+        self.assertNotEqual(self.save.digest(), digest)
+        self.save.get_detailed_duelists_stats().duelists[constants.DUELISTS["Yugi Muto"].ID].won -= 1
+        self.assertEqual(self.save.digest(), digest)
+
+        self.save.publicationVictories += 1
+        self.assertIsNone(self.save.digestCache)
+        self.assertNotEqual(self.save.digest(), digest)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import gzip
+import os
+import tempfile
+import unittest
+import zlib
+
+from datetime import date
+
+from save_editor_AGB_AY5E import savestate
+from save_editor_AGB_AY5E.generator import SaveGenerator
+from save_editor_AGB_AY5E.save import Save
+from save_editor_AGB_AY5E.savestate import (
+    CHUNK_CRC, CHUNK_HEADER, GAME_CODE, MGBA_GAME_CODE, MGBA_STATE_SIZE, PNG_SIGNATURE,
+    REGION_END, REGION_OFFSET, SaveStateError,
+)
+
+
+def png_chunk(kind, data):
+    return CHUNK_HEADER.pack(len(data), kind) + data + CHUNK_CRC.pack(zlib.crc32(kind + data))
+
+
+class SaveStateTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.data = next(SaveGenerator(seed=20).generate(1))
+        state = bytearray(MGBA_STATE_SIZE)
+        state[MGBA_GAME_CODE:MGBA_GAME_CODE + len(GAME_CODE)] = GAME_CODE
+        state[REGION_OFFSET:REGION_END] = self.data[:REGION_END - REGION_OFFSET]
+        self.state = bytes(state)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, contents):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'wb') as fd:
+            fd.write(contents)
+        return path
+
+    def states(self):
+        return [
+            self.write("raw.ss0", self.state),
+            self.write("gzip.ss1", gzip.compress(self.state)),
+            self.write("screenshot.png", PNG_SIGNATURE + b"".join([
+                png_chunk(b"IHDR", bytes(13)),
+                png_chunk(b"gbAs", zlib.compress(self.state)),
+                png_chunk(b"IEND", b""),
+            ])),
+        ]
+
+    def test_read(self):
+        for path in self.states():
+            self.assertEqual(savestate.read_region(path), self.data[:REGION_END - REGION_OFFSET], path)
+            self.assertEqual(savestate.load(path).dumps(), self.data, path)
+
+    def test_write(self):
+        for path in self.states():
+            save = savestate.load(path)
+            save.set_ingame_date(date(2050, 5, 5))
+            savestate.dump(save, path)
+            self.assertEqual(savestate.load(path).get_ingame_date(), date(2050, 5, 5), path)
+            self.assertEqual(Save.loads(savestate.load(path).dumps()), save)
+
+    def test_other_game(self):
+        state = bytearray(self.state)
+        state[MGBA_GAME_CODE:MGBA_GAME_CODE + len(GAME_CODE)] = b"XXXX"
+        path = self.write("other.ss0", state)
+        with self.assertRaises(SaveStateError):
+            savestate.read_region(path)
+
+    def test_iter_saves(self):
+        expected = self.states()
+        self.write("truncated.ss2", self.state[:REGION_OFFSET])
+        self.write("notes.txt", b"")
+        paths = [path for path, save in savestate.iter_saves(self.directory.name)]
+        self.assertEqual(paths, sorted(expected))
+
+
+if __name__ == "__main__":
+    unittest.main()
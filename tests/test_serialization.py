@@ -0,0 +1,68 @@
+import json
+import unittest
+
+from save_editor_AGB_AY5E.generator import SaveGenerator
+from save_editor_AGB_AY5E.save import Save
+
+
+class RoundTripTest(unittest.TestCase):
+    def make_save(self) -> bytes:
+        data = bytearray(next(iter(SaveGenerator(seed=1).generate(1))))
+        # A language other than the default & bits of the cards' words unknown to the editor.
+        data[Save().layout.language] = 3
+        cards = Save().codec.cards
+        for index, word in ((1, 0x00010000), (2, 0xFFFC0000), (819, 0x80000000)):
+            offset = cards.offset + 4 * index
+            data[offset:offset + 4] = (int.from_bytes(data[offset:offset + 4], 'little') | word).to_bytes(4, 'little')
+        Save().codec.checksum.set(data, Save.checksum(data))
+        return bytes(data)
+
+    def test_round_trip(self):
+        data = self.make_save()
+        save = Save.loads(data)
+        self.assertEqual(save.dumps(), data)
+
+        record = json.loads(json.dumps(save.to_dict()))
+        self.assertEqual(record["language"], 3)
+        self.assertEqual(Save.from_dict(record).dumps(), data)
+
+    def test_deck_order(self):
+        data = bytearray(self.make_save())
+        codec = Save().codec
+        main = list(codec.main.get(data)[:codec.counters.get(data)[1]])
+        self.assertGreater(len(set(main)), 1)
+        # The game does not keep the decks sorted.
+        main.reverse()
+        codec.main.set(data, *main, *[0] * (len(codec.main.get(data)) - len(main)))
+        codec.checksum.set(data, Save.checksum(data))
+        data = bytes(data)
+
+        record = json.loads(json.dumps(Save.loads(data).to_dict()))
+        self.assertEqual(len(record["decks"]["main"]), len(main))
+        save = Save.from_dict(record)
+        self.assertEqual(save.dumps(), data)
+        self.assertEqual(save.get_deck_order()[0], main)
+
+        # The order is dropped once the contents of the deck change.
+        card = save.get_detailed_cards_stats().cards[main[0]]
+        card.copiesMain -= 1
+        card.copiesTrunk += 1
+        self.assertEqual(save.get_deck_order()[0], sorted(main[1:]))
+
+        record["decks"]["main"] = record["decks"]["main"][1:]
+        with self.assertRaises(ValueError):
+            Save.from_dict(record)
+
+    def test_invalid_values(self):
+        for record in (
+            {"duelists": {"Yugi Muto": {"drawn": 1500}}},
+            {"cards": {"Dark Magician": {"main": 4}}},
+            {"cards": {"Dark Magician": {"unknown": 1}}},
+            {"language": 256},
+        ):
+            with self.assertRaises(ValueError):
+                Save.from_dict(record)
+
+
+if __name__ == "__main__":
+    unittest.main()
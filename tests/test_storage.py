@@ -0,0 +1,80 @@
+import os
+import stat
+import tempfile
+import unittest
+
+from unittest import mock
+
+from save_editor_AGB_AY5E.storage import GroupCommitWriter, atomic_write
+
+
+class AtomicWriteTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "save.sav")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_write_and_backup(self):
+        atomic_write(self.path, b"old")
+        atomic_write(self.path, b"new", backup=True)
+        with open(self.path, 'rb') as fd:
+            self.assertEqual(fd.read(), b"new")
+        with open(self.path + ".bak", 'rb') as fd:
+            self.assertEqual(fd.read(), b"old")
+        # No temporary file is left behind.
+        self.assertEqual(sorted(os.listdir(self.directory.name)), ["save.sav", "save.sav.bak"])
+
+    def test_permissions(self):
+        umask = os.umask(0o022)
+        os.umask(umask)
+        atomic_write(self.path, b"new")
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o666 & ~umask)
+
+        # The permissions of the file being replaced are kept.
+        os.chmod(self.path, 0o640)
+        atomic_write(self.path, b"newer")
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o640)
+
+
+class GroupCommitWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_batches(self):
+        with GroupCommitWriter(max_pending=2, max_delay=None) as writer:
+            writer.write(self.path("a"), b"a")
+            self.assertFalse(os.path.exists(self.path("a")))
+            writer.write(self.path("b"), b"b")
+            # The batch is full: both files are committed.
+            self.assertEqual(writer.committed, 2)
+            writer.write(self.path("c"), b"c")
+        self.assertEqual(writer.committed, 3)
+        self.assertEqual(sorted(os.listdir(self.directory.name)), ["a", "b", "c"])
+
+    def test_background_failure(self):
+        writer = GroupCommitWriter(max_delay=0.01)
+        with mock.patch("os.fsync", side_effect=OSError(5, "Input/output error")):
+            writer.write(self.path("a"), b"a")
+            timer = writer.timer
+            timer.join()
+
+        # The failure of the commit made by the timer is reported to the caller.
+        with self.assertRaises(OSError):
+            writer.close()
+        self.assertEqual(os.listdir(self.directory.name), [])
+        # ...only once.
+        writer.write(self.path("b"), b"b")
+        writer.close()
+        self.assertEqual(os.listdir(self.directory.name), ["b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
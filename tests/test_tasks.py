@@ -0,0 +1,105 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from save_editor_AGB_AY5E.generator import SaveGenerator
+from save_editor_AGB_AY5E.save import Save
+from save_editor_AGB_AY5E.tasks import BackgroundTask
+from save_editor_AGB_AY5E.workspace import Document
+
+
+def run(work, cancel=False):
+    done = threading.Event()
+    task = BackgroundTask("test", work, lambda task: done.set())
+    if cancel:
+        task.cancel()
+    task.start()
+    assert done.wait(5)
+    return task
+
+
+class BackgroundTaskTest(unittest.TestCase):
+    def test_result(self):
+        task = run(lambda task: 42)
+        self.assertEqual((task.result, task.error, task.cancelled, task.progress), (42, None, False, 1.0))
+
+    def test_error(self):
+        def work(task):
+            raise OSError("failed")
+        task = run(work)
+        self.assertIsInstance(task.error, OSError)
+        self.assertFalse(task.cancelled)
+
+    def test_cancel(self):
+        def work(task):
+            task.report(2.0)
+            self.assertEqual(task.progress, 1.0)
+            task.check()
+            return 42
+        task = run(work, cancel=True)
+        self.assertIsNone(task.result)
+        self.assertIsNone(task.error)
+        self.assertTrue(task.cancelled)
+
+
+class DocumentTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "save.sav")
+        self.data = next(SaveGenerator(seed=41).generate(1))
+        with open(self.path, 'wb') as fd:
+            fd.write(self.data)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_load(self):
+        progress = []
+
+        def work(task):
+            document = Document.load(self.path, task)
+            progress.append(task.progress)
+            return document
+
+        task = run(work)
+        self.assertEqual(task.result.save.dumps(), self.data)
+        self.assertEqual(task.result.save.filename, self.path)
+        self.assertEqual(progress, [0.9])
+
+    def test_load_cancelled(self):
+        task = run(lambda task: Document.load(self.path, task), cancel=True)
+        self.assertTrue(task.cancelled)
+        self.assertIsNone(task.result)
+
+    def test_write(self):
+        document = Document.load(self.path)
+        document.unsaved = True
+        generation = document.generation
+        data = document.save.dumps()
+        path = os.path.join(self.directory.name, "copy.sav")
+
+        task = run(lambda task: Document.write(path, data, task))
+        self.assertIsNone(task.error)
+        document.written(path, data)
+        self.assertFalse(document.unsaved)
+        self.assertEqual(document.generation, generation)
+        self.assertEqual(document.save.filename, path)
+        self.assertEqual(document.sync.base, data)
+        with open(path, 'rb') as fd:
+            self.assertEqual(fd.read(), data)
+
+    def test_edited_while_writing(self):
+        document = Document.load(self.path)
+        data = document.save.dumps()
+        # The save is edited after being serialized: it is still unsaved.
+        document.save.publicationVictories += 1
+        document.unsaved = True
+        Document.write(self.path, data)
+        document.written(self.path, data)
+        self.assertTrue(document.unsaved)
+        self.assertEqual(Save.loads(data).publicationVictories + 1, document.save.publicationVictories)
+
+
+if __name__ == "__main__":
+    unittest.main()
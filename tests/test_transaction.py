@@ -0,0 +1,58 @@
+import unittest
+
+from save_editor_AGB_AY5E import constants
+from save_editor_AGB_AY5E.save import Save
+from save_editor_AGB_AY5E.stats import TrackedStats
+from save_editor_AGB_AY5E.transaction import TransactionError
+
+
+def card(save, name):
+    return save.get_detailed_cards_stats().cards[constants.CARDS[name].ID]
+
+
+class SaveTransactionTest(unittest.TestCase):
+    def test_dicts(self):
+        save = Save()
+        with save.edit() as tx:
+            tx.set_cards({"Dark Magician": {"copiesTrunk": 2, "copiesMain": 1}})
+            tx.set_duelists({"Yugi Muto": {"won": 10}})
+        stats = card(save, "Dark Magician")
+        self.assertEqual((stats.copiesTrunk, stats.copiesMain), (2, 1))
+        self.assertEqual(save.get_detailed_duelists_stats().duelists[constants.DUELISTS["Yugi Muto"].ID].won, 10)
+
+    def test_words_keep_unknown_bits(self):
+        save = Save()
+        other = Save()
+        digest = other.digest()
+        generation = TrackedStats.generation
+
+        cards = save.get_detailed_cards_stats().cards
+        words = [stats.word for stats in cards]
+        words[1] = 0x80000000 | 0x20000 | 2
+        tx = save.edit()
+        tx.set_cards(words)
+        # Staging words does not count as editing any statistics.
+        self.assertEqual(TrackedStats.generation, generation)
+        tx.commit()
+
+        self.assertEqual(cards[1].word, words[1])
+        self.assertEqual(cards[1].unknownBits, 0x80000000)
+        self.assertEqual(Save.loads(save.dumps()).get_detailed_cards_stats().cards[1].word, words[1])
+        self.assertEqual(other.digest(), digest)
+
+    def test_violations(self):
+        save = Save()
+        data = save.dumps()
+        variant = "Dark Magician" + constants.ALTERNATIVE_ARTWORK_SUFFIX
+        with self.assertRaises(TransactionError) as context:
+            with save.edit() as tx:
+                # Both variants share the same limit.
+                tx.set_cards({"Dark Magician": {"copiesMain": 3}, variant: {"copiesSide": 1}})
+                tx.set_cards({"Mystical Elf": {"unknownBits": 1}})
+                tx.set_duelists({"Yugi Muto": {"won": -1}})
+        self.assertEqual(len(context.exception.errors), 3)
+        self.assertEqual(save.dumps(), data)
+
+
+if __name__ == "__main__":
+    unittest.main()
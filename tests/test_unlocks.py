@@ -0,0 +1,55 @@
+import unittest
+
+from save_editor_AGB_AY5E import constants
+from save_editor_AGB_AY5E.enums import SpecialDuelist
+from save_editor_AGB_AY5E.generator import SaveGenerator
+from save_editor_AGB_AY5E.matrix import SaveMatrix
+from save_editor_AGB_AY5E.save import Save
+from save_editor_AGB_AY5E.unlocks import UNLOCKS, NationalVictories, Requirement
+
+
+class UnlocksTest(unittest.TestCase):
+    def test_new_game(self):
+        report = UNLOCKS.evaluate(Save())
+        # Only the first stage is available from the start.
+        self.assertIn("Yugi Muto", report.duelists)
+        self.assertNotIn(constants.DUELISTS[SpecialDuelist.SIMON].Name, report.duelists)
+        self.assertEqual(report.packs, [])
+        missing = report.missing[("duelist", constants.DUELISTS[SpecialDuelist.SIMON].Name)]
+        self.assertEqual([type(requirement) for requirement in missing], [NationalVictories])
+
+    def test_plan(self):
+        save = Save()
+        trusdale = constants.DUELISTS[SpecialDuelist.TRUSDALE].Name
+        targets = [("pack", "Exodia"), ("duelist", trusdale)]
+        edits = UNLOCKS.plan(save, targets)
+        self.assertTrue(edits)
+        UNLOCKS.apply(save, edits)
+
+        report = UNLOCKS.evaluate(save)
+        self.assertIn("Exodia", report.packs)
+        # Trusdale requires Simon to be unlocked first.
+        self.assertIn(trusdale, report.duelists)
+        self.assertIn(constants.DUELISTS[SpecialDuelist.SIMON].Name, report.duelists)
+        # The savegame is still valid.
+        Save.loads(save.dumps())
+        self.assertEqual(UNLOCKS.plan(save, targets), [])
+
+    def test_matrix(self):
+        saves = list(SaveGenerator(seed=30).generate(8))
+        matrix = SaveMatrix()
+        matrix.extend(saves)
+        results = UNLOCKS.evaluate_matrix(matrix)
+        for index, data in enumerate(saves):
+            report = UNLOCKS.evaluate(Save.loads(data))
+            for kind, name in UNLOCKS.rules:
+                unlocked = name in (report.duelists if kind == "duelist" else report.packs)
+                self.assertEqual(results[(kind, name)][index], unlocked, (index, kind, name))
+
+    def test_abstract(self):
+        with self.assertRaises(TypeError):
+            Requirement()
+
+
+if __name__ == "__main__":
+    unittest.main()
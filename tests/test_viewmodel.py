@@ -0,0 +1,93 @@
+import unittest
+
+from save_editor_AGB_AY5E import constants
+from save_editor_AGB_AY5E.enums import CardColumn, DuelistColumn
+from save_editor_AGB_AY5E.generator import SaveGenerator
+from save_editor_AGB_AY5E.legality import variant_groups
+from save_editor_AGB_AY5E.save import Save
+from save_editor_AGB_AY5E.viewmodel import CardsView, DuelistsView, compute_card_usage
+from save_editor_AGB_AY5E.workspace import Document, static_columns
+
+
+DARK_MAGICIAN = constants.CARDS["Dark Magician"].ID
+VARIANT = constants.CARDS["Dark Magician" + constants.ALTERNATIVE_ARTWORK_SUFFIX].ID
+
+
+def row_of(card_id):
+    return list(static_columns().cardIDs).index(card_id)
+
+
+class CardsViewTest(unittest.TestCase):
+    def setUp(self):
+        data = next(SaveGenerator(seed=46).generate(1))
+        self.document = Document(Save.loads(data), data)
+        self.view = CardsView(self.document)
+        self.cards = self.document.save.get_detailed_cards_stats().cards
+
+    def test_rows(self):
+        rows = self.view.rows()
+        self.assertEqual(len(rows), len(static_columns().cardIDs))
+        for index, values in rows:
+            stats = self.cards[static_columns().cardIDs[index]]
+            used = stats.usage
+            limit = stats.card.Limit.value
+            self.assertEqual(values, (
+                stats.copiesTrunk, stats.copiesMain + stats.copiesExtra, stats.copiesSide, stats.password,
+                compute_card_usage(used, limit), "{}/{}".format(used, limit),
+            ))
+            self.assertEqual(self.view.row(index), values)
+        self.assertEqual(self.view.rows([3, 1]), [rows[3], rows[1]])
+
+    def test_edit(self):
+        index = row_of(DARK_MAGICIAN)
+        for card_id in (DARK_MAGICIAN, VARIANT):
+            self.cards[card_id].copiesMain = self.cards[card_id].copiesSide = self.cards[card_id].copiesExtra = 0
+        self.cards[DARK_MAGICIAN].copiesTrunk = 5
+
+        self.assertTrue(self.view.set_value(index, CardColumn.MAIN_EXTRA, 2))
+        self.assertFalse(self.view.set_value(index, CardColumn.MAIN_EXTRA, 2))
+        self.assertEqual(self.cards[DARK_MAGICIAN].copiesMain, 2)
+        # The limit is shared with the alternate artwork.
+        self.assertEqual(CardsView(self.document).bounds(row_of(VARIANT), CardColumn.SIDE), (0, 1))
+        self.assertTrue(self.view.toggle_password(index))
+        self.assertTrue(self.view.row(index)[3])
+
+    def test_location(self):
+        fusion = next(card_id for card_id, fusion in enumerate(variant_groups().fusions) if fusion)
+        self.assertEqual(self.view.location(row_of(fusion), CardColumn.MAIN_EXTRA), "extra")
+        self.assertEqual(self.view.location(row_of(DARK_MAGICIAN), CardColumn.MAIN_EXTRA), "main")
+        self.assertEqual(self.view.location(0, CardColumn.TRUNK), "trunk")
+        with self.assertRaises(ValueError):
+            self.view.location(0, CardColumn.USED)
+
+    def test_summary(self):
+        summary = CardsView(Document(Save())).summary()
+        self.assertEqual((summary["total"], summary["unique"], summary["main_pct"]), ("0", "0/819", "(0.00%)"))
+
+        cards = self.document.save.get_detailed_cards_stats()
+        main = sum(stats.copiesMain for stats in cards)
+        summary = self.view.summary()
+        self.assertEqual(summary["main"], "{}/60".format(main))
+        self.assertEqual(summary["total"], str(sum(int(stats) for stats in cards)))
+
+
+class DuelistsViewTest(unittest.TestCase):
+    def setUp(self):
+        self.document = Document(Save())
+        self.view = DuelistsView(self.document)
+
+    def test_edit(self):
+        index = list(static_columns().duelistIDs).index(constants.DUELISTS["Yugi Muto"].ID)
+        self.assertTrue(self.view.set_value(index, DuelistColumn.WON, 3))
+        self.assertTrue(self.view.set_value(index, DuelistColumn.LOST, 1))
+        self.assertFalse(self.view.set_value(index, DuelistColumn.LOST, 1))
+        self.assertEqual(self.view.row(index), (3, 0, 1))
+        self.assertEqual(self.view.rows([index]), [(index, (3, 0, 1))])
+        self.assertEqual(self.view.bounds(index, DuelistColumn.DRAWN), (0, constants.MAX_DRAWN))
+
+        summary = self.view.summary()
+        self.assertEqual((summary["total"], summary["won"], summary["won_pct"]), ("4", "3/4", "(75.00%)"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from save_editor_AGB_AY5E import constants
+from save_editor_AGB_AY5E.save import Save
+from save_editor_AGB_AY5E.watcher import FileWatcher, SaveSynchronizer
+
+
+DARK_MAGICIAN = constants.CARDS["Dark Magician"].ID
+VARIANT = constants.CARDS["Dark Magician" + constants.ALTERNATIVE_ARTWORK_SUFFIX].ID
+YUGI = constants.DUELISTS["Yugi Muto"].ID
+
+
+def remote(data, **copies):
+    # The file, as changed by another program (e.g. an emulator).
+    save = Save.loads(data)
+    for card_id, values in copies.items():
+        for attribute, value in values.items():
+            setattr(save.get_detailed_cards_stats().cards[int(card_id)], attribute, value)
+    return save.dumps()
+
+
+class SaveSynchronizerTest(unittest.TestCase):
+    def setUp(self):
+        self.data = Save().dumps()
+        self.save = Save.loads(self.data)
+        self.sync = SaveSynchronizer(self.save, self.data)
+        self.cards = self.save.get_detailed_cards_stats().cards
+
+    def test_check(self):
+        self.assertTrue(SaveSynchronizer.check(self.data))
+        self.assertFalse(SaveSynchronizer.check(self.data[:-1]))
+        self.assertFalse(SaveSynchronizer.check(b"\0" * len(self.data)))
+
+    def test_merge(self):
+        self.save.get_detailed_duelists_stats().duelists[YUGI].won = 5
+        data = remote(self.data, **{str(DARK_MAGICIAN): {"copiesTrunk": 2}})
+
+        changes = self.sync.merge(data)
+        self.assertEqual(changes.conflicts, [])
+        self.assertEqual(changes.cards, [DARK_MAGICIAN])
+        self.assertEqual(self.cards[DARK_MAGICIAN].copiesTrunk, 2)
+        # Local changes are kept.
+        self.assertEqual(self.save.get_detailed_duelists_stats().duelists[YUGI].won, 5)
+        self.assertEqual(self.sync.base, data)
+        self.assertFalse(self.sync.merge(data))
+
+    def test_conflicts(self):
+        self.cards[DARK_MAGICIAN].copiesTrunk = 1
+        data = remote(self.data, **{str(DARK_MAGICIAN): {"copiesTrunk": 2}})
+
+        changes = self.sync.merge(data)
+        self.assertEqual(changes.conflicts, [("card", DARK_MAGICIAN)])
+        self.assertFalse(changes)
+        self.assertEqual(self.cards[DARK_MAGICIAN].copiesTrunk, 1)
+
+        changes = self.sync.merge(data, prefer="remote")
+        self.assertEqual(self.cards[DARK_MAGICIAN].copiesTrunk, 2)
+
+    def test_shared_limits(self):
+        # Both sides stay within the limit shared by the variants, but not the merge.
+        self.cards[DARK_MAGICIAN].copiesMain = 3
+        data = remote(self.data, **{str(VARIANT): {"copiesMain": 1}})
+
+        changes = self.sync.merge(data)
+        self.assertEqual(sorted(changes.conflicts), [("card", DARK_MAGICIAN), ("card", VARIANT)])
+        self.assertEqual(self.cards[VARIANT].copiesMain, 0)
+
+        changes = self.sync.merge(data, prefer="local")
+        self.assertEqual((self.cards[DARK_MAGICIAN].copiesMain, self.cards[VARIANT].copiesMain), (3, 0))
+        # The result can be serialized.
+        Save.loads(self.save.dumps())
+
+
+class FileWatcherTest(unittest.TestCase):
+    def check_watcher(self, polling):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "save.sav")
+            with open(path, 'wb') as fd:
+                fd.write(b"old")
+            changed = threading.Event()
+            watcher = FileWatcher(path, lambda path: changed.set(), debounce=0.05, polling=polling)
+            watcher.start()
+            try:
+                os.utime(path, ns=(0, 0))
+                with open(path, 'wb') as fd:
+                    fd.write(b"new contents")
+                self.assertTrue(changed.wait(5))
+            finally:
+                watcher.stop()
+
+    def test_polling(self):
+        self.check_watcher(polling=True)
+
+    def test_default(self):
+        self.check_watcher(polling=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+
+from save_editor_AGB_AY5E import constants
+from save_editor_AGB_AY5E.generator import SaveGenerator
+from save_editor_AGB_AY5E.save import Save
+from save_editor_AGB_AY5E.workspace import Document, Workspace, static_columns
+
+
+DARK_MAGICIAN = constants.CARDS["Dark Magician"].ID
+
+
+class WorkspaceTest(unittest.TestCase):
+    def setUp(self):
+        self.workspace = Workspace()
+        self.documents = [Document.load() for _ in range(3)]
+        for document in self.documents:
+            self.workspace.add(document)
+
+    def test_static_columns(self):
+        self.assertIs(Workspace().columns, self.workspace.columns)
+        columns = static_columns()
+        self.assertEqual(len(columns.cardIDs), len(self.documents[0].card_words()))
+        self.assertEqual(len(columns.duelistIDs), len(self.documents[0].duelist_words()))
+        # The rows are in the same order as the static columns.
+        row = list(columns.cardIDs).index(DARK_MAGICIAN)
+        self.assertEqual(columns.cardNames[row], "Dark Magician")
+        self.documents[0].save.get_detailed_cards_stats().cards[DARK_MAGICIAN].copiesTrunk = 3
+        self.assertEqual(self.documents[0].card_words()[row] & 0x3FF, 3)
+
+    def test_activate(self):
+        self.assertIsNone(self.workspace.current)
+        self.assertEqual(self.workspace.activate(0), (None, None))
+        self.assertIs(self.workspace.current, self.documents[0])
+
+        self.documents[1].save.get_detailed_cards_stats().cards[DARK_MAGICIAN].copiesTrunk = 3
+        cards, duelists = self.workspace.activate(1)
+        self.assertEqual([static_columns().cardIDs[row] for row in cards], [DARK_MAGICIAN])
+        self.assertEqual(duelists, [])
+        self.assertEqual(self.workspace.activate(2), (cards, []))
+
+    def test_close(self):
+        self.workspace.activate(2)
+        self.assertIs(self.workspace.close(0), self.documents[0])
+        self.assertIs(self.workspace.current, self.documents[2])
+        self.workspace.close(self.workspace.index(self.documents[2]))
+        self.assertIs(self.workspace.current, self.documents[1])
+        self.workspace.close(0)
+        self.assertEqual(len(self.workspace), 0)
+        self.assertIsNone(self.workspace.current)
+
+    def test_find(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "save.sav")
+            Save.loads(next(SaveGenerator(seed=40).generate(1))).write(path)
+            document = Document.load(path)
+            index = self.workspace.add(document)
+            self.assertIs(self.workspace.find(os.path.join(directory, ".", "save.sav")), document)
+            self.assertIsNone(self.workspace.find(None))
+
+            replacement = Document.load(path)
+            self.assertIs(self.workspace.replace(index, replacement), document)
+            self.assertEqual(list(self.workspace)[index:], [replacement])
+
+
+if __name__ == "__main__":
+    unittest.main()